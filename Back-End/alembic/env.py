@@ -24,6 +24,7 @@ from app.models import (
     CourseTags,
     Classrooms,
     ClassroomSessions,
+    UserStats,
     KnowledgeTest,
     KnowledgeTestQuestions,
     KnowledgeTestUserResults,
@@ -0,0 +1,41 @@
+"""similar items
+
+Revision ID: 4c8e2a9f6d13
+Revises: 8f3b6d2e1a57
+Create Date: 2026-10-18 16:41:09.527364
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c8e2a9f6d13'
+down_revision = '8f3b6d2e1a57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('similar_courses',
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('similar_course_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['similar_course_id'], ['courses.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('course_id', 'similar_course_id')
+    )
+    op.create_table('similar_lessons',
+    sa.Column('lesson_id', sa.Integer(), nullable=False),
+    sa.Column('similar_lesson_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['lesson_id'], ['lessons.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['similar_lesson_id'], ['lessons.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('lesson_id', 'similar_lesson_id')
+    )
+    # the rows are filled in by `python rebuild_recommendations.py`
+
+
+def downgrade():
+    op.drop_table('similar_lessons')
+    op.drop_table('similar_courses')
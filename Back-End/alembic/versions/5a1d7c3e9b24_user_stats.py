@@ -0,0 +1,36 @@
+"""user stats
+
+Revision ID: 5a1d7c3e9b24
+Revises: bbfa53823715
+Create Date: 2026-10-18 10:12:41.305118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a1d7c3e9b24'
+down_revision = 'bbfa53823715'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('completed_lessons_count', sa.Integer(), nullable=False),
+    sa.Column('enrolled_lessons_count', sa.Integer(), nullable=False),
+    sa.Column('enrolled_courses_count', sa.Integer(), nullable=False),
+    sa.Column('dynamic_courses_count', sa.Integer(), nullable=False),
+    sa.Column('correct_answers_count', sa.Integer(), nullable=False),
+    sa.Column('incorrect_answers_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    # the rows are filled in by `python rebuild_user_stats.py` or on the
+    # first dashboard view of each user
+
+
+def downgrade():
+    op.drop_table('user_stats')
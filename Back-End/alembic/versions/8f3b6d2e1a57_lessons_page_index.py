@@ -0,0 +1,24 @@
+"""lessons page index
+
+Revision ID: 8f3b6d2e1a57
+Revises: c39e0f2a7d61
+Create Date: 2026-10-18 15:24:41.109382
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f3b6d2e1a57'
+down_revision = 'c39e0f2a7d61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_lessons_order_id', 'lessons', ['order', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_lessons_order_id', table_name='lessons')
@@ -0,0 +1,50 @@
+"""hot query indexes
+
+Revision ID: c39e0f2a7d61
+Revises: 5a1d7c3e9b24
+Create Date: 2026-10-18 11:02:17.482903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c39e0f2a7d61'
+down_revision = '5a1d7c3e9b24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_enrolled_courses_user_id_course_id', 'enrolled_courses', ['user_id', 'course_id'], unique=False)
+    op.create_index('ix_course_tags_course_id_name', 'course_tags', ['course_id', 'name'], unique=False)
+    op.create_index('ix_course_tags_name', 'course_tags', ['name'], unique=False)
+    op.create_index('ix_lessons_course_id_order', 'lessons', ['course_id', 'order'], unique=False)
+    op.create_index('ix_enrolled_lessons_user_id_lesson_id', 'enrolled_lessons', ['user_id', 'lesson_id'], unique=False)
+    op.create_index('ix_enrolled_lessons_user_id_completed', 'enrolled_lessons', ['user_id', 'completed'], unique=False)
+    op.create_index('ix_answers_history_user_id_is_correct', 'answers_history', ['user_id', 'is_correct'], unique=False)
+    op.create_index('ix_answers_history_user_id_lesson_id', 'answers_history', ['user_id', 'lesson_id'], unique=False)
+    op.create_index('ix_dynamic_course_survey_user_results_user_id_survey_id', 'dynamic_course_survey_user_results', ['user_id', 'survey_id'], unique=False)
+    op.create_index('ix_dynamic_lessons_user_id_lesson_id', 'dynamic_lessons', ['user_id', 'lesson_id'], unique=False)
+    op.create_index('ix_knowledge_test_user_results_user_id_knowledge_test_id', 'knowledge_test_user_results', ['user_id', 'knowledge_test_id'], unique=False)
+    op.create_index('ix_global_knowledge_test_user_results_user_id_test_id', 'global_knowledge_test_user_results', ['user_id', 'global_knowledge_test_id'], unique=False)
+    op.create_index('ix_classrooms_access_code', 'classrooms', ['access_code'], unique=False)
+    op.create_index('ix_classroom_sessions_user_id_classroom_id', 'classroom_sessions', ['user_id', 'classroom_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_classroom_sessions_user_id_classroom_id', table_name='classroom_sessions')
+    op.drop_index('ix_classrooms_access_code', table_name='classrooms')
+    op.drop_index('ix_global_knowledge_test_user_results_user_id_test_id', table_name='global_knowledge_test_user_results')
+    op.drop_index('ix_knowledge_test_user_results_user_id_knowledge_test_id', table_name='knowledge_test_user_results')
+    op.drop_index('ix_dynamic_lessons_user_id_lesson_id', table_name='dynamic_lessons')
+    op.drop_index('ix_dynamic_course_survey_user_results_user_id_survey_id', table_name='dynamic_course_survey_user_results')
+    op.drop_index('ix_answers_history_user_id_lesson_id', table_name='answers_history')
+    op.drop_index('ix_answers_history_user_id_is_correct', table_name='answers_history')
+    op.drop_index('ix_enrolled_lessons_user_id_completed', table_name='enrolled_lessons')
+    op.drop_index('ix_enrolled_lessons_user_id_lesson_id', table_name='enrolled_lessons')
+    op.drop_index('ix_lessons_course_id_order', table_name='lessons')
+    op.drop_index('ix_course_tags_name', table_name='course_tags')
+    op.drop_index('ix_course_tags_course_id_name', table_name='course_tags')
+    op.drop_index('ix_enrolled_courses_user_id_course_id', table_name='enrolled_courses')
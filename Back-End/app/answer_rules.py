@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Union
+import regex
+from app import settings
+
+Checker = Callable[[str], bool]
+
+# answer_check_rule -> function compiling the expected answer into a checker
+RULES: Dict[str, Callable[[str], Checker]] = {}
+
+
+def rule(name: str):
+    def register(compile_rule: Callable[[str], Checker]):
+        RULES[name] = compile_rule
+        return compile_rule
+
+    return register
+
+
+def normalize(answer: Optional[str]) -> Optional[str]:
+    # print() output ends with a new line the expected answer usually lacks
+    return answer.rstrip("\n") if answer is not None else None
+
+
+def parses_as(cast: Callable[[str], object]) -> Checker:
+    def check(answer: str) -> bool:
+        try:
+            cast(answer)
+        except ValueError:
+            return False
+        return True
+
+    return check
+
+
+@rule("equal")
+def equal(expected: str) -> Checker:
+    return lambda answer: answer == expected
+
+
+@rule("contain")
+def contain(expected: str) -> Checker:
+    return lambda answer: expected is not None and expected in answer
+
+
+@rule("isString")
+def is_string(expected: str) -> Checker:
+    return lambda answer: isinstance(answer, str)
+
+
+@rule("isInteger")
+def is_integer(expected: str) -> Checker:
+    return parses_as(int)
+
+
+@rule("isFloat")
+def is_float(expected: str) -> Checker:
+    return parses_as(float)
+
+
+@rule("isBoolean")
+@rule("isTrue")
+def is_true(expected: str) -> Checker:
+    return bool
+
+
+@rule("isFalse")
+def is_false(expected: str) -> Checker:
+    return lambda answer: not answer
+
+
+@rule("regex")
+def regex_search(expected: str) -> Checker:
+    try:
+        pattern = regex.compile(expected)
+    except (regex.error, TypeError):
+        return lambda answer: False
+
+    def check(answer: str) -> bool:
+        # patterns come from the lesson author, a catastrophic one must not
+        # block the worker
+        try:
+            return (
+                pattern.search(answer, timeout=settings.ANSWER_CHECK_REGEX_TIMEOUT)
+                is not None
+            )
+        except TimeoutError:
+            return False
+
+    return check
+
+
+def reject(answer: str) -> bool:
+    return False
+
+
+@dataclass(frozen=True)
+class CompiledAnswer:
+    id: int
+    lesson_id: int
+    check: Checker
+
+
+@dataclass(frozen=True)
+class CompiledLesson:
+    answers: List[CompiledAnswer]
+
+    def match(self, answer: Union[str, list]) -> Optional[CompiledAnswer]:
+        # every item of a list answer has to be accepted by one of the answers
+        items = answer if isinstance(answer, list) else [answer]
+        matched = None
+        for item in items:
+            item = normalize(str(item))
+            matched = next(
+                (compiled for compiled in self.answers if compiled.check(item)), None
+            )
+            if matched is None:
+                return None
+        return matched
+
+
+def compile_answer(answer) -> CompiledAnswer:
+    compile_rule = RULES.get(answer.answer_check_rule or "equal")
+    return CompiledAnswer(
+        id=answer.id,
+        lesson_id=answer.lesson_id,
+        check=(
+            compile_rule(normalize(answer.final_answer))
+            if compile_rule is not None
+            else reject
+        ),
+    )
+
+
+def compile_lesson(answers: Iterable) -> CompiledLesson:
+    return CompiledLesson(answers=[compile_answer(answer) for answer in answers])
+
+
+class CompiledLessonCache:
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, lesson_id: int) -> Optional[CompiledLesson]:
+        with self._lock:
+            entry = self._entries.get(lesson_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[lesson_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(lesson_id)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, lesson_id: int, lesson: CompiledLesson):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[lesson_id] = (time.monotonic() + self.ttl, lesson)
+            self._entries.move_to_end(lesson_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *lesson_ids: int):
+        with self._lock:
+            for lesson_id in lesson_ids:
+                self._entries.pop(lesson_id, None)
+
+
+compiled_lessons = CompiledLessonCache(
+    settings.ANSWER_RULES_CACHE_SIZE, settings.ANSWER_RULES_CACHE_TTL
+)
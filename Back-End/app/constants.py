@@ -15,6 +15,8 @@ class Actions(Enum):
     ASSIGNMENT_CREATE = 10
     SUBMIT_ASSIGNMENT = 11
     GRADE_ASSIGNMENT = 12
+    PLAYGROUND_RESULT = 13
+    ERROR = 14
 
 
 class ClassroomUserRole(Enum):
@@ -39,3 +41,10 @@ class WhiteboardType(Enum):
     PUBLIC = 0
     PRIVATE = 1
     ASSIGNMENT = 2
+
+
+class PlaygroundActions(Enum):
+    RUN = 0
+    OUTPUT = 1
+    EXIT = 2
+    ERROR = 3
@@ -1,3 +1,4 @@
 from . import dynamic_courses
 from . import courses
 from . import answers
+from . import user_stats
@@ -1,41 +1,252 @@
+from collections import defaultdict
 from typing import Union
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app import models
+from sqlalchemy.orm import Session, contains_eager
+from sqlalchemy import case, func
+from app import models, pagination, recommender, settings
 from app.schemas.course import (
+    CoursesAllResponseDataCollection,
     EnrolledCoursesAllResponseDataCollection,
 )
 from app.schemas.course_tag import (
     CourseTagCreateData,
 )
 
+# fields of a catalog course, "lessons" only with include_lessons
+COURSE_CATALOG_FIELDS = (
+    "id",
+    "name",
+    "description",
+    "featured",
+    "enrolled",
+    "total_lessons_count",
+    "lang",
+    "tags",
+)
+COURSE_CATALOG_COLUMNS = ("id", "name", "description", "featured", "lang")
+
+
+def get_courses_catalog(
+    db: Session,
+    user: models.User,
+    include_lessons: bool,
+    limit_lessons: int,
+    fields: Union[list[str], None] = None,
+    after: Union[int, None] = None,
+    size: Union[int, None] = None,
+) -> tuple[list, Union[str, None]]:
+    # Every course with its tags, lesson count and the user's enrollment, in a
+    # fixed number of queries however many courses there are. Enrolled courses
+    # come first, in the order the user enrolled in them.
+    # A page of size courses after the given id is in id order instead and only
+    # reads what belongs to its courses. fields leaves out the columns and
+    # queries of everything else.
+    projected = fields is not None
+    if fields is None:
+        fields = list(COURSE_CATALOG_FIELDS) + (["lessons"] if include_lessons else [])
+    paginated = after is not None or size is not None
+
+    courses_query = db.query(
+        *(
+            getattr(models.Courses, column)
+            for column in COURSE_CATALOG_COLUMNS
+            if column == "id" or column in fields
+        )
+    ).order_by(models.Courses.id)
+    if include_lessons:
+        # the catalog with lessons only lists courses that have any
+        courses_query = courses_query.filter(models.Courses.lessons.any())
+    if after is not None:
+        courses_query = courses_query.filter(models.Courses.id > after)
+    if size is not None:
+        courses_query = courses_query.limit(size + 1)
+    course_rows, next_cursor = pagination.paginate(
+        courses_query.all(), size, lambda course: (course.id,)
+    )
+    courses = {course.id: course for course in course_rows}
+
+    def of_courses(query, course_id_column):
+        if paginated:
+            return query.filter(course_id_column.in_(list(courses)))
+        return query
+
+    enrolled_course_ids = []
+    if "enrolled" in fields or not paginated:
+        enrolled_course_ids = [
+            course_id
+            for (course_id,) in of_courses(
+                db.query(models.EnrolledCourses.course_id).filter_by(user_id=user.id),
+                models.EnrolledCourses.course_id,
+            ).order_by(models.EnrolledCourses.id)
+        ]
+    enrolled = set(enrolled_course_ids)
+
+    tags = defaultdict(list)
+    if "tags" in fields:
+        for tag in of_courses(
+            db.query(models.CourseTags), models.CourseTags.course_id
+        ).order_by(models.CourseTags.id):
+            tags[tag.course_id].append(
+                {"id": tag.id, "name": tag.name, "course_id": tag.course_id}
+            )
+
+    lessons_count = {}
+    if "total_lessons_count" in fields:
+        lessons_count = dict(
+            of_courses(
+                db.query(models.Lessons.course_id, func.count(models.Lessons.id)),
+                models.Lessons.course_id,
+            ).group_by(models.Lessons.course_id)
+        )
+
+    lessons = defaultdict(list)
+    if "lessons" in fields:
+        lesson_position = (
+            func.row_number()
+            .over(
+                partition_by=models.Lessons.course_id,
+                order_by=models.Lessons.id,
+            )
+            .label("position")
+        )
+        ranked_lessons = of_courses(
+            db.query(models.Lessons, lesson_position), models.Lessons.course_id
+        ).subquery()
+        lessons_query = db.query(ranked_lessons)
+        if limit_lessons:
+            lessons_query = lessons_query.filter(
+                ranked_lessons.c.position <= limit_lessons
+            )
+        for lesson in lessons_query.order_by(
+            ranked_lessons.c.course_id, ranked_lessons.c.position
+        ):
+            lessons[lesson.course_id].append(
+                {
+                    "id": lesson.id,
+                    "name": lesson.name,
+                    "description": lesson.description,
+                    "type": lesson.type,
+                    "number_of_answers": lesson.number_of_answers,
+                }
+            )
+
+    ordered_course_ids = list(courses)
+    if not paginated:
+        ordered_course_ids = [
+            course_id for course_id in enrolled_course_ids if course_id in courses
+        ] + [course_id for course_id in courses if course_id not in enrolled]
+
+    courses_data = []
+    for course_id in dict.fromkeys(ordered_course_ids):
+        course_data = dict(courses[course_id]._mapping)
+        course_data["enrolled"] = course_id in enrolled
+        course_data["total_lessons_count"] = lessons_count.get(course_id, 0)
+        course_data["tags"] = tags[course_id]
+        course_data["lessons"] = lessons[course_id]
+        courses_data.append({field: course_data[field] for field in fields})
+
+    if projected:
+        return courses_data, next_cursor
+    courses_response_data: CoursesAllResponseDataCollection = (
+        CoursesAllResponseDataCollection()
+    )
+    for course_data in courses_data:
+        courses_response_data.append(course_data)
+    return courses_response_data.dict(), next_cursor
+
+
+def completed_lessons_query(db: Session, user: models.User):
+    return (
+        db.query(models.EnrolledLessons.lesson_id)
+        .filter(
+            models.EnrolledLessons.user_id == user.id,
+            # pylint: disable=C0121
+            models.EnrolledLessons.completed == True,
+        )
+        .distinct()
+    )
+
+
+def get_courses_progress(
+    db: Session, user: models.User, course_ids: Union[list[int], None] = None
+) -> dict[int, dict]:
+    # {course_id: {"total": lessons, "completed": lessons the user completed}}
+    # for the given courses, courses without lessons are left out
+    completed_lessons = completed_lessons_query(db, user).subquery()
+    progress_query = (
+        db.query(
+            models.Lessons.course_id,
+            func.count(models.Lessons.id),
+            func.count(completed_lessons.c.lesson_id),
+        )
+        .outerjoin(
+            completed_lessons, completed_lessons.c.lesson_id == models.Lessons.id
+        )
+        .group_by(models.Lessons.course_id)
+    )
+    if course_ids is not None:
+        if not course_ids:
+            return {}
+        progress_query = progress_query.filter(models.Lessons.course_id.in_(course_ids))
+    return {
+        course_id: {"total": total, "completed": completed}
+        for course_id, total, completed in progress_query
+    }
+
+
+def get_courses_tags(db: Session, course_ids: list[int]) -> dict[int, list[dict]]:
+    # {course_id: tags} of the given courses in one query
+    tags = defaultdict(list)
+    if not course_ids:
+        return tags
+    for tag in (
+        db.query(models.CourseTags)
+        .filter(models.CourseTags.course_id.in_(course_ids))
+        .order_by(models.CourseTags.id)
+    ):
+        tags[tag.course_id].append(
+            {"id": tag.id, "name": tag.name, "course_id": tag.course_id}
+        )
+    return tags
+
+
+def get_courses_lessons(
+    db: Session, course_ids: list[int], limit_lessons: Union[int, None]
+) -> dict[int, list]:
+    # {course_id: the first limit_lessons lessons} of the given courses in one
+    # query, all lessons without a limit
+    lessons = defaultdict(list)
+    if not course_ids:
+        return lessons
+    lesson_position = (
+        func.row_number()
+        .over(partition_by=models.Lessons.course_id, order_by=models.Lessons.id)
+        .label("position")
+    )
+    ranked_lessons = (
+        db.query(models.Lessons, lesson_position)
+        .filter(models.Lessons.course_id.in_(course_ids))
+        .subquery()
+    )
+    lessons_query = db.query(ranked_lessons)
+    if limit_lessons:
+        lessons_query = lessons_query.filter(ranked_lessons.c.position <= limit_lessons)
+    for lesson in lessons_query.order_by(
+        ranked_lessons.c.course_id, ranked_lessons.c.position
+    ):
+        lessons[lesson.course_id].append(lesson)
+    return lessons
+
 
 def get_all_enrolled_courses(
     db: Session, user: models.User, include_lessons: bool, limit_lessons: int
 ) -> Union[list, Exception]:
+    # the courses are read with their enrollments, tags and lessons are read
+    # for all of them at once instead of once per course
     try:
         courses_response_data: EnrolledCoursesAllResponseDataCollection = (
             EnrolledCoursesAllResponseDataCollection()
         )
         if include_lessons:
-            completed_lessons_count_query = (
-                db.query(
-                    models.EnrolledLessons.id,
-                    models.EnrolledLessons.lesson_id,
-                    models.EnrolledLessons.user_id,
-                    func.count(models.EnrolledLessons.completed).label(
-                        "completed_lessons_count"
-                    ),
-                )
-                .filter(
-                    models.EnrolledLessons.user_id == user.id,
-                    # pylint: disable=C0121
-                    models.EnrolledLessons.completed == True,
-                )
-                .distinct(models.EnrolledLessons.lesson_id)
-                .group_by(models.EnrolledLessons.id)
-                .all()
-            )
             enrolled_courses_with_lessons = (
                 db.query(models.EnrolledCourses)
                 .filter_by(user_id=user.id)
@@ -43,60 +254,50 @@ def get_all_enrolled_courses(
                     models.Courses,
                     models.Courses.id == models.EnrolledCourses.course_id,
                 )
-                .join(models.Lessons, models.Courses.id == models.Lessons.course_id)
+                .options(contains_eager(models.EnrolledCourses.course))
                 .all()
             )
-            if enrolled_courses_with_lessons:
-                for enrolled_course in enrolled_courses_with_lessons:
-                    total_lessons_count = 0
-                    total_completed_lessons_count = 0
-                    for lesson in enrolled_course.course.lessons:
-                        total_lessons_count += 1
-                        if lesson.id in [
-                            lesson_enrolled.lesson_id
-                            for lesson_enrolled in completed_lessons_count_query
-                            if lesson_enrolled.lesson_id == lesson.id
-                        ]:
-                            total_completed_lessons_count += 1
+            course_ids = [
+                enrolled_course.course_id
+                for enrolled_course in enrolled_courses_with_lessons
+            ]
+            progress = get_courses_progress(db, user, course_ids)
+            tags = get_courses_tags(db, course_ids)
+            lessons = get_courses_lessons(db, course_ids, limit_lessons)
+            for enrolled_course in enrolled_courses_with_lessons:
+                course_progress = progress.get(enrolled_course.course_id)
+                if course_progress is None:
+                    continue
 
-                    courses_response_data.append(
-                        {
-                            "id": enrolled_course.id,
-                            "user_id": enrolled_course.user_id,
-                            "course_id": enrolled_course.course.id,
-                            "name": enrolled_course.course.name,
-                            "description": enrolled_course.course.description,
-                            "featured": enrolled_course.course.featured,
-                            "enrolled": True,
-                            "is_dynamic": False,
-                            "end_date": str(enrolled_course.end_date),
-                            "total_lessons_count": total_lessons_count,
-                            "total_completed_lessons_count": total_completed_lessons_count,
-                            "lang": enrolled_course.course.lang,
-                            "tags": [
-                                {
-                                    "id": tag.id,
-                                    "name": tag.name,
-                                    "course_id": tag.course_id,
-                                }
-                                for tag in enrolled_course.course.tags
-                            ],
-                            "lessons": [
-                                {
-                                    "id": lesson.id,
-                                    "start_date": str(enrolled_course.start_date),
-                                    "name": lesson.name,
-                                    "description": lesson.description,
-                                    "type": lesson.type,
-                                    "number_of_answers": lesson.number_of_answers,
-                                    "order": lesson.order,
-                                }
-                                for lesson in enrolled_course.course.lessons.limit(
-                                    limit_lessons
-                                )
-                            ],
-                        }
-                    )
+                courses_response_data.append(
+                    {
+                        "id": enrolled_course.id,
+                        "user_id": enrolled_course.user_id,
+                        "course_id": enrolled_course.course.id,
+                        "name": enrolled_course.course.name,
+                        "description": enrolled_course.course.description,
+                        "featured": enrolled_course.course.featured,
+                        "enrolled": True,
+                        "is_dynamic": False,
+                        "end_date": str(enrolled_course.end_date),
+                        "total_lessons_count": course_progress["total"],
+                        "total_completed_lessons_count": course_progress["completed"],
+                        "lang": enrolled_course.course.lang,
+                        "tags": tags[enrolled_course.course_id],
+                        "lessons": [
+                            {
+                                "id": lesson.id,
+                                "start_date": str(enrolled_course.start_date),
+                                "name": lesson.name,
+                                "description": lesson.description,
+                                "type": lesson.type,
+                                "number_of_answers": lesson.number_of_answers,
+                                "order": lesson.order,
+                            }
+                            for lesson in lessons[enrolled_course.course_id]
+                        ],
+                    }
+                )
 
         else:
             enrolled_courses = (
@@ -106,8 +307,12 @@ def get_all_enrolled_courses(
                     models.Courses,
                     models.Courses.id == models.EnrolledCourses.course_id,
                 )
+                .options(contains_eager(models.EnrolledCourses.course))
                 .all()
             )
+            tags = get_courses_tags(
+                db, [enrolled_course.course_id for enrolled_course in enrolled_courses]
+            )
             if enrolled_courses:
                 for enrolled_course in enrolled_courses:
                     courses_response_data.append(
@@ -123,14 +328,7 @@ def get_all_enrolled_courses(
                             "is_dynamic": False,
                             "end_date": str(enrolled_course.end_date),
                             "lang": enrolled_course.course.lang,
-                            "tags": [
-                                {
-                                    "id": tag.id,
-                                    "name": tag.name,
-                                    "course_id": tag.course_id,
-                                }
-                                for tag in enrolled_course.course.tags
-                            ],
+                            "tags": tags[enrolled_course.course_id],
                         }
                     )
 
@@ -144,24 +342,6 @@ def get_enrolled_course_by_id(
 ) -> Union[dict, Exception]:
     try:
         if include_lessons:
-            completed_lessons_count_query = (
-                db.query(
-                    models.EnrolledLessons.id,
-                    models.EnrolledLessons.lesson_id,
-                    models.EnrolledLessons.user_id,
-                    func.count(models.EnrolledLessons.completed).label(
-                        "completed_lessons_count"
-                    ),
-                )
-                .filter(
-                    models.EnrolledLessons.user_id == user.id,
-                    # pylint: disable=C0121
-                    models.EnrolledLessons.completed == True,
-                )
-                .distinct(models.EnrolledLessons.lesson_id)
-                .group_by(models.EnrolledLessons.id)
-                .all()
-            )
             enrolled_course_with_lessons = (
                 db.query(
                     models.EnrolledCourses,
@@ -170,16 +350,19 @@ def get_enrolled_course_by_id(
                 .first()
             )
             if enrolled_course_with_lessons:
-                total_lessons_count = 0
-                total_completed_lessons_count = 0
-                for lesson in enrolled_course_with_lessons.course.lessons:
-                    total_lessons_count += 1
-                    if lesson.id in [
-                        lesson_enrolled.lesson_id
-                        for lesson_enrolled in completed_lessons_count_query
-                        if lesson_enrolled.lesson_id == lesson.id
-                    ]:
-                        total_completed_lessons_count += 1
+                completed_lesson_ids = {
+                    lesson_id
+                    for (lesson_id,) in completed_lessons_query(db, user).filter(
+                        models.EnrolledLessons.lesson_id.in_(
+                            db.query(models.Lessons.id).filter_by(
+                                course_id=enrolled_course_with_lessons.course_id
+                            )
+                        )
+                    )
+                }
+                lessons = enrolled_course_with_lessons.course.lessons.order_by(
+                    models.Lessons.order
+                ).all()
 
                 return dict(
                     {
@@ -193,8 +376,8 @@ def get_enrolled_course_by_id(
                         "is_dynamic": False,
                         "start_date": str(enrolled_course_with_lessons.start_date),
                         "end_date": str(enrolled_course_with_lessons.end_date),
-                        "total_lessons_count": total_lessons_count,
-                        "total_completed_lessons_count": total_completed_lessons_count,
+                        "total_lessons_count": len(lessons),
+                        "total_completed_lessons_count": len(completed_lesson_ids),
                         "lang": enrolled_course_with_lessons.course.lang,
                         "tags": [
                             {
@@ -216,16 +399,9 @@ def get_enrolled_course_by_id(
                                 "type": lesson.type,
                                 "number_of_answers": lesson.number_of_answers,
                                 "order": lesson.order,
-                                "completed": lesson.id
-                                in [
-                                    lesson_enrolled.lesson_id
-                                    for lesson_enrolled in completed_lessons_count_query
-                                    if lesson_enrolled.lesson_id == lesson.id
-                                ],
+                                "completed": lesson.id in completed_lesson_ids,
                             }
-                            for lesson in enrolled_course_with_lessons.course.lessons.order_by(
-                                models.Lessons.order
-                            )
+                            for lesson in lessons
                         ],
                     },
                 )
@@ -274,33 +450,11 @@ def get_enrolled_course_by_id(
 
 def get_total_completed_lessons_count(db: Session, user: models.User) -> int:
     try:
-        completed_lessons_count_query = (
-            db.query(
-                models.EnrolledLessons.id,
-                models.EnrolledLessons.lesson_id,
-                models.EnrolledLessons.user_id,
-                func.count(models.EnrolledLessons.completed).label(
-                    "completed_lessons_count"
-                ),
-            )
-            .filter(
-                models.EnrolledLessons.user_id == user.id,
-                # pylint: disable=C0121
-                models.EnrolledLessons.completed == True,
-            )
-            .distinct(models.EnrolledLessons.lesson_id)
-            .group_by(models.EnrolledLessons.id)
-            .all()
+        return (
+            db.query(func.count(models.Lessons.id))
+            .filter(models.Lessons.id.in_(completed_lessons_query(db, user)))
+            .scalar()
         )
-        total_completed_lessons_count = 0
-        for lesson in db.query(models.Lessons).all():
-            if lesson.id in [
-                lesson_enrolled.lesson_id
-                for lesson_enrolled in completed_lessons_count_query
-                if lesson_enrolled.lesson_id == lesson.id
-            ]:
-                total_completed_lessons_count += 1
-        return total_completed_lessons_count
     except ValueError as err:
         raise err
 
@@ -382,81 +536,143 @@ def get_total_enrolled_courses_count(db: Session, user: models.User) -> int:
         raise err
 
 
-def get_similar_courses(db: Session, user: models.User) -> list[models.Courses]:
-    try:
-        enrolled_courses = (
-            db.query(models.EnrolledCourses)
-            .filter_by(user_id=user.id)
-            .join(
-                models.Courses,
-                models.Courses.id == models.EnrolledCourses.course_id,
-            )
-            .all()
+def get_similar_courses(
+    db: Session, user: models.User, limit: int
+) -> list[models.Courses]:
+    # ranked by the in memory tag index, only the picked courses are read
+    enrolled_course_ids = [
+        course_id
+        for (course_id,) in db.query(models.EnrolledCourses.course_id).filter_by(
+            user_id=user.id
         )
-        # pylint: disable=C2801
-        if enrolled_courses:
-            similar_courses = (
-                db.query(models.Courses)
-                .join(
-                    models.CourseTags,
-                    models.CourseTags.course_id == models.Courses.id,
-                )
-                .filter(
-                    models.Courses.id.notin_(
-                        [
-                            enrolled_course.course_id
-                            for enrolled_course in enrolled_courses
-                        ]
-                    ),
-                    models.Courses.lang.in_(
-                        [
-                            enrolled_course.course.lang
-                            for enrolled_course in enrolled_courses
-                        ]
-                    ),
-                    models.CourseTags.name.in_(
-                        [
-                            tag.name
-                            for enrolled_course in enrolled_courses
-                            for tag in enrolled_course.course.tags
-                        ]
-                    ),
-                )
-                .all()
-            )
-            if similar_courses:
-                return similar_courses
-            return []
+    ]
+    if not enrolled_course_ids:
         raise ValueError("No enrolled courses found")
-    except ValueError as err:
-        raise err
+    recommender.course_tag_index.ensure_loaded(db)
+    similar_course_ids = [
+        course_id
+        for course_id, _ in recommender.course_tag_index.recommend(
+            enrolled_course_ids, limit
+        )
+    ]
+    courses = {
+        course.id: course
+        for course in db.query(models.Courses).filter(
+            models.Courses.id.in_(similar_course_ids)
+        )
+    }
+    return [
+        courses[course_id] for course_id in similar_course_ids if course_id in courses
+    ]
+
+
+def get_cohort_courses(
+    db: Session, user: models.User, limit: int
+) -> list[tuple[models.Courses, float]]:
+    # courses enrolled together with the user's courses by other users, from
+    # the similar_courses table rebuilt offline
+    enrolled_course_ids = db.query(models.EnrolledCourses.course_id).filter_by(
+        user_id=user.id
+    )
+    score = func.sum(models.SimilarCourses.score).label("score")
+    ranked = (
+        db.query(models.SimilarCourses.similar_course_id, score)
+        .filter(
+            models.SimilarCourses.course_id.in_(enrolled_course_ids),
+            models.SimilarCourses.similar_course_id.notin_(enrolled_course_ids),
+        )
+        .group_by(models.SimilarCourses.similar_course_id)
+        .order_by(score.desc(), models.SimilarCourses.similar_course_id)
+        .limit(limit)
+        .subquery()
+    )
+    return (
+        db.query(models.Courses, ranked.c.score)
+        .join(ranked, ranked.c.similar_course_id == models.Courses.id)
+        .order_by(ranked.c.score.desc(), models.Courses.id)
+        .all()
+    )
+
+
+def get_cohort_lessons(
+    db: Session, user: models.User, limit: int
+) -> list[tuple[models.Lessons, float]]:
+    # lessons other users took and did well in along with the user's lessons,
+    # from the similar_lessons table rebuilt offline
+    enrolled_lesson_ids = db.query(models.EnrolledLessons.lesson_id).filter_by(
+        user_id=user.id
+    )
+    score = func.sum(models.SimilarLessons.score).label("score")
+    ranked = (
+        db.query(models.SimilarLessons.similar_lesson_id, score)
+        .filter(
+            models.SimilarLessons.lesson_id.in_(enrolled_lesson_ids),
+            models.SimilarLessons.similar_lesson_id.notin_(enrolled_lesson_ids),
+        )
+        .group_by(models.SimilarLessons.similar_lesson_id)
+        .order_by(score.desc(), models.SimilarLessons.similar_lesson_id)
+        .limit(limit)
+        .subquery()
+    )
+    return (
+        db.query(models.Lessons, ranked.c.score)
+        .join(ranked, ranked.c.similar_lesson_id == models.Lessons.id)
+        .order_by(ranked.c.score.desc(), models.Lessons.id)
+        .all()
+    )
 
 
 def get_lessons_for_incorrect_answers(
     db: Session, user: models.User
 ) -> list[models.Lessons]:
-    try:
-        incorrect_answers = (
-            db.query(models.AnswersHistory)
-            .filter_by(user_id=user.id, is_correct=False)
-            .all()
-        )
-        if incorrect_answers:
-            lessons = (
-                db.query(models.Lessons)
-                .filter(
-                    models.Lessons.id.in_(
-                        [
-                            incorrect_answer.lesson_id
-                            for incorrect_answer in incorrect_answers
-                        ]
-                    )
+    incorrect_lesson_ids = db.query(models.AnswersHistory.lesson_id).filter_by(
+        user_id=user.id, is_correct=False
+    )
+    return (
+        db.query(models.Lessons)
+        .filter(models.Lessons.id.in_(incorrect_lesson_ids))
+        .all()
+    )
+
+
+def get_weakest_lessons(
+    db: Session, user: models.User, limit: int
+) -> list[tuple[models.Lessons, int, bool]]:
+    # (lesson, incorrect answers, solved) of the lessons the user struggles
+    # with most, from one grouped query over their answers. More incorrect
+    # answers rank higher, a lesson answered correctly after its last mistake
+    # (solved) only counts RECOMMENDER_SOLVED_LESSON_WEIGHT of them and the
+    # more recent mistake wins a tie. Answer ids stand in for time, unlike the
+    # dates they are always set and increase with every answer.
+    # pylint: disable=C0121
+    is_incorrect = models.AnswersHistory.is_correct == False
+    answers = (
+        db.query(
+            models.AnswersHistory.lesson_id,
+            func.sum(case((is_incorrect, 1), else_=0)).label("incorrect_count"),
+            func.max(case((is_incorrect, models.AnswersHistory.id))).label(
+                "last_incorrect_id"
+            ),
+            func.max(
+                case(
+                    (models.AnswersHistory.is_correct == True, models.AnswersHistory.id)
                 )
-                .all()
-            )
-            if lessons:
-                return lessons
-            return []
-        return []
-    except ValueError as err:
-        raise err
+            ).label("last_correct_id"),
+        )
+        .filter(models.AnswersHistory.user_id == user.id)
+        .group_by(models.AnswersHistory.lesson_id)
+        .subquery()
+    )
+    solved = func.coalesce(answers.c.last_correct_id, 0) > answers.c.last_incorrect_id
+    weight = case((solved, settings.RECOMMENDER_SOLVED_LESSON_WEIGHT), else_=1.0)
+    return (
+        db.query(models.Lessons, answers.c.incorrect_count, solved)
+        .join(answers, answers.c.lesson_id == models.Lessons.id)
+        .filter(answers.c.incorrect_count > 0)
+        .order_by(
+            (answers.c.incorrect_count * weight).desc(),
+            answers.c.last_incorrect_id.desc(),
+        )
+        .limit(limit)
+        .all()
+    )
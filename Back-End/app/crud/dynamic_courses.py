@@ -1,6 +1,8 @@
 from typing import Union
+from sqlalchemy import and_
 from sqlalchemy.orm import Session
 from app import models
+from app.schemas.dynamic_course import DynamicCourseCreateRequestData
 
 
 def get_all_dynamic_courses(
@@ -246,3 +248,88 @@ def get_total_dynamic_courses_count(db: Session, user: models.User) -> int:
 
     except ValueError as err:
         raise err
+
+
+def get_dynamic_course_lesson_ids(
+    db: Session, user: models.User, data: DynamicCourseCreateRequestData
+) -> list:
+    # lesson id -> error raised if that lesson no longer exists, a dict keeps
+    # the lessons in the order they were picked without duplicates
+    lesson_ids = {}
+
+    if data.survey_id:
+        survey_lesson_ids = (
+            db.query(models.DynamicCourseSurveyAnswers.rule_value)
+            .join(
+                models.DynamicCourseSurveyUserResults,
+                and_(
+                    models.DynamicCourseSurveyUserResults.answer_id
+                    == models.DynamicCourseSurveyAnswers.id,
+                    models.DynamicCourseSurveyUserResults.question_id
+                    == models.DynamicCourseSurveyAnswers.question_id,
+                ),
+            )
+            .filter(
+                models.DynamicCourseSurveyUserResults.survey_id == data.survey_id,
+                models.DynamicCourseSurveyUserResults.user_id == user.id,
+                models.DynamicCourseSurveyAnswers.rule_type == 1,
+            )
+            .order_by(models.DynamicCourseSurveyUserResults.id)
+        )
+        for (lesson_id,) in survey_lesson_ids:
+            lesson_ids.setdefault(lesson_id, "Lesson for answer_id not found")
+
+    knowledge_test_ids = []
+    if (
+        data.knowledge_test_id
+        and db.query(models.KnowledgeTestUserResults.id)
+        .filter_by(knowledge_test_id=data.knowledge_test_id, user_id=user.id)
+        .first()
+    ):
+        knowledge_test_ids.append(data.knowledge_test_id)
+    knowledge_test_ids += data.knowledge_test_ids or []
+    if knowledge_test_ids:
+        knowledge_test_lesson_ids = dict(
+            db.query(models.KnowledgeTest.id, models.KnowledgeTest.lesson_id).filter(
+                models.KnowledgeTest.id.in_(knowledge_test_ids)
+            )
+        )
+        for knowledge_test_id in knowledge_test_ids:
+            if knowledge_test_id not in knowledge_test_lesson_ids:
+                raise ValueError("Knowledge test not found")
+            lesson_ids.setdefault(
+                knowledge_test_lesson_ids[knowledge_test_id],
+                "Lesson for knowledge test not found",
+            )
+
+    # any incorrect answer brings in the lessons of the whole test
+    if (
+        data.global_knowledge_test_id
+        and db.query(models.GlobalKnowledgeTestUserResults.id)
+        .filter_by(
+            global_knowledge_test_id=data.global_knowledge_test_id,
+            user_id=user.id,
+            is_correct=False,
+        )
+        .first()
+    ):
+        if db.get(models.GlobalKnowledgeTest, data.global_knowledge_test_id) is None:
+            raise ValueError("Global Knowledge test not found")
+        question_lesson_ids = (
+            db.query(models.GlobalKnowledgeTestQuestions.lesson_id)
+            .filter_by(global_knowledge_test_id=data.global_knowledge_test_id)
+            .order_by(models.GlobalKnowledgeTestQuestions.id)
+        )
+        for (lesson_id,) in question_lesson_ids:
+            lesson_ids.setdefault(lesson_id, "Lesson for knowledge test not found")
+
+    existing_lesson_ids = {
+        lesson_id
+        for (lesson_id,) in db.query(models.Lessons.id).filter(
+            models.Lessons.id.in_(lesson_ids)
+        )
+    }
+    for lesson_id, error in lesson_ids.items():
+        if lesson_id not in existing_lesson_ids:
+            raise ValueError(error)
+    return list(lesson_ids)
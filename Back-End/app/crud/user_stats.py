@@ -0,0 +1,176 @@
+# pylint: disable=C0121
+from typing import Iterable, Union
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from app import models
+
+COUNTERS = [
+    "completed_lessons_count",
+    "enrolled_lessons_count",
+    "enrolled_courses_count",
+    "dynamic_courses_count",
+    "correct_answers_count",
+    "incorrect_answers_count",
+]
+
+
+def count_by_user(db: Session, user_ids: Union[list[int], None]) -> dict[str, dict]:
+    # {counter: {user_id: count}} computed from the source tables
+    completed_lessons = db.query(
+        models.EnrolledLessons.user_id,
+        func.count(func.distinct(models.EnrolledLessons.lesson_id)),
+    ).join(models.Lessons, models.Lessons.id == models.EnrolledLessons.lesson_id)
+    enrolled_lessons = db.query(
+        models.EnrolledLessons.user_id, func.count(models.EnrolledLessons.id)
+    )
+    enrolled_courses = db.query(
+        models.EnrolledCourses.user_id, func.count(models.EnrolledCourses.id)
+    )
+    dynamic_courses = db.query(
+        models.DynamicCourses.user_id, func.count(models.DynamicCourses.id)
+    )
+    answers = db.query(
+        models.AnswersHistory.user_id, func.count(models.AnswersHistory.id)
+    )
+    queries = {
+        "completed_lessons_count": (
+            completed_lessons.filter(models.EnrolledLessons.completed == True),
+            models.EnrolledLessons.user_id,
+        ),
+        "enrolled_lessons_count": (enrolled_lessons, models.EnrolledLessons.user_id),
+        "enrolled_courses_count": (enrolled_courses, models.EnrolledCourses.user_id),
+        "dynamic_courses_count": (dynamic_courses, models.DynamicCourses.user_id),
+        "correct_answers_count": (
+            answers.filter(models.AnswersHistory.is_correct == True),
+            models.AnswersHistory.user_id,
+        ),
+        "incorrect_answers_count": (
+            answers.filter(models.AnswersHistory.is_correct == False),
+            models.AnswersHistory.user_id,
+        ),
+    }
+    counts = {}
+    for counter, (query, user_id_column) in queries.items():
+        if user_ids is not None:
+            query = query.filter(user_id_column.in_(user_ids))
+        counts[counter] = dict(query.group_by(user_id_column).all())
+    return counts
+
+
+def rebuild_user_stats(
+    db: Session, user_ids: Union[list[int], None] = None
+) -> list[models.UserStats]:
+    # Recounts the stats of the given users (all users by default) from the
+    # source tables. Changes are flushed first so pending rows are counted,
+    # committing is left to the caller.
+    db.flush()
+    if user_ids is None:
+        user_ids = [user_id for (user_id,) in db.query(models.User.id)]
+    if not user_ids:
+        return []
+
+    counts = count_by_user(db, user_ids)
+    existing = {
+        user_stats.user_id: user_stats
+        for user_stats in db.query(models.UserStats).filter(
+            models.UserStats.user_id.in_(user_ids)
+        )
+    }
+    rebuilt = []
+    for user_id in user_ids:
+        user_stats = existing.get(user_id)
+        if user_stats is None:
+            user_stats = models.UserStats(user_id=user_id)
+            db.add(user_stats)
+        for counter in COUNTERS:
+            setattr(user_stats, counter, counts[counter].get(user_id, 0))
+        rebuilt.append(user_stats)
+    return rebuilt
+
+
+def get_user_stats(db: Session, user: models.User) -> models.UserStats:
+    user_stats = db.get(models.UserStats, user.id)
+    if user_stats is None:
+        # users from before the stats table, or whose stats were invalidated
+        try:
+            user_stats = rebuild_user_stats(db, [user.id])[0]
+            db.commit()
+        except IntegrityError:
+            # a concurrent first view inserted the row, read theirs in a new
+            # transaction so the row is visible
+            db.rollback()
+            user_stats = db.get(models.UserStats, user.id)
+    return user_stats
+
+
+def increment_user_stats(db: Session, user_id: int, **counters: int) -> None:
+    # Adds to the counters in the caller's transaction, call it next to the
+    # change it counts and before the commit.
+    updated = (
+        db.query(models.UserStats)
+        .filter_by(user_id=user_id)
+        .update(
+            {
+                getattr(models.UserStats, counter): getattr(models.UserStats, counter)
+                + amount
+                for counter, amount in counters.items()
+            },
+            synchronize_session=False,
+        )
+    )
+    if not updated:
+        # no row yet, the recount includes the change being made
+        try:
+            with db.begin_nested():
+                rebuild_user_stats(db, [user_id])
+        except IntegrityError:
+            # a concurrent request inserted the row meanwhile, count on top
+            increment_user_stats(db, user_id, **counters)
+
+
+def lesson_user_ids(db: Session, lesson_ids: list[int]) -> set[int]:
+    # users whose counters include the given lessons
+    if not lesson_ids:
+        return set()
+    enrolled = db.query(models.EnrolledLessons.user_id).filter(
+        models.EnrolledLessons.lesson_id.in_(lesson_ids)
+    )
+    answered = db.query(models.AnswersHistory.user_id).filter(
+        models.AnswersHistory.lesson_id.in_(lesson_ids)
+    )
+    return {user_id for (user_id,) in enrolled.union(answered) if user_id is not None}
+
+
+def course_user_ids(db: Session, course_id: int, lesson_ids: list[int]) -> set[int]:
+    # users whose counters include the course or its lessons
+    enrolled = {
+        user_id
+        for (user_id,) in db.query(models.EnrolledCourses.user_id).filter_by(
+            course_id=course_id
+        )
+        if user_id is not None
+    }
+    return enrolled | lesson_user_ids(db, lesson_ids)
+
+
+def answer_user_ids(db: Session, answer_id: int) -> set[int]:
+    return {
+        user_id
+        for (user_id,) in db.query(models.AnswersHistory.user_id)
+        .filter_by(answer_id=answer_id)
+        .distinct()
+        if user_id is not None
+    }
+
+
+def invalidate_user_stats(db: Session, user_ids: Iterable[int]) -> None:
+    # For changes that are too wide to count, e.g. deleting a course. The
+    # stats of the given users are rebuilt on their next read, collect the
+    # ids with the *_user_ids helpers before deleting the rows they come from.
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    db.query(models.UserStats).filter(models.UserStats.user_id.in_(user_ids)).delete(
+        synchronize_session=False
+    )
@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app import settings
+
+
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_checkout(self, wait: float):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def record_connect(self, *_):
+        with self._lock:
+            self.connects += 1
+
+    def record_invalidation(self, *_):
+        with self._lock:
+            self.invalidations += 1
+
+
+class InstrumentedPoolMixin:
+    # Records how long each checkout waited for a connection, kept on the class
+    # so the numbers survive the pool being recreated on dispose
+    metrics: PoolMetrics
+
+    def connect(self):
+        started = time.monotonic()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.metrics.record_timeout()
+            raise
+        self.metrics.record_checkout(time.monotonic() - started)
+        return connection
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    metrics = PoolMetrics()
+
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    metrics = PoolMetrics()
+
+
+def get_engine_options(database_url, is_async: bool = False) -> dict:
+    if make_url(database_url).get_backend_name() == "sqlite":
+        # sqlite (tests) keeps the pool sqlalchemy picks for it
+        return {}
+    return {
+        "poolclass": (
+            InstrumentedAsyncAdaptedQueuePool if is_async else InstrumentedQueuePool
+        ),
+        "pool_size": settings.ASYNC_DB_POOL_SIZE if is_async else settings.DB_POOL_SIZE,
+        "max_overflow": (
+            settings.ASYNC_DB_MAX_OVERFLOW if is_async else settings.DB_MAX_OVERFLOW
+        ),
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def instrument_engine(engine: Engine):
+    metrics = getattr(engine.pool, "metrics", None)
+    if metrics is None:
+        return
+    event.listen(engine, "connect", metrics.record_connect)
+    event.listen(engine, "invalidate", metrics.record_invalidation)
+
+
+def get_pool_metrics(engine: Engine) -> dict:
+    # numbers of the worker that serves the request
+    pool = engine.pool
+    metrics = {"pid": os.getpid(), "pool": type(pool).__name__}
+    pool_metrics = getattr(pool, "metrics", None)
+    if pool_metrics is not None:
+        metrics.update(
+            {
+                "checkouts": pool_metrics.checkouts,
+                "timeouts": pool_metrics.timeouts,
+                "connects": pool_metrics.connects,
+                "invalidations": pool_metrics.invalidations,
+                "avg_wait_ms": (
+                    pool_metrics.total_wait / pool_metrics.checkouts * 1000
+                    if pool_metrics.checkouts
+                    else 0.0
+                ),
+                "max_wait_ms": pool_metrics.max_wait * 1000,
+            }
+        )
+    if isinstance(pool, QueuePool):
+        capacity = pool.size() + max(pool._max_overflow, 0)  # pylint: disable=W0212
+        metrics.update(
+            {
+                "size": pool.size(),
+                "max_overflow": pool._max_overflow,  # pylint: disable=W0212
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+                "saturation": pool.checkedout() / capacity if capacity else 0.0,
+            }
+        )
+    return metrics
@@ -1,11 +1,44 @@
+from functools import lru_cache
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import as_declarative, declared_attr
 from sqlalchemy.orm import sessionmaker
 from app import settings
+from app.db.pool import get_engine_options, instrument_engine
 
+# asyncio driver used in place of the configured one for the async sessions
+ASYNC_DRIVERS = {"mysql": "aiomysql", "sqlite": "aiosqlite"}
 
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URL)
+
+engine = create_engine(
+    settings.SQLALCHEMY_DATABASE_URL,
+    **get_engine_options(settings.SQLALCHEMY_DATABASE_URL),
+)
+instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Objects stay loaded after commit, an expired attribute can't be lazy loaded
+# outside of an await
+AsyncSessionLocal = sessionmaker(
+    class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+
+def get_async_database_url():
+    if settings.ASYNC_SQLALCHEMY_DATABASE_URL:
+        return make_url(settings.ASYNC_SQLALCHEMY_DATABASE_URL)
+    url = make_url(settings.SQLALCHEMY_DATABASE_URL)
+    backend = url.get_backend_name()
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+@lru_cache(maxsize=None)
+def get_async_engine() -> AsyncEngine:
+    # Created on first use, alembic and the scripts only need the sync engine
+    url = get_async_database_url()
+    async_engine = create_async_engine(url, **get_engine_options(url, is_async=True))
+    instrument_engine(async_engine.sync_engine)
+    return async_engine
 
 
 @as_declarative()
@@ -12,10 +12,12 @@ from .routers import courses
 from .routers import login
 from .routers import users
 from .routers import recommender
+from .routers import metrics
 from .routers.dynamic_course import knowledge_test
 from .routers.dynamic_course import global_knowledge_test
-from app.db.session import Base, engine
-from app import settings
+from app.db.session import Base, SessionLocal, engine
+from app import settings, python_runner
+from app.recommender import course_tag_index
 from pydantic import BaseSettings
 from fastapi_jwt_auth.exceptions import AuthJWTException
 from fastapi_jwt_auth import AuthJWT
@@ -24,9 +26,8 @@ from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 import datetime as dt
 from dotenv import load_dotenv
 import json
-from app.websockets.managers.payload_handler import payload_handler
-from app.websockets.managers.connection_manager import conn_manager
-from app.websockets.managers.classroom_manager import class_manager
+from app.python_runner.jobs import job_queue
+from app.websockets.managers.pubsub_manager import pubsub_manager
 from fastapi.middleware.cors import CORSMiddleware
 
 load_dotenv()
@@ -128,12 +129,38 @@ def get_application() -> FastAPI:
         global_knowledge_test.router,
         prefix=settings.API_PREFIX,
     )
+    application.include_router(
+        metrics.router,
+        prefix=settings.API_PREFIX,
+    )
     return application
 
 
 app = get_application()
 
 
+@app.on_event("startup")
+def start_python_runner():
+    python_runner.get_runner()
+
+
+@app.on_event("startup")
+def load_course_tag_index():
+    with SessionLocal() as db:
+        course_tag_index.load(db)
+
+
+@app.on_event("shutdown")
+def stop_python_runner():
+    job_queue.stop()
+    python_runner.close_runner()
+
+
+@app.on_event("shutdown")
+async def stop_classroom_backend():
+    await pubsub_manager.close()
+
+
 @app.exception_handler(AuthJWTException)
 def authjwt_exception_handler(_, exc: AuthJWTException):
     return JSONResponse(status_code=exc.status_code, content={"error": exc.message})
@@ -141,12 +168,11 @@ def authjwt_exception_handler(_, exc: AuthJWTException):
 
 @app.websocket("/ws/{classroom_id}")
 async def websocket_endpoint(websocket: WebSocket, classroom_id: int):
-    await conn_manager.connect(websocket=websocket, classroom_id=classroom_id)
+    connection_id = await pubsub_manager.connect(classroom_id=classroom_id, websocket=websocket)
     try:
         while True:
             resp = await websocket.receive_text()
-            await payload_handler.process_message(payload=json.loads(resp), classroom_id=classroom_id, websocket=websocket)
+            await pubsub_manager.publish_message(classroom_id=classroom_id, payload=json.loads(resp), connection_id=connection_id)
 
     except WebSocketDisconnect:
-        if class_manager.get_classroom(classroom_id=classroom_id):
-            await conn_manager.disconnect(websocket=websocket, classroom_id=classroom_id)
+        await pubsub_manager.disconnect(classroom_id=classroom_id, connection_id=connection_id)
@@ -1,4 +1,14 @@
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+)
 from sqlalchemy.orm import relationship
 from passlib.hash import bcrypt_sha256
 from app.db.session import Base
@@ -29,6 +39,9 @@ class User(Base):
 
 class EnrolledCourses(Base):
     __tablename__ = "enrolled_courses"
+    __table_args__ = (
+        Index("ix_enrolled_courses_user_id_course_id", "user_id", "course_id"),
+    )
     id = Column(Integer, primary_key=True)
     course_id = Column(Integer, ForeignKey("courses.id", ondelete="CASCADE"))
     user_id = Column(Integer, ForeignKey("user.id"))
@@ -55,6 +68,10 @@ class Courses(Base):
 
 class CourseTags(Base):
     __tablename__ = "course_tags"
+    __table_args__ = (
+        Index("ix_course_tags_course_id_name", "course_id", "name"),
+        Index("ix_course_tags_name", "name"),
+    )
     id = Column(Integer, primary_key=True)
     course_id = Column(Integer, ForeignKey("courses.id", ondelete="CASCADE"))
     name = Column(String(100), nullable=False)
@@ -62,6 +79,10 @@ class CourseTags(Base):
 
 class Lessons(Base):
     __tablename__ = "lessons"
+    __table_args__ = (
+        Index("ix_lessons_course_id_order", "course_id", "order"),
+        Index("ix_lessons_order_id", "order", "id"),
+    )
     id = Column(Integer, primary_key=True)
     name = Column(String(100))
     description = Column(Text)
@@ -74,6 +95,10 @@ class Lessons(Base):
 
 class EnrolledLessons(Base):
     __tablename__ = "enrolled_lessons"
+    __table_args__ = (
+        Index("ix_enrolled_lessons_user_id_lesson_id", "user_id", "lesson_id"),
+        Index("ix_enrolled_lessons_user_id_completed", "user_id", "completed"),
+    )
     id = Column(Integer, primary_key=True)
     lesson_id = Column(Integer, ForeignKey("lessons.id", ondelete="CASCADE"))
     enrolled_course_id = Column(
@@ -96,6 +121,10 @@ class Answers(Base):
 
 class AnswersHistory(Base):
     __tablename__ = "answers_history"
+    __table_args__ = (
+        Index("ix_answers_history_user_id_is_correct", "user_id", "is_correct"),
+        Index("ix_answers_history_user_id_lesson_id", "user_id", "lesson_id"),
+    )
     id = Column(Integer, primary_key=True)
     answer_id = Column(Integer, ForeignKey("answers.id", ondelete="CASCADE"))
     lesson_id = Column(Integer, ForeignKey("lessons.id", ondelete="CASCADE"))
@@ -114,6 +143,13 @@ class Roles(Base):
 
 class DynamicCourseSurveyUserResults(Base):
     __tablename__ = "dynamic_course_survey_user_results"
+    __table_args__ = (
+        Index(
+            "ix_dynamic_course_survey_user_results_user_id_survey_id",
+            "user_id",
+            "survey_id",
+        ),
+    )
     id = Column(Integer, primary_key=True)
     survey_id = Column(
         Integer, ForeignKey("dynamic_course_survey.id", ondelete="CASCADE")
@@ -168,6 +204,9 @@ class DynamicCourseSurvey(Base):
 
 class DynamicLessons(Base):
     __tablename__ = "dynamic_lessons"
+    __table_args__ = (
+        Index("ix_dynamic_lessons_user_id_lesson_id", "user_id", "lesson_id"),
+    )
     id = Column(Integer, primary_key=True)
     dynamic_course_id = Column(Integer, ForeignKey("dynamic_courses.id"))
     lesson_id = Column(Integer, ForeignKey("lessons.id"))
@@ -212,6 +251,13 @@ class KnowledgeTest(Base):
 
 class KnowledgeTestUserResults(Base):
     __tablename__ = "knowledge_test_user_results"
+    __table_args__ = (
+        Index(
+            "ix_knowledge_test_user_results_user_id_knowledge_test_id",
+            "user_id",
+            "knowledge_test_id",
+        ),
+    )
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("user.id"))
     knowledge_test_id = Column(
@@ -249,6 +295,13 @@ class GlobalKnowledgeTestQuestions(Base):
 
 class GlobalKnowledgeTestUserResults(Base):
     __tablename__ = "global_knowledge_test_user_results"
+    __table_args__ = (
+        Index(
+            "ix_global_knowledge_test_user_results_user_id_test_id",
+            "user_id",
+            "global_knowledge_test_id",
+        ),
+    )
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("user.id"))
     global_knowledge_test_id = Column(
@@ -264,6 +317,7 @@ class GlobalKnowledgeTestUserResults(Base):
 
 class Classrooms(Base):
     __tablename__ = "classrooms"
+    __table_args__ = (Index("ix_classrooms_access_code", "access_code"),)
     id = Column(Integer, primary_key=True)
     name = Column(String(50))
     teacher_id = Column(Integer, ForeignKey("user.id"))
@@ -274,8 +328,50 @@ class Classrooms(Base):
 
 class ClassroomSessions(Base):
     __tablename__ = "classroom_sessions"
+    __table_args__ = (
+        Index("ix_classroom_sessions_user_id_classroom_id", "user_id", "classroom_id"),
+    )
     id = Column(Integer, primary_key=True)
     classroom_id = Column(Integer, ForeignKey("classrooms.id"))
     user_id = Column(Integer, ForeignKey("user.id"))
     is_teacher = Column(Boolean, default=False, nullable=False)
     user = relationship("User", back_populates="classroom_sessions")
+
+
+class UserStats(Base):
+    # dashboard counters, kept up to date by app.crud.user_stats
+    __tablename__ = "user_stats"
+    user_id = Column(
+        Integer, ForeignKey("user.id", ondelete="CASCADE"), primary_key=True
+    )
+    completed_lessons_count = Column(Integer, default=0, nullable=False)
+    enrolled_lessons_count = Column(Integer, default=0, nullable=False)
+    enrolled_courses_count = Column(Integer, default=0, nullable=False)
+    dynamic_courses_count = Column(Integer, default=0, nullable=False)
+    correct_answers_count = Column(Integer, default=0, nullable=False)
+    incorrect_answers_count = Column(Integer, default=0, nullable=False)
+
+
+class SimilarCourses(Base):
+    # item-item similarity from enrollments, rebuilt offline by
+    # rebuild_recommendations.py, the top rows per course only
+    __tablename__ = "similar_courses"
+    course_id = Column(
+        Integer, ForeignKey("courses.id", ondelete="CASCADE"), primary_key=True
+    )
+    similar_course_id = Column(
+        Integer, ForeignKey("courses.id", ondelete="CASCADE"), primary_key=True
+    )
+    score = Column(Float, nullable=False)
+
+
+class SimilarLessons(Base):
+    # item-item similarity from lesson progress and answers, see SimilarCourses
+    __tablename__ = "similar_lessons"
+    lesson_id = Column(
+        Integer, ForeignKey("lessons.id", ondelete="CASCADE"), primary_key=True
+    )
+    similar_lesson_id = Column(
+        Integer, ForeignKey("lessons.id", ondelete="CASCADE"), primary_key=True
+    )
+    score = Column(Float, nullable=False)
@@ -0,0 +1,98 @@
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, List, Mapping, Optional, Sequence, Tuple, Union
+from fastapi import Query
+from sqlalchemy import and_, or_
+from app import settings
+
+
+def encode_cursor(*values: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[int]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as err:
+        raise ValueError("Invalid cursor") from err
+    if (
+        not isinstance(values, list)
+        or len(values) != size
+        or not all(isinstance(value, int) for value in values)
+    ):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def after_keys(columns: Sequence, values: Sequence[int]):
+    # (a, b) > (x, y) spelled out so MySQL can use the index on the leading key
+    column, value = columns[0], values[0]
+    if len(columns) == 1:
+        return column > value
+    return or_(
+        column > value, and_(column == value, after_keys(columns[1:], values[1:]))
+    )
+
+
+def select_fields(fields: Optional[str], available: Sequence[str]) -> List[str]:
+    if fields is None:
+        return list(available)
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested.difference(available)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    if not requested:
+        raise ValueError("No fields selected")
+    return [field for field in available if field in requested]
+
+
+@dataclass
+class PageParams:
+    after: Optional[str]
+    limit: Optional[int]
+    fields: Optional[str]
+
+    @property
+    def paginated(self) -> bool:
+        # a request without after or limit keeps getting the whole list
+        return self.after is not None or self.limit is not None
+
+    @property
+    def size(self) -> Optional[int]:
+        if not self.paginated:
+            return None
+        return self.limit or settings.PAGE_SIZE_DEFAULT
+
+    def after_values(self, size: int) -> Optional[List[int]]:
+        return decode_cursor(self.after, size) if self.after is not None else None
+
+    def select_fields(self, available: Sequence[str]) -> List[str]:
+        return select_fields(self.fields, available)
+
+
+def page_params(
+    after: Union[str, None] = Query(
+        default=None, title="next cursor of the previous page"
+    ),
+    limit: Union[int, None] = Query(default=None, gt=0, le=settings.PAGE_SIZE_MAX),
+    fields: Union[str, None] = Query(
+        default=None, title="comma separated fields to return"
+    ),
+) -> PageParams:
+    return PageParams(after=after, limit=limit, fields=fields)
+
+
+def paginate(
+    items: list, size: Optional[int], key: Callable[[Any], Tuple[int, ...]]
+) -> Tuple[list, Optional[str]]:
+    # items are fetched with one extra row which tells whether a next page exists
+    if size is None or len(items) <= size:
+        return items, None
+    items = items[:size]
+    return items, encode_cursor(*key(items[-1]))
+
+
+def project(item: Mapping[str, Any], fields: Sequence[str]) -> dict:
+    return {field: item[field] for field in fields}
@@ -1,37 +1,90 @@
-import paramiko
+import os
+import threading
+from typing import Union
+from app import settings
+from app.python_runner.cache import RUNNER_VERSION, CachedPythonRunner, ResultCache
+from app.python_runner.local import LocalPythonRunner
+from app.python_runner.remote import RemotePythonRunner
 
 # TODO
 # Napisać parser
-# Wymyślić sposób jak wymierzyć czas żeby wywalać while nieskończone
 # tworzyć maszynę dla każdego użytkownika (napisać skrypt bashowy)
 # timeout na maszynę jesli nie używana przez jakiś czas
 # try except na parse
 
+PythonRunner = Union[LocalPythonRunner, RemotePythonRunner, CachedPythonRunner]
 
-class RemotePythonRunner:
-    def connect(self, username: str):
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect("10.179.8.194", username="test", password="test")
-        return ssh
+_runner: Union[PythonRunner, None] = None
+_runner_lock = threading.Lock()
 
-    def put_code(self, ssh, data):
-        sftp = ssh.open_sftp()
-        f = sftp.open("script.py", "w")
-        f.write(data)
-        f.close()
 
-    def run_code(self, code: str, username: str = "test"):
-        ssh = self.connect(username)
-        self.put_code(ssh, code)
+def create_backend() -> Union[LocalPythonRunner, RemotePythonRunner]:
+    if settings.PYTHON_RUNNER_BACKEND == "local":
+        return LocalPythonRunner(
+            pool_size=settings.PYTHON_RUNNER_POOL_SIZE,
+            timeout=settings.PYTHON_RUNNER_TIMEOUT,
+            memory_limit_mb=settings.PYTHON_RUNNER_MEMORY_LIMIT_MB,
+            max_output_bytes=settings.PYTHON_RUNNER_MAX_OUTPUT_BYTES,
+            user=settings.PYTHON_RUNNER_LOCAL_USER,
+            secret_files=[os.path.join(settings.BASE_DIR, ".env")],
+            insecure=settings.PYTHON_RUNNER_LOCAL_INSECURE,
+        )
+    if settings.PYTHON_RUNNER_BACKEND == "ssh":
+        return RemotePythonRunner(
+            host=settings.PYTHON_RUNNER_SSH_HOST,
+            username=settings.PYTHON_RUNNER_SSH_USERNAME,
+            password=settings.PYTHON_RUNNER_SSH_PASSWORD,
+            pool_size=settings.PYTHON_RUNNER_POOL_SIZE,
+            timeout=settings.PYTHON_RUNNER_TIMEOUT,
+            max_output_bytes=settings.PYTHON_RUNNER_MAX_OUTPUT_BYTES,
+        )
+    raise ValueError(f"Unknown python runner backend: {settings.PYTHON_RUNNER_BACKEND}")
 
-        stdin, stdout, stderr = ssh.exec_command("python3 script_run.py")
-        stdin.close()
-        text = stdout.readlines()
-        err = stderr.readlines()
 
-        if len(err):
-            del err[0:11]
+def create_runner() -> PythonRunner:
+    runner = create_backend()
+    if settings.PYTHON_RUNNER_CACHE_SIZE <= 0:
+        return runner
+    # anything that changes what a script prints has to be part of the key
+    runner_version = ":".join(
+        str(part)
+        for part in (
+            RUNNER_VERSION,
+            settings.PYTHON_RUNNER_BACKEND,
+            settings.PYTHON_RUNNER_TIMEOUT,
+            settings.PYTHON_RUNNER_MEMORY_LIMIT_MB,
+            settings.PYTHON_RUNNER_MAX_OUTPUT_BYTES,
+        )
+    )
+    return CachedPythonRunner(
+        runner,
+        ResultCache(
+            max_size=settings.PYTHON_RUNNER_CACHE_SIZE,
+            ttl=settings.PYTHON_RUNNER_CACHE_TTL,
+        ),
+        runner_version,
+    )
 
-        ssh.close()
-        return "".join(text), "".join(err)
+
+def get_runner() -> PythonRunner:
+    global _runner  # pylint: disable=W0603
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = create_runner()
+    return _runner
+
+
+def cache_stats() -> Union[dict, None]:
+    runner = get_runner()
+    if isinstance(runner, CachedPythonRunner):
+        return runner.cache.stats()
+    return None
+
+
+def close_runner():
+    global _runner  # pylint: disable=W0603
+    with _runner_lock:
+        if _runner is not None:
+            _runner.close()
+            _runner = None
@@ -0,0 +1,182 @@
+import asyncio
+import datetime
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+from starlette.concurrency import run_in_threadpool
+from app import settings, python_runner
+
+
+class JobStatus:
+    QUEUED = "queued"
+    RUNNING = "running"
+    FINISHED = "finished"
+    FAILED = "failed"
+
+
+class JobRejectedError(Exception):
+    pass
+
+
+class PlaygroundJob:
+    def __init__(
+        self,
+        owner: str,
+        code: str,
+        classroom_id: Optional[int] = None,
+        stream: bool = False,
+    ):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.code = code
+        self.classroom_id = classroom_id
+        self.status = JobStatus.QUEUED
+        self.stdout = ""
+        self.stderr = ""
+        self.created_at = datetime.datetime.now()
+        self.finished_at: Optional[datetime.datetime] = None
+        self.done = asyncio.Event()
+        self.on_finished: Optional[Callable[["PlaygroundJob"], Awaitable]] = None
+        # (stream, text) chunks while the job runs, None once it is done
+        self.output: Optional[asyncio.Queue] = asyncio.Queue() if stream else None
+
+    async def wait(self):
+        await self.done.wait()
+
+    def to_json(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "content": self.stdout,
+            "error": self.stderr or None,
+            "created_at": str(self.created_at),
+            "finished_at": str(self.finished_at) if self.finished_at else None,
+        }
+
+
+class JobQueue:
+    def __init__(
+        self,
+        max_queued_jobs: int,
+        workers: int,
+        jobs_per_user: int,
+        finished_jobs_kept: int,
+    ):
+        self.max_queued_jobs = max_queued_jobs
+        self.workers = workers
+        self.jobs_per_user = jobs_per_user
+        self.finished_jobs_kept = finished_jobs_kept
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: list[asyncio.Task] = []
+        self._jobs: "OrderedDict[str, PlaygroundJob]" = OrderedDict()
+        self._active_per_user: Dict[str, int] = {}
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self.stop()
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_queued_jobs)
+        self._tasks = [
+            loop.create_task(self._worker(self._queue)) for _ in range(self.workers)
+        ]
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self._queue = None
+        self._loop = None
+
+    def get_job(self, job_id: str) -> Optional[PlaygroundJob]:
+        return self._jobs.get(job_id)
+
+    def submit(
+        self,
+        owner: str,
+        code: str,
+        classroom_id: Optional[int] = None,
+        on_finished: Optional[Callable[[PlaygroundJob], Awaitable]] = None,
+        stream: bool = False,
+    ) -> PlaygroundJob:
+        self.start()
+        if self._active_per_user.get(owner, 0) >= self.jobs_per_user:
+            raise JobRejectedError("Too many running jobs, wait for them to finish")
+
+        job = PlaygroundJob(
+            owner=owner, code=code, classroom_id=classroom_id, stream=stream
+        )
+        job.on_finished = on_finished
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull as err:
+            raise JobRejectedError("Playground is busy, try again later") from err
+
+        self._active_per_user[owner] = self._active_per_user.get(owner, 0) + 1
+        self._jobs[job.id] = job
+        self._forget_finished_jobs()
+        return job
+
+    def _forget_finished_jobs(self):
+        while len(self._jobs) > self.finished_jobs_kept:
+            oldest_id = next(iter(self._jobs))
+            if not self._jobs[oldest_id].done.is_set():
+                break
+            self._jobs.pop(oldest_id)
+
+    def _release(self, job: PlaygroundJob):
+        active = self._active_per_user.get(job.owner, 1) - 1
+        if active > 0:
+            self._active_per_user[job.owner] = active
+        else:
+            self._active_per_user.pop(job.owner, None)
+
+    def _output_callback(self, job: PlaygroundJob):
+        if job.output is None:
+            return None
+        loop = asyncio.get_running_loop()
+
+        # called from the runner thread
+        def on_output(stream: str, text: str):
+            loop.call_soon_threadsafe(job.output.put_nowait, (stream, text))
+
+        return on_output
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            job = await queue.get()
+            job.status = JobStatus.RUNNING
+            try:
+                job.stdout, job.stderr = await run_in_threadpool(
+                    python_runner.get_runner().run_code,
+                    job.code,
+                    job.owner,
+                    self._output_callback(job),
+                )
+                job.status = JobStatus.FINISHED
+            except Exception as err:  # pylint: disable=W0703
+                job.stderr = str(err)
+                job.status = JobStatus.FAILED
+            finally:
+                job.finished_at = datetime.datetime.now()
+                self._release(job)
+                job.done.set()
+                if job.output is not None:
+                    job.output.put_nowait(None)
+                queue.task_done()
+
+            if job.on_finished is not None:
+                try:
+                    await job.on_finished(job)
+                except Exception:  # pylint: disable=W0703
+                    pass
+
+
+job_queue = JobQueue(
+    max_queued_jobs=settings.PLAYGROUND_MAX_QUEUED_JOBS,
+    workers=settings.PLAYGROUND_WORKERS,
+    jobs_per_user=settings.PLAYGROUND_JOBS_PER_USER,
+    finished_jobs_kept=settings.PLAYGROUND_FINISHED_JOBS_KEPT,
+)
@@ -0,0 +1,222 @@
+import codecs
+import os
+import pwd
+import queue
+import selectors
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "worker.py")
+# passed with -c, the sandbox account need not be able to read the app tree
+with open(WORKER_SCRIPT, encoding="utf-8") as worker_file:
+    WORKER_SOURCE = worker_file.read()
+CHUNK_SIZE = 4096
+
+
+class SandboxError(ValueError):
+    pass
+
+
+def readable_by(path: str, uid: int, gids: Iterable[int]) -> bool:
+    # whether the account could open path for reading, following the
+    # permission bits of the file and of every directory above it
+    if uid == 0:
+        return True
+    gids = set(gids)
+
+    def allowed(st: os.stat_result, owner_bit: int, group_bit: int, other_bit: int):
+        if st.st_uid == uid:
+            return bool(st.st_mode & owner_bit)
+        if st.st_gid in gids:
+            return bool(st.st_mode & group_bit)
+        return bool(st.st_mode & other_bit)
+
+    path = os.path.abspath(path)
+    directory = os.path.dirname(path)
+    while True:
+        if not allowed(os.stat(directory), stat.S_IXUSR, stat.S_IXGRP, stat.S_IXOTH):
+            return False
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            break
+        directory = parent
+    return allowed(os.stat(path), stat.S_IRUSR, stat.S_IRGRP, stat.S_IROTH)
+
+
+class LocalPythonRunner:
+    def __init__(
+        self,
+        pool_size: int,
+        timeout: int,
+        memory_limit_mb: int,
+        max_output_bytes: int,
+        user: Optional[str] = None,
+        secret_files: Iterable[str] = (),
+        insecure: bool = False,
+    ):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.max_output_bytes = max_output_bytes
+        self.uid, self.gid = self.resolve_user(user, secret_files, insecure)
+        # an empty directory the workers can enter but not write to
+        self._workdir = tempfile.mkdtemp(prefix="python-runner-")
+        os.chmod(self._workdir, 0o755)
+        self._ready: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.warm_up()
+
+    @staticmethod
+    def resolve_user(user: Optional[str], secret_files: Iterable[str], insecure: bool):
+        # Student code can open any file its account can read, rlimits and a
+        # scrubbed environment do not stop it from reading .env and forging
+        # tokens with the JWT key. Workers therefore run as a separate
+        # unprivileged account which must not be able to read the secrets.
+        if not user:
+            if insecure:
+                return None, None
+            raise SandboxError(
+                "The local python runner needs PYTHON_RUNNER_LOCAL_USER, "
+                "running student code as the API user is for development only"
+            )
+        try:
+            account = pwd.getpwnam(user)
+        except KeyError as err:
+            raise SandboxError(f"Unknown python runner user: {user}") from err
+        if account.pw_uid in (0, os.geteuid()):
+            raise SandboxError(
+                "The python runner user has to differ from root and the API user"
+            )
+        for path in secret_files:
+            if os.path.exists(path) and readable_by(
+                path, account.pw_uid, [account.pw_gid]
+            ):
+                raise SandboxError(f"The python runner user can read {path}")
+        return account.pw_uid, account.pw_gid
+
+    def spawn_worker(self) -> subprocess.Popen:
+        sandbox = {}
+        if self.uid is not None:
+            sandbox = {"user": self.uid, "group": self.gid, "extra_groups": []}
+        return subprocess.Popen(
+            [
+                sys.executable,
+                # not -I, it would ignore PYTHONHASHSEED. The environment is
+                # built below and the working directory is empty, so neither
+                # can put anything on sys.path.
+                "-s",
+                "-c",
+                WORKER_SOURCE,
+                str(self.timeout),
+                str(self.memory_limit_mb),
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=self._workdir,
+            # the environment holds the db uri and jwt key, the worker gets none,
+            # a fixed hash seed keeps set order, and so cached output, stable
+            env={"PYTHONIOENCODING": "utf-8", "PYTHONHASHSEED": "0"},
+            **sandbox,
+        )
+
+    def warm_up(self):
+        with self._lock:
+            while not self._closed and self._ready.qsize() < self.pool_size:
+                self._ready.put(self.spawn_worker())
+
+    def acquire_worker(self) -> subprocess.Popen:
+        while True:
+            try:
+                worker = self._ready.get_nowait()
+            except queue.Empty:
+                worker = self.spawn_worker()
+            # workers are single use, start the replacement right away
+            self.warm_up()
+            if worker.poll() is None:
+                return worker
+
+    def run_code(
+        self,
+        code: str,
+        username: str = "test",
+        on_output: Optional[Callable[[str, str], None]] = None,
+    ):
+        output = {"stdout": [], "stderr": []}
+
+        def emit(stream: str, text: str):
+            if text:
+                output[stream].append(text)
+                if on_output is not None:
+                    on_output(stream, text)
+
+        worker = self.acquire_worker()
+        try:
+            worker.stdin.write(code.encode("utf-8"))
+            worker.stdin.close()
+        except BrokenPipeError:
+            pass
+
+        streams = {
+            worker.stdout: ("stdout", codecs.getincrementaldecoder("utf-8")("replace")),
+            worker.stderr: ("stderr", codecs.getincrementaldecoder("utf-8")("replace")),
+        }
+        selector = selectors.DefaultSelector()
+        for pipe in streams:
+            selector.register(pipe, selectors.EVENT_READ)
+
+        deadline = time.monotonic() + self.timeout
+        total_bytes = 0
+        error = None
+        while selector.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                error = f"TimeoutError: execution exceeded {self.timeout} seconds\n"
+                break
+            for key, _ in selector.select(timeout=remaining):
+                stream, decoder = streams[key.fileobj]
+                data = os.read(key.fileobj.fileno(), CHUNK_SIZE)
+                if not data:
+                    selector.unregister(key.fileobj)
+                    emit(stream, decoder.decode(b"", final=True))
+                    continue
+                data = data[: self.max_output_bytes - total_bytes]
+                total_bytes += len(data)
+                emit(stream, decoder.decode(data))
+                if total_bytes >= self.max_output_bytes:
+                    error = (
+                        f"OutputLimitError: output exceeded "
+                        f"{self.max_output_bytes} bytes\n"
+                    )
+                    break
+            if error:
+                break
+
+        selector.close()
+        if error:
+            worker.kill()
+            emit("stderr", error)
+        worker.stdout.close()
+        worker.stderr.close()
+        worker.wait()
+
+        return "".join(output["stdout"]), "".join(output["stderr"])
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        shutil.rmtree(self._workdir, ignore_errors=True)
+        while True:
+            try:
+                worker = self._ready.get_nowait()
+            except queue.Empty:
+                break
+            worker.kill()
+            worker.communicate()
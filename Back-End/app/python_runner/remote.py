@@ -0,0 +1,160 @@
+import codecs
+import queue
+import select
+import time
+import uuid
+from typing import Callable, Optional
+import paramiko
+
+CHUNK_SIZE = 4096
+
+
+class RemotePythonRunner:
+    def __init__(
+        self,
+        host: str,
+        username: str,
+        password: str,
+        pool_size: int,
+        timeout: int,
+        max_output_bytes: int,
+    ):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.max_output_bytes = max_output_bytes
+        self._pool: queue.LifoQueue = queue.LifoQueue(maxsize=pool_size)
+
+    def connect(self):
+        ssh = paramiko.SSHClient()
+        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        ssh.connect(self.host, username=self.username, password=self.password)
+        return ssh
+
+    def acquire_connection(self):
+        while True:
+            try:
+                ssh = self._pool.get_nowait()
+            except queue.Empty:
+                return self.connect()
+            transport = ssh.get_transport()
+            if transport is not None and transport.is_active():
+                return ssh
+            ssh.close()
+
+    def release_connection(self, ssh):
+        try:
+            self._pool.put_nowait(ssh)
+        except queue.Full:
+            ssh.close()
+
+    def put_code(self, ssh, data, filename: str):
+        sftp = ssh.open_sftp()
+        f = sftp.open(filename, "w")
+        f.write(data)
+        f.close()
+        sftp.close()
+
+    def kill_script(self, ssh, filename: str):
+        channel = ssh.get_transport().open_session()
+        # only the interpreter, the shell around it still removes the file
+        channel.exec_command(f"pkill -KILL -f '^python3 script_run.py {filename}$'")
+        channel.recv_exit_status()
+        channel.close()
+
+    def run_code(
+        self,
+        code: str,
+        username: str = "test",
+        on_output: Optional[Callable[[str, str], None]] = None,
+    ):
+        output = {"stdout": [], "stderr": []}
+        decoders = {
+            "stdout": codecs.getincrementaldecoder("utf-8")("replace"),
+            "stderr": codecs.getincrementaldecoder("utf-8")("replace"),
+        }
+
+        def emit(stream: str, text: str):
+            if text:
+                output[stream].append(text)
+                if on_output is not None:
+                    on_output(stream, text)
+
+        ssh = self.acquire_connection()
+        reusable = False
+        try:
+            # pooled connections run concurrently, so every run gets its own file
+            filename = f"script_{uuid.uuid4().hex}.py"
+            self.put_code(ssh, code, filename)
+
+            channel = ssh.get_transport().open_session()
+            # A fixed hash seed keeps set order, and so cached output, stable.
+            # timeout bounds the run even if the kill below never arrives.
+            channel.exec_command(
+                f"PYTHONHASHSEED=0 timeout -s KILL {self.timeout + 1} "
+                f"python3 script_run.py {filename}; rm -f {filename}"
+            )
+            channel.shutdown_write()
+
+            deadline = time.monotonic() + self.timeout
+            total_bytes = 0
+            error = None
+            while error is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    error = f"TimeoutError: execution exceeded {self.timeout} seconds\n"
+                    break
+                select.select([channel], [], [], min(remaining, 0.1))
+
+                received = False
+                for stream, recv_ready, recv in (
+                    ("stdout", channel.recv_ready, channel.recv),
+                    ("stderr", channel.recv_stderr_ready, channel.recv_stderr),
+                ):
+                    if not recv_ready():
+                        continue
+                    received = True
+                    data = recv(CHUNK_SIZE)[: self.max_output_bytes - total_bytes]
+                    total_bytes += len(data)
+                    emit(stream, decoders[stream].decode(data))
+                    if total_bytes >= self.max_output_bytes:
+                        error = (
+                            f"OutputLimitError: output exceeded "
+                            f"{self.max_output_bytes} bytes\n"
+                        )
+                        break
+
+                if (
+                    not received
+                    and channel.exit_status_ready()
+                    and not channel.recv_ready()
+                    and not channel.recv_stderr_ready()
+                ):
+                    break
+
+            channel.close()
+            if error:
+                # closing the channel leaves the remote process running
+                self.kill_script(ssh, filename)
+            reusable = True
+        finally:
+            # a run that failed half way leaves the connection in an unknown state
+            if reusable:
+                self.release_connection(ssh)
+            else:
+                ssh.close()
+
+        for stream, decoder in decoders.items():
+            emit(stream, decoder.decode(b"", final=True))
+        if error:
+            emit("stderr", error)
+
+        return "".join(output["stdout"]), "".join(output["stderr"])
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
@@ -0,0 +1,56 @@
+# Sandbox worker started by LocalPythonRunner, run as a standalone script:
+#   python3 -s -c "$(cat worker.py)" <cpu_seconds> <memory_mb>
+# The process is spawned ahead of time and blocks on stdin until the runner
+# hands it a script, so a run only pays for the dispatch. It runs as the
+# PYTHON_RUNNER_LOCAL_USER account, the limits below only bound resources.
+# Keep it free of app imports, it must start on a bare interpreter.
+import re
+import resource
+import sys
+import traceback
+
+# same policy as lxd_script_run.py on the remote sandbox host
+ILLEGAL_KEYWORDS = ["import", "eval"]
+
+
+def set_limits(cpu_seconds: int, memory_mb: int):
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+    memory = memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+
+
+def search_for_illegal(code: str):
+    for line in code.splitlines():
+        for regex in ILLEGAL_KEYWORDS:
+            search = re.search(regex, line)
+            if search:
+                return search.group()
+    return None
+
+
+def exec_script(code: str):
+    try:
+        exec(compile(code, "script.py", "exec"), {"__name__": "__main__"})
+    except SystemExit:
+        # exit() and sys.exit() end the script quietly, as they would outside
+        raise
+    except BaseException:  # pylint: disable=W0703
+        etype, value, tb = sys.exc_info()
+        # skip this frame so the student only sees their own traceback
+        traceback.print_exception(etype, value, tb.tb_next)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    script = sys.stdin.read()
+    set_limits(int(sys.argv[1]), int(sys.argv[2]))
+    # flush every line so the runner can stream output while the script runs
+    sys.stdout.reconfigure(line_buffering=True)
+
+    err = search_for_illegal(script)
+    if err is None:
+        exec_script(script)
+    else:
+        print("Illegal keyword detected: " + err)
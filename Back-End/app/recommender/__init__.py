@@ -0,0 +1,4 @@
+from app import settings
+from app.recommender.tags import CourseTagIndex
+
+course_tag_index = CourseTagIndex(ttl=settings.RECOMMENDER_INDEX_TTL)
@@ -0,0 +1,119 @@
+from collections import defaultdict
+from typing import Dict, List, Tuple
+from sqlalchemy import Integer, cast, func, insert
+from sqlalchemy.orm import Session
+from app import models
+
+# (user id, item id) -> how strongly the user engaged with the item
+Interactions = Dict[Tuple[int, int], float]
+
+
+def course_interactions(db: Session) -> Interactions:
+    return {
+        (user_id, course_id): 1.0
+        for user_id, course_id in db.query(
+            models.EnrolledCourses.user_id, models.EnrolledCourses.course_id
+        ).filter(models.EnrolledCourses.user_id.isnot(None))
+    }
+
+
+def lesson_interactions(db: Session) -> Interactions:
+    # an enrolled or answered lesson counts 1, a completed one or one with a
+    # correct answer 2
+    interactions = defaultdict(float)
+    for user_id, lesson_id, completed in db.query(
+        models.EnrolledLessons.user_id,
+        models.EnrolledLessons.lesson_id,
+        models.EnrolledLessons.completed,
+    ).filter(models.EnrolledLessons.user_id.isnot(None)):
+        key = (user_id, lesson_id)
+        interactions[key] = max(interactions[key], 2.0 if completed else 1.0)
+    for user_id, lesson_id, correct in (
+        db.query(
+            models.AnswersHistory.user_id,
+            models.AnswersHistory.lesson_id,
+            func.max(cast(models.AnswersHistory.is_correct, Integer)),
+        )
+        .filter(
+            models.AnswersHistory.user_id.isnot(None),
+            models.AnswersHistory.lesson_id.isnot(None),
+        )
+        .group_by(models.AnswersHistory.user_id, models.AnswersHistory.lesson_id)
+    ):
+        key = (user_id, lesson_id)
+        interactions[key] = max(interactions[key], 2.0 if correct else 1.0)
+    return interactions
+
+
+def item_similarities(
+    interactions: Interactions, top_n: int
+) -> List[Tuple[int, int, float]]:
+    # (item id, similar item id, score) with the top_n most similar items of
+    # every item, by the cosine similarity of their user columns
+    # numpy and scipy are only needed by the offline rebuild
+    import numpy as np
+    from scipy import sparse
+
+    if not interactions or top_n <= 0:
+        return []
+    user_ids, item_ids = zip(*interactions)
+    users, user_index = np.unique(user_ids, return_inverse=True)
+    items, item_index = np.unique(item_ids, return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.fromiter(interactions.values(), dtype=float), (user_index, item_index)),
+        shape=(len(users), len(items)),
+    )
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    normalized = matrix @ sparse.diags(1 / np.where(norms > 0, norms, 1))
+    similarity = (normalized.T @ normalized).tocsr()
+    similarity.setdiag(0)
+    similarity.eliminate_zeros()
+
+    similarities = []
+    for item in range(similarity.shape[0]):
+        start, end = similarity.indptr[item], similarity.indptr[item + 1]
+        scores = similarity.data[start:end]
+        neighbours = similarity.indices[start:end]
+        if len(scores) > top_n:
+            top = np.argpartition(-scores, top_n - 1)[:top_n]
+            scores, neighbours = scores[top], neighbours[top]
+        similarities.extend(
+            (int(items[item]), int(items[neighbour]), float(score))
+            for neighbour, score in zip(neighbours, scores)
+        )
+    return similarities
+
+
+def rebuild_recommendations(db: Session, top_n: int) -> Tuple[int, int]:
+    # Recomputes the similar_courses and similar_lessons tables from the whole
+    # history, committing is left to the caller so readers keep the previous
+    # rows until the new ones are complete.
+    similar_courses = item_similarities(course_interactions(db), top_n)
+    similar_lessons = item_similarities(lesson_interactions(db), top_n)
+    db.query(models.SimilarCourses).delete(synchronize_session=False)
+    db.query(models.SimilarLessons).delete(synchronize_session=False)
+    if similar_courses:
+        db.execute(
+            insert(models.SimilarCourses),
+            [
+                {
+                    "course_id": course_id,
+                    "similar_course_id": similar_id,
+                    "score": score,
+                }
+                for course_id, similar_id, score in similar_courses
+            ],
+        )
+    if similar_lessons:
+        db.execute(
+            insert(models.SimilarLessons),
+            [
+                {
+                    "lesson_id": lesson_id,
+                    "similar_lesson_id": similar_id,
+                    "score": score,
+                }
+                for lesson_id, similar_id, score in similar_lessons
+            ],
+        )
+    return len(similar_courses), len(similar_lessons)
@@ -0,0 +1,157 @@
+import heapq
+import math
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from app import models
+
+
+# Course tags held in memory for tag based recommendations. Every course keeps
+# its tags (course -> tag vector) and every tag name the courses carrying it
+# (inverted index), so the candidates for a user come from the tags of their
+# enrolled courses without a query. Candidates are ranked by the cosine
+# similarity of tf-idf weighted tags, a tag few courses share says more about
+# a course than a common one.
+class CourseTagIndex:
+    def __init__(self, ttl: int):
+        # edits made by other workers are picked up on the next load
+        self.ttl = ttl
+        self._loaded_at: Optional[float] = None
+        self._langs: Dict[int, Optional[str]] = {}
+        # course id -> {tag id: tag name}
+        self._course_tags: Dict[int, Dict[int, str]] = {}
+        # tag name -> ids of the courses carrying it
+        self._tag_courses: Dict[str, Set[int]] = defaultdict(set)
+        # tag id -> id of its course
+        self._tag_course: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def load(self, db: Session):
+        langs = dict(db.query(models.Courses.id, models.Courses.lang))
+        tags = (
+            db.query(
+                models.CourseTags.id,
+                models.CourseTags.course_id,
+                models.CourseTags.name,
+            )
+            .filter(models.CourseTags.course_id.in_(db.query(models.Courses.id)))
+            .all()
+        )
+        with self._lock:
+            self._langs = langs
+            self._course_tags = {course_id: {} for course_id in langs}
+            self._tag_courses = defaultdict(set)
+            self._tag_course = {}
+            for tag_id, course_id, name in tags:
+                self._add_tag(tag_id, course_id, name)
+            self._loaded_at = time.monotonic()
+
+    def ensure_loaded(self, db: Session):
+        if self._loaded_at is None or self._loaded_at + self.ttl < time.monotonic():
+            self.load(db)
+
+    def invalidate(self):
+        # the next ensure_loaded rebuilds the index from the database
+        self._loaded_at = None
+
+    def set_course(self, course_id: int, lang: Optional[str]):
+        with self._lock:
+            self._langs[course_id] = lang
+            self._course_tags.setdefault(course_id, {})
+
+    def remove_course(self, course_id: int):
+        with self._lock:
+            for tag_id in list(self._course_tags.get(course_id, {})):
+                self._remove_tag(tag_id, course_id)
+            self._course_tags.pop(course_id, None)
+            self._langs.pop(course_id, None)
+
+    def add_tag(self, tag_id: int, course_id: int, name: str):
+        with self._lock:
+            self._add_tag(tag_id, course_id, name)
+
+    def remove_tag(self, tag_id: int):
+        with self._lock:
+            course_id = self._tag_course.get(tag_id)
+            if course_id is not None:
+                self._remove_tag(tag_id, course_id)
+
+    def tags_of(self, course_id: int) -> List[Tuple[int, str]]:
+        with self._lock:
+            return sorted(self._course_tags.get(course_id, {}).items())
+
+    def recommend(
+        self, course_ids: Iterable[int], limit: int
+    ) -> List[Tuple[int, float]]:
+        # (course id, score) of the courses most similar to the given ones,
+        # courses in another language than all of them are left out
+        course_ids = set(course_ids)
+        with self._lock:
+            langs = {self._langs.get(course_id) for course_id in course_ids}
+            profile = Counter(
+                name
+                for course_id in course_ids
+                for name in set(self._course_tags.get(course_id, {}).values())
+            )
+            candidates = {
+                candidate_id
+                for name in profile
+                for candidate_id in self._tag_courses[name]
+                if candidate_id not in course_ids
+                and self._langs.get(candidate_id) in langs
+            }
+            idf = {
+                name: self._idf(name)
+                for name in profile.keys()
+                | {
+                    name
+                    for candidate_id in candidates
+                    for name in self._course_tags[candidate_id].values()
+                }
+            }
+            profile_weights = {
+                name: count * idf[name] for name, count in profile.items()
+            }
+            profile_norm = math.sqrt(
+                sum(weight * weight for weight in profile_weights.values())
+            )
+            scores = []
+            for candidate_id in candidates:
+                names = set(self._course_tags[candidate_id].values())
+                norm = math.sqrt(sum(idf[name] * idf[name] for name in names))
+                overlap = sum(
+                    profile_weights[name] * idf[name]
+                    for name in names
+                    if name in profile_weights
+                )
+                scores.append((overlap / (profile_norm * norm), candidate_id))
+        # the lower id wins a tie so the order does not change between calls
+        return [
+            (candidate_id, score)
+            for score, candidate_id in heapq.nsmallest(
+                limit, scores, key=lambda item: (-item[0], item[1])
+            )
+        ]
+
+    def _idf(self, name: str) -> float:
+        # smoothed so a tag carried by every course still counts a little
+        return (
+            math.log((1 + len(self._course_tags)) / (1 + len(self._tag_courses[name])))
+            + 1
+        )
+
+    def _add_tag(self, tag_id: int, course_id: int, name: str):
+        self._course_tags.setdefault(course_id, {})[tag_id] = name
+        self._tag_courses[name].add(course_id)
+        self._tag_course[tag_id] = course_id
+
+    def _remove_tag(self, tag_id: int, course_id: int):
+        del self._tag_course[tag_id]
+        tags = self._course_tags[course_id]
+        name = tags.pop(tag_id)
+        if name not in tags.values():
+            self._tag_courses[name].discard(course_id)
+            if not self._tag_courses[name]:
+                del self._tag_courses[name]
@@ -0,0 +1,107 @@
+import hashlib
+from typing import Optional
+from urllib.parse import urlencode
+from fastapi import Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from app import settings
+from app.response_cache.memory import MemoryBackend
+
+# Invalidation tags, one per kind of admin edited content
+COURSES = "courses"
+LESSONS = "lessons"
+COURSE_TAGS = "course_tags"
+SURVEYS = "surveys"
+GLOBAL_KNOWLEDGE_TESTS = "globalknowledgetests"
+
+_backend = None
+
+
+def create_backend():
+    if settings.RESPONSE_CACHE_BACKEND == "memory":
+        return MemoryBackend(max_size=settings.RESPONSE_CACHE_SIZE)
+    if settings.RESPONSE_CACHE_BACKEND == "redis":
+        # redis is only needed when the cache is shared between workers
+        from app.response_cache.broker import RedisBackend
+
+        return RedisBackend(url=settings.RESPONSE_CACHE_REDIS_URL)
+    raise ValueError(
+        f"Unknown response cache backend: {settings.RESPONSE_CACHE_BACKEND}"
+    )
+
+
+def get_backend():
+    global _backend  # pylint: disable=W0603
+    if _backend is None:
+        _backend = create_backend()
+    return _backend
+
+
+def set_backend(backend):
+    global _backend  # pylint: disable=W0603
+    _backend = backend
+
+
+def make_key(request: Request) -> str:
+    query = urlencode(sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{query}"
+
+
+def make_response(request: Request, body: bytes, etag: str) -> Response:
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match == "*" or etag in (
+        value.strip() for value in if_none_match.split(",")
+    ):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+def get_cached_response(request: Request, *tags: str) -> Optional[Response]:
+    # tags are the ones the response will be cached with, their generations are
+    # kept on a miss so cache_response can tell whether an edit happened while
+    # the response was built
+    backend = get_backend()
+    entry = backend.get(make_key(request))
+    if entry is None:
+        request.state.response_cache_generations = backend.generations(tags)
+        return None
+    return make_response(request, *entry)
+
+
+def cache_response(request: Request, response: Response, *tags: str) -> Response:
+    # only successful responses are kept, errors are rebuilt every time
+    if response.status_code != status.HTTP_200_OK:
+        return response
+    etag = f'"{hashlib.sha1(response.body).hexdigest()}"'
+    # a response built from data an admin changed in the meantime is served
+    # once but not stored, the next request builds it again
+    get_backend().set(
+        make_key(request),
+        response.body,
+        etag,
+        tags,
+        settings.RESPONSE_CACHE_TTL,
+        getattr(request.state, "response_cache_generations", {}),
+    )
+    return make_response(request, response.body, etag)
+
+
+async def get_cached_response_async(request: Request, *tags: str) -> Optional[Response]:
+    # for async routes, a shared backend makes a blocking round trip that must
+    # not hold up the event loop, the in process one is used directly
+    if not get_backend().shared:
+        return get_cached_response(request, *tags)
+    return await run_in_threadpool(get_cached_response, request, *tags)
+
+
+async def cache_response_async(
+    request: Request, response: Response, *tags: str
+) -> Response:
+    if not get_backend().shared:
+        return cache_response(request, response, *tags)
+    return await run_in_threadpool(cache_response, request, response, *tags)
+
+
+def invalidate(*tags: str):
+    get_backend().invalidate(tags)
@@ -0,0 +1,106 @@
+import json
+from typing import Dict, Iterable, Optional, Tuple
+import redis
+
+Entry = Tuple[bytes, str]
+
+KEY_PREFIX = "response-cache:"
+TAG_PREFIX = "response-cache-tag:"
+GENERATION_PREFIX = "response-cache-generation:"
+
+# Stores an entry unless one of its tags was invalidated since the response
+# was built. KEYS: the entry, its tag sets, their generations. ARGV: the
+# entry, ttl, key, tag count, the generations read before building it.
+SET_SCRIPT = """
+local count = tonumber(ARGV[4])
+for i = 1, count do
+    local current = redis.call('GET', KEYS[1 + count + i]) or '0'
+    if current ~= ARGV[4 + i] then
+        return 0
+    end
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+for i = 1, count do
+    redis.call('SADD', KEYS[1 + i], ARGV[3])
+    redis.call('EXPIRE', KEYS[1 + i], ARGV[2])
+end
+return 1
+"""
+
+# Bumps the generation of each tag and drops its entries in one step, a set
+# cannot add a key to a tag set between reading and deleting it.
+# KEYS: the tag sets, their generations. ARGV: the entry key prefix.
+INVALIDATE_SCRIPT = """
+local count = #KEYS / 2
+for i = 1, count do
+    redis.call('INCR', KEYS[count + i])
+    for _, key in ipairs(redis.call('SMEMBERS', KEYS[i])) do
+        redis.call('DEL', ARGV[1] .. key)
+    end
+    redis.call('DEL', KEYS[i])
+end
+"""
+
+
+class RedisBackend:
+    # shared by all workers, an edit in one of them invalidates everywhere
+    shared = True
+
+    def __init__(self, url: str, client=None):
+        # tests pass their own client in place of a real redis server
+        self._client = client if client is not None else redis.from_url(url)
+        self._set = self._client.register_script(SET_SCRIPT)
+        self._invalidate = self._client.register_script(INVALIDATE_SCRIPT)
+
+    def get(self, key: str) -> Optional[Entry]:
+        value = self._client.get(KEY_PREFIX + key)
+        if value is None:
+            return None
+        entry = json.loads(value)
+        return entry["body"].encode("utf-8"), entry["etag"]
+
+    def generations(self, tags: Iterable[str]) -> Dict[str, int]:
+        tags = list(tags)
+        if not tags:
+            return {}
+        values = self._client.mget([GENERATION_PREFIX + tag for tag in tags])
+        return {tag: int(value or 0) for tag, value in zip(tags, values)}
+
+    def set(
+        self,
+        key: str,
+        body: bytes,
+        etag: str,
+        tags: Iterable[str],
+        ttl: int,
+        generations: Optional[Dict[str, int]] = None,
+    ):
+        tags = list(tags)
+        if generations is None:
+            generations = self.generations(tags)
+        self._set(
+            keys=[KEY_PREFIX + key]
+            + [TAG_PREFIX + tag for tag in tags]
+            + [GENERATION_PREFIX + tag for tag in tags],
+            args=[
+                json.dumps({"body": body.decode("utf-8"), "etag": etag}),
+                ttl,
+                key,
+                len(tags),
+            ]
+            # a tag read without a generation never matches
+            + [str(generations.get(tag, -1)) for tag in tags],
+        )
+
+    def invalidate(self, tags: Iterable[str]):
+        tags = list(tags)
+        if not tags:
+            return
+        self._invalidate(
+            keys=[TAG_PREFIX + tag for tag in tags]
+            + [GENERATION_PREFIX + tag for tag in tags],
+            args=[KEY_PREFIX],
+        )
+
+    def stats(self):
+        return {"backend": "redis"}
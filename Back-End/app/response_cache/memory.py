@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+Entry = Tuple[bytes, str]
+
+
+class MemoryBackend:
+    # entries never leave the process, other workers see an edit after the ttl
+    shared = False
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # key -> (expires at, body, etag, tags)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # tag -> times it was invalidated
+        self._generations: Dict[str, int] = dict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def generations(self, tags: Iterable[str]) -> Dict[str, int]:
+        with self._lock:
+            return {tag: self._generations.get(tag, 0) for tag in tags}
+
+    def set(
+        self,
+        key: str,
+        body: bytes,
+        etag: str,
+        tags: Iterable[str],
+        ttl: int,
+        generations: Optional[Dict[str, int]] = None,
+    ):
+        # with generations the entry is only stored if none of its tags was
+        # invalidated since they were read
+        if self.max_size <= 0:
+            return
+        tags = frozenset(tags)
+        with self._lock:
+            if generations is not None and any(
+                generations.get(tag) != self._generations.get(tag, 0) for tag in tags
+            ):
+                return
+            self._entries[key] = (time.monotonic() + ttl, body, etag, tags)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tags: Iterable[str]):
+        tags = set(tags)
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+            for key in [key for key, entry in self._entries.items() if entry[3] & tags]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
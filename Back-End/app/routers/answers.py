@@ -1,17 +1,16 @@
 from datetime import datetime
-import re
 from fastapi import APIRouter, Depends, Path, status
 from fastapi.responses import JSONResponse
-from fastapi_jwt_auth import AuthJWT
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.routers import deps
-from app import models
+from app import answer_rules, models, crud
 from app.schemas.answer import (
     AnswerCheckRequest,
     AnswerCreateRequest,
     AnswerEditRequest,
 )
-from app.settings import ADMIN_ID
 
 router = APIRouter()
 
@@ -20,20 +19,8 @@ router = APIRouter()
 def create_answer(
     request_data: AnswerCreateRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
     lesson = db.query(models.Lessons).filter_by(id=request_data.data.lesson_id).first()
     if lesson is None:
         return JSONResponse(
@@ -48,6 +35,7 @@ def create_answer(
     )
     db.add(new_answer)
     db.commit()
+    answer_rules.compiled_lessons.invalidate(new_answer.lesson_id)
 
     return JSONResponse(
         status_code=status.HTTP_201_CREATED,
@@ -64,86 +52,23 @@ def create_answer(
 
 
 @router.post("/answers/check", tags=["answers"])
-def check_answer(
+async def check_answer(
     request_data: AnswerCheckRequest,
-    db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    db: AsyncSession = Depends(deps.get_async_db),
+    user: deps.CurrentUser = Depends(deps.get_async_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
-
     lesson_id = request_data.data.lesson_id
-    answers = db.query(models.Answers).filter_by(lesson_id=lesson_id).all()
-
-    answer_valid = None
-    answer_status = False
-    length_of_answers = len(answers)
-    # TODO: add answer_check_rule support for multiple answers
-    if length_of_answers > 1:
-        for answer in answers:
-            if answer.final_answer == request_data.data.answer:
-                answer_status = True
-                answer_valid = answer
-                break
-    elif length_of_answers == 1:
-        # TODO: fix support for new line characters: if contains print then remove new line character at the end
-        if request_data.data.answer is not None and answers[0].final_answer is not None:
-            request_data.data.answer = request_data.data.answer.rstrip("\n")
-            answers[0].final_answer = answers[0].final_answer.rstrip("\n")
-
-        # rules: equal, contain, isString, isInteger, isFloat, isBoolean, isTrue, isFalse, regex
-        if answers[0].answer_check_rule == "equal":
-            if answers[0].final_answer == request_data.data.answer:
-                answer_status = True
-                answer_valid = answers[0]
-        elif answers[0].answer_check_rule == "contain":
-            if answers[0].final_answer in request_data.data.answer:
-                answer_status = True
-                answer_valid = answers[0]
-        elif answers[0].answer_check_rule == "isString":
-            if isinstance(request_data.data.answer, str):
-                answer_status = True
-                answer_valid = answers[0]
-        elif answers[0].answer_check_rule == "isInteger":
-            if int(request_data.data.answer):
-                answer_status = True
-                answer_valid = answers[0]
-        elif answers[0].answer_check_rule == "isFloat":
-            if float(request_data.data.answer):
-                answer_status = True
-                answer_valid = answers[0]
-        elif answers[0].answer_check_rule == "isBoolean":
-            if bool(request_data.data.answer):
-                answer_status = True
-                answer_valid = answers[0]
-        elif answers[0].answer_check_rule == "isTrue":
-            if bool(request_data.data.answer) is True:
-                answer_status = True
-                answer_valid = answers[0]
-        elif answers[0].answer_check_rule == "isFalse":
-            if bool(request_data.data.answer) is False:
-                answer_status = True
-                answer_valid = answers[0]
-        elif answers[0].answer_check_rule == "regex":
-            if re.search(answers[0].final_answer, request_data.data.answer):
-                answer_status = True
-                answer_valid = answers[0]
-        else:
-            answer_status = False
-            answer_valid = None
+    compiled_lesson = answer_rules.compiled_lessons.get(lesson_id)
+    if compiled_lesson is None:
+        answers = (
+            (await db.execute(select(models.Answers).filter_by(lesson_id=lesson_id)))
+            .scalars()
+            .all()
+        )
+        compiled_lesson = answer_rules.compile_lesson(answers)
+        answer_rules.compiled_lessons.set(lesson_id, compiled_lesson)
 
-    else:
+    if not compiled_lesson.answers:
         return JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
             content={
@@ -151,8 +76,14 @@ def check_answer(
             },
         )
 
+    answer_valid = compiled_lesson.match(request_data.data.answer)
+    answer_status = answer_valid is not None
+    if isinstance(request_data.data.answer, list):
+        request_data.data.answer = "\n".join(map(str, request_data.data.answer))
+    request_data.data.answer = answer_rules.normalize(request_data.data.answer)
+
     answer_history = models.AnswersHistory(
-        answer_id=answers[0].id,
+        answer_id=compiled_lesson.answers[0].id,
         lesson_id=lesson_id,
         user_id=user.id,
         answer=request_data.data.answer,
@@ -160,21 +91,36 @@ def check_answer(
         date=datetime.now(),
     )
     db.add(answer_history)
-    db.commit()
+    if answer_status is True:
+        await db.run_sync(
+            crud.user_stats.increment_user_stats, user.id, correct_answers_count=1
+        )
+    else:
+        await db.run_sync(
+            crud.user_stats.increment_user_stats, user.id, incorrect_answers_count=1
+        )
+    await db.commit()
 
     if answer_status is True:
         if request_data.data.enrolled_lesson_id is not None:
             lesson_enrolled = (
-                db.query(models.EnrolledLessons)
-                .filter_by(
-                    id=request_data.data.enrolled_lesson_id,
-                    user_id=user.id,
-                    lesson_id=lesson_id,
+                await db.execute(
+                    select(models.EnrolledLessons).filter_by(
+                        id=request_data.data.enrolled_lesson_id,
+                        user_id=user.id,
+                        lesson_id=lesson_id,
+                    )
                 )
-                .first()
-            )
+            ).scalar()
+            newly_completed = not lesson_enrolled.completed
             lesson_enrolled.completed = True
-            db.commit()
+            if newly_completed:
+                await db.run_sync(
+                    crud.user_stats.increment_user_stats,
+                    user.id,
+                    completed_lessons_count=1,
+                )
+            await db.commit()
 
             return JSONResponse(
                 status_code=status.HTTP_200_OK,
@@ -190,16 +136,16 @@ def check_answer(
             )
         if request_data.data.dynamic_lesson_id is not None:
             dynamic_lesson = (
-                db.query(models.DynamicLessons)
-                .filter_by(
-                    id=request_data.data.dynamic_lesson_id,
-                    user_id=user.id,
-                    lesson_id=lesson_id,
+                await db.execute(
+                    select(models.DynamicLessons).filter_by(
+                        id=request_data.data.dynamic_lesson_id,
+                        user_id=user.id,
+                        lesson_id=lesson_id,
+                    )
                 )
-                .first()
-            )
+            ).scalar()
             dynamic_lesson.completed = True
-            db.commit()
+            await db.commit()
 
             return JSONResponse(
                 status_code=status.HTTP_200_OK,
@@ -230,20 +176,8 @@ def check_answer(
 def edit_answer(
     request_data: AnswerEditRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
     answer_id = request_data.data.answer_id
     answer_edit = models.Answers().query.filter_by(id=answer_id).first()
 
@@ -254,6 +188,7 @@ def edit_answer(
         )
 
     to_commit = False
+    previous_lesson_id = answer_edit.lesson_id
 
     if request_data.data.final_answer is not None:
         answer_edit.final_answer = request_data.data.final_answer
@@ -269,6 +204,9 @@ def edit_answer(
 
     if to_commit:
         db.commit()
+        answer_rules.compiled_lessons.invalidate(
+            previous_lesson_id, answer_edit.lesson_id
+        )
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -288,26 +226,18 @@ def edit_answer(
 def delete_answer(
     answer_id: int = Path(title="id of the answer to delete"),
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
-
     # TODO: change this after add sections + find better option to save completed courses
 
+    lesson_id = db.query(models.Answers.lesson_id).filter_by(id=answer_id).scalar()
+    # the answer history of the answer goes with it
+    user_ids = crud.user_stats.answer_user_ids(db, answer_id)
     db.query(models.Answers).filter_by(id=answer_id).delete()
+    crud.user_stats.invalidate_user_stats(db, user_ids)
 
     db.commit()
+    answer_rules.compiled_lessons.invalidate(lesson_id)
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -321,16 +251,9 @@ def delete_answer(
 @router.get("/lessons/{lesson_id}/answers", tags=["answers"])
 def get_answers(
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
     lesson_id: int = Path(title="id of the lesson"),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
     answers = db.query(models.Answers).filter_by(lesson_id=lesson_id).all()
     if answers is None:
         return JSONResponse(
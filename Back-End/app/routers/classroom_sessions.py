@@ -2,92 +2,76 @@ from datetime import datetime
 from typing import Union
 from fastapi import APIRouter, Depends, status, Query, Path
 from fastapi.responses import JSONResponse
-from fastapi_jwt_auth import AuthJWT
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from app.routers import deps
-from app import models
+from app import models, pagination
 from app.schemas.classroom_session import (
     ClassroomSessionsAllResponse,
-    ClassroomSessionsAllResponseDataCollection,
     ClassroomSessionDeleteResponse,
     ClassroomSessionDeleteResponseData,
 )
-from app.settings import ADMIN_ID
 
 router = APIRouter()
 
 
+SESSION_FIELDS = ("id", "classroom_id", "user_id", "is_teacher")
+
+
 @router.get("/sessions", tags=["sessions"], response_model=ClassroomSessionsAllResponse)
 def get_sessions_all(
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
+    page: pagination.PageParams = Depends(pagination.page_params),
 ):
-    response_data: ClassroomSessionsAllResponseDataCollection = (
-        ClassroomSessionsAllResponseDataCollection()
-    )
-
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
+    try:
+        after = page.after_values(1)
+        fields = page.select_fields(SESSION_FIELDS)
+    except ValueError as err:
         return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"error": str(err)},
         )
 
-    user_session = (
-        db.query(models.ClassroomSessions)
+    query = (
+        db.query(
+            models.ClassroomSessions.id,
+            *(
+                getattr(models.ClassroomSessions, field)
+                for field in fields
+                if field != "id"
+            ),
+        )
         .filter(models.ClassroomSessions.user_id == user.id)
-        .all()
+        .order_by(models.ClassroomSessions.id)
+    )
+    if after is not None:
+        query = query.filter(models.ClassroomSessions.id > after[0])
+    if page.size is not None:
+        query = query.limit(page.size + 1)
+    user_sessions, next_cursor = pagination.paginate(
+        query.all(), page.size, lambda session: (session.id,)
     )
 
-    if user_session is None:
-        return JSONResponse(
-            status_code=status.HTTP_200_OK,
-            content={"data": None, "error": None},
-        )
-    else:
-        for session in user_session:
-            response_data.append(
-                {
-                    "id": session.id,
-                    "classroom_id": session.classroom_id,
-                    "user_id": session.user_id,
-                    "is_teacher": session.is_teacher,
-                }
-            )
-        return JSONResponse(
-            status_code=status.HTTP_200_OK,
-            content={"data": response_data.dict(), "error": None},
-        )
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "data": [
+                pagination.project(session._mapping, fields)
+                for session in user_sessions
+            ],
+            "next": next_cursor,
+            "error": None,
+        },
+    )
 
 
 @router.delete("/sessions", tags=["sessions"], response_model=ClassroomSessionDeleteResponse)
 def delete_session(
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
 
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
-
     user_session = (
         db.query(models.ClassroomSessions)
         .filter(models.ClassroomSessions.user_id == user.id).first()
@@ -6,16 +6,14 @@ from typing import Union
 
 from fastapi import APIRouter, Depends, status, Query, Path
 from fastapi.responses import JSONResponse
-from fastapi_jwt_auth import AuthJWT
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from app.routers import deps
-from app import models
+from app import models, pagination
 from app.schemas.classroom import (
     ClassroomCreateRequest,
     ClassroomCreateResponse,
     ClassroomsAllResponse,
-    ClassroomsAllResponseDataCollection,
     ClassroomJoinRequest,
     ClassroomJoinResponse,
     ClassroomCodeJoinRequest,
@@ -24,7 +22,7 @@ from app.schemas.classroom import (
     ClassroomDeleteResponse,
     ClassroomDeleteResponseData,
 )
-from app.settings import ADMIN_ID
+from app.websockets.managers.connection_manager import conn_manager
 
 router = APIRouter()
 
@@ -37,15 +35,8 @@ def code_generator(size=8, chars=string.ascii_uppercase + string.digits):
 def create_classroom(
     request_data: ClassroomCreateRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
     check_if_classroom_exists = (
         db.query(models.Classrooms)
         .filter(models.Classrooms.name == request_data.data.name)
@@ -56,7 +47,6 @@ def create_classroom(
             status_code=status.HTTP_409_CONFLICT,
             content={"error": "Classroom already exists"},
         )
-    user = db.query(models.User).filter_by(username=username).first()
     check_if_user_has_classroom = (
         db.query(models.Classrooms)
         .filter(models.Classrooms.teacher_id == user.id)
@@ -109,16 +99,8 @@ def create_classroom(
 def delete_classroom(
     classroom_id: int = Path(title="Id of the classroom to delete"),
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-
     # Check if classroom exists
     classroom = db.query(models.Classrooms).filter_by(
         id=classroom_id).first()
@@ -129,7 +111,6 @@ def delete_classroom(
         )
 
     # Check if user is teacher of the classroom
-    user = db.query(models.User).filter_by(username=username).first()
     if classroom.teacher_id != user.id:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -156,63 +137,73 @@ def delete_classroom(
     )
 
 
+CLASSROOM_FIELDS = (
+    "id",
+    "name",
+    "teacher_id",
+    "teacher_username",
+    "teacher_name",
+    "teacher_last_name",
+    "is_public",
+    "access_code",
+)
+CLASSROOM_TEACHER_COLUMNS = {
+    "teacher_username": models.User.username,
+    "teacher_name": models.User.name,
+    "teacher_last_name": models.User.last_name,
+}
+
+
 @router.get("/classrooms", tags=["classrooms"], response_model=ClassroomsAllResponse)
 def get_classrooms_all(
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
     include_private: Union[bool, None] = Query(
         False, title="Include private classrooms"),
+    page: pagination.PageParams = Depends(pagination.page_params),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
+    try:
+        after = page.after_values(1)
+        fields = page.select_fields(CLASSROOM_FIELDS)
+    except ValueError as err:
         return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"error": str(err)},
         )
-    classrooms_response_data: ClassroomsAllResponseDataCollection = (
-        ClassroomsAllResponseDataCollection()
-    )
 
-    classrooms = None
+    # teachers are joined in the same query and only when their fields are asked
+    columns = [models.Classrooms.id] + [
+        (
+            CLASSROOM_TEACHER_COLUMNS[field]
+            if field in CLASSROOM_TEACHER_COLUMNS
+            else getattr(models.Classrooms, field)
+        ).label(field)
+        for field in fields
+        if field != "id"
+    ]
+    query = db.query(*columns).order_by(models.Classrooms.id)
+    if CLASSROOM_TEACHER_COLUMNS.keys() & set(fields):
+        query = query.join(
+            models.User, models.User.id == models.Classrooms.teacher_id)
     if not include_private:
-        classrooms = (
-            db.query(models.Classrooms)
-            .filter(models.Classrooms.is_public == True)
-            .all()
-        )
-    else:
-        classrooms = (
-            db.query(models.Classrooms)
-            .all()
-        )
-    if classrooms:
-        for classroom in classrooms:
-            teacher = db.query(models.User).filter_by(
-                id=classroom.teacher_id).first()
-            print(teacher)
-            classrooms_response_data.append(
-                {
-                    "id": classroom.id,
-                    "name": classroom.name,
-                    "teacher_id": classroom.teacher_id,
-                    "teacher_username": teacher.username,
-                    "teacher_name": teacher.name,
-                    "teacher_last_name": teacher.last_name,
-                    "is_public": classroom.is_public,
-                    "access_code": classroom.access_code,
-                }
-            )
+        query = query.filter(models.Classrooms.is_public == True)
+    if after is not None:
+        query = query.filter(models.Classrooms.id > after[0])
+    if page.size is not None:
+        query = query.limit(page.size + 1)
+    classrooms, next_cursor = pagination.paginate(
+        query.all(), page.size, lambda classroom: (classroom.id,))
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
-        content={"data": classrooms_response_data.dict(), "error": None},
+        content={
+            "data": [
+                pagination.project(classroom._mapping, fields)
+                for classroom in classrooms
+            ],
+            "next": next_cursor,
+            "error": None,
+        },
     )
 
 
@@ -220,17 +211,8 @@ def get_classrooms_all(
 def join_classroom(
     request_data: ClassroomJoinRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-
     target_classroom_id = request_data.data.classroom_id
     if target_classroom_id is None:
         return JSONResponse(
@@ -269,7 +251,7 @@ def join_classroom(
         status_code=status.HTTP_200_OK,
         content={
             "data": {
-                "username": username,
+                "username": user.username,
                 "user_id": new_record.user_id,
                 "id": new_record.classroom_id,
                 "is_teacher": new_record.is_teacher,
@@ -283,17 +265,8 @@ def join_classroom(
 def join_classroom_code(
     request_data: ClassroomCodeJoinRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-
     access_code = request_data.data.access_code
     if access_code is None:
         return JSONResponse(
@@ -333,7 +306,7 @@ def join_classroom_code(
         status_code=status.HTTP_200_OK,
         content={
             "data": {
-                "username": username,
+                "username": user.username,
                 "user_id": new_record.user_id,
                 "id": new_record.classroom_id,
                 "is_teacher": new_record.is_teacher,
@@ -341,3 +314,14 @@ def join_classroom_code(
             "error": None,
         },
     )
+
+
+@router.get("/classrooms/metrics", tags=["classrooms"])
+def get_classrooms_metrics(
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
+):
+    # websocket broadcast numbers of the worker that serves the request
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={"data": conn_manager.get_metrics(), "error": None},
+    )
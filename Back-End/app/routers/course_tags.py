@@ -1,13 +1,11 @@
-from fastapi import APIRouter, Depends, status, Path
+from fastapi import APIRouter, Depends, Request, status, Path
 from fastapi.responses import JSONResponse
-from fastapi_jwt_auth import AuthJWT
 from sqlalchemy.orm import Session
 from app.routers import deps
-from app import models, crud
+from app import crud, recommender, response_cache
 from app.schemas.course_tag import (
     CourseTagCreateRequest,
 )
-from app.settings import ADMIN_ID
 
 router = APIRouter()
 
@@ -16,31 +14,15 @@ router = APIRouter()
 def create_course_tag(
     request_data: CourseTagCreateRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
-
     try:
         new_tag = crud.courses.create_course_tag(db, request_data.data)
+        recommender.course_tag_index.add_tag(
+            new_tag.id, new_tag.course_id, new_tag.name
+        )
 
+        response_cache.invalidate(response_cache.COURSE_TAGS)
         return JSONResponse(
             status_code=status.HTTP_200_OK,
             content={
@@ -60,12 +42,17 @@ def create_course_tag(
 
 @router.get("/tags/courses", tags=["tags"])
 def get_course_tags(
+    request: Request,
     db: Session = Depends(deps.get_db),
 ):
+    cached = response_cache.get_cached_response(request, response_cache.COURSE_TAGS)
+    if cached is not None:
+        return cached
+
     try:
         tags = crud.courses.get_course_tags(db)
 
-        return JSONResponse(
+        response = JSONResponse(
             status_code=status.HTTP_200_OK,
             content={
                 "data": [
@@ -78,6 +65,9 @@ def get_course_tags(
                 ]
             },
         )
+        return response_cache.cache_response(
+            request, response, response_cache.COURSE_TAGS
+        )
     except ValueError as err:
         return JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -87,13 +77,18 @@ def get_course_tags(
 
 @router.get("/tags/courses/{course_id}", tags=["tags"])
 def get_course_tags_by_course_id(
+    request: Request,
     db: Session = Depends(deps.get_db),
     course_id: int = Path(title="id of the course"),
 ):
+    cached = response_cache.get_cached_response(request, response_cache.COURSE_TAGS)
+    if cached is not None:
+        return cached
+
     try:
         tags = crud.courses.get_course_tags_by_course_id(db, course_id)
 
-        return JSONResponse(
+        response = JSONResponse(
             status_code=status.HTTP_200_OK,
             content={
                 "data": [
@@ -106,6 +101,9 @@ def get_course_tags_by_course_id(
                 ]
             },
         )
+        return response_cache.cache_response(
+            request, response, response_cache.COURSE_TAGS
+        )
     except ValueError as err:
         return JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -116,32 +114,14 @@ def get_course_tags_by_course_id(
 @router.delete("/tags/{tag_id}", tags=["tags"])
 def delete_course_tag(
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
     tag_id: int = Path(title="id of the tag"),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
-
     try:
         crud.courses.delete_course_tag(db, tag_id)
+        recommender.course_tag_index.remove_tag(tag_id)
 
+        response_cache.invalidate(response_cache.COURSE_TAGS)
         return JSONResponse(
             status_code=status.HTTP_200_OK,
             content={
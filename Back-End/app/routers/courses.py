@@ -1,11 +1,12 @@
 from datetime import datetime
 from typing import Union
-from fastapi import APIRouter, Depends, status, Query, Path
+from fastapi import APIRouter, Depends, Request, status, Query, Path
 from fastapi.responses import JSONResponse
-from fastapi_jwt_auth import AuthJWT
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.routers import deps
-from app import models, crud
+from app import answer_rules, models, crud, pagination, recommender, response_cache
 from app.schemas.course import (
     CourseCloseByIdRequest,
     CourseCloseRequest,
@@ -16,9 +17,7 @@ from app.schemas.course import (
     CourseJoinRequest,
     CourseJoinResponse,
     CoursesAllResponse,
-    CoursesAllResponseDataCollection,
 )
-from app.settings import ADMIN_ID
 
 router = APIRouter()
 
@@ -27,20 +26,8 @@ router = APIRouter()
 def create_course(
     request_data: CourseCreateRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
     new_course = models.Courses(
         name=request_data.data.name,
         description=request_data.data.description,
@@ -52,7 +39,9 @@ def create_course(
 
     db.add(new_course)
     db.commit()
+    recommender.course_tag_index.set_course(new_course.id, new_course.lang)
 
+    response_cache.invalidate(response_cache.COURSES)
     return JSONResponse(
         status_code=status.HTTP_201_CREATED,
         content={
@@ -72,20 +61,8 @@ def create_course(
 def edit_course(
     request_data: CourseEditRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
     course_id = request_data.data.course_id
     course_edit = db.query(models.Courses).filter_by(id=course_id).first()
     if course_edit is None:
@@ -114,7 +91,9 @@ def edit_course(
 
     if to_commit:
         db.commit()
+        recommender.course_tag_index.set_course(course_id, course_edit.lang)
 
+    response_cache.invalidate(response_cache.COURSES)
     return JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
@@ -141,29 +120,27 @@ def edit_course(
 def delete_course(
     course_id: int = Path(title="id of the course to delete"),
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
-
+    lesson_ids = [
+        lesson_id
+        for (lesson_id,) in db.query(models.Lessons.id).filter_by(course_id=course_id)
+    ]
+    user_ids = crud.user_stats.course_user_ids(db, course_id, lesson_ids)
     db.query(models.EnrolledCourses).filter_by(course_id=course_id).delete()
-    for lesson in db.query(models.Lessons).filter_by(course_id=course_id).all():
-        db.query(models.Answers).filter_by(lesson_id=lesson.id).delete()
+    for lesson_id in lesson_ids:
+        db.query(models.Answers).filter_by(lesson_id=lesson_id).delete()
     db.query(models.Lessons).filter_by(course_id=course_id).delete()
     db.query(models.Courses).filter_by(id=course_id).delete()
+    crud.user_stats.invalidate_user_stats(db, user_ids)
 
     db.commit()
+    answer_rules.compiled_lessons.invalidate(*lesson_ids)
+    recommender.course_tag_index.remove_course(course_id)
 
+    response_cache.invalidate(
+        response_cache.COURSES, response_cache.LESSONS, response_cache.COURSE_TAGS
+    )
     return JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
@@ -176,187 +153,57 @@ def delete_course(
 
 
 @router.get("/courses", tags=["courses"], response_model=CoursesAllResponse)
-def get_courses_all(
-    db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+async def get_courses_all(
+    db: AsyncSession = Depends(deps.get_async_db),
+    user: deps.CurrentUser = Depends(deps.get_async_current_user),
     include_lessons: Union[bool, None] = Query(default=False),
     limit_lessons: Union[int, None] = Query(default=None, gt=0),
+    page: pagination.PageParams = Depends(pagination.page_params),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
+    available_fields = crud.courses.COURSE_CATALOG_FIELDS + (
+        ("lessons",) if include_lessons else ()
+    )
+    try:
+        after = page.after_values(1)
+        fields = page.select_fields(available_fields) if page.fields else None
+    except ValueError as err:
         return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"error": str(err)},
         )
-    courses_response_data: CoursesAllResponseDataCollection = (
-        CoursesAllResponseDataCollection()
+    courses_response_data, next_cursor = await db.run_sync(
+        crud.courses.get_courses_catalog,
+        user,
+        include_lessons,
+        limit_lessons,
+        fields,
+        after[0] if after else None,
+        page.size,
     )
-
-    if include_lessons:
-        enrolled_courses_with_lessons = (
-            db.query(models.EnrolledCourses)
-            .filter_by(user_id=user.id)
-            .join(models.Courses, models.Courses.id == models.EnrolledCourses.course_id)
-            .join(models.Lessons, models.Courses.id == models.Lessons.course_id)
-            .all()
-        )
-        if enrolled_courses_with_lessons:
-            for enrolled_course in enrolled_courses_with_lessons:
-                total_lessons_count = 0
-                for _ in enrolled_course.course.lessons:
-                    total_lessons_count += 1
-                courses_response_data.append(
-                    {
-                        "id": enrolled_course.course.id,
-                        "name": enrolled_course.course.name,
-                        "description": enrolled_course.course.description,
-                        "featured": enrolled_course.course.featured,
-                        "enrolled": True,
-                        "total_lessons_count": total_lessons_count,
-                        "lang": enrolled_course.course.lang,
-                        "tags": [
-                            {
-                                "id": tag.id,
-                                "name": tag.name,
-                                "course_id": tag.course_id,
-                            }
-                            for tag in enrolled_course.course.tags
-                        ],
-                        "lessons": [
-                            {
-                                "id": lesson.id,
-                                "name": lesson.name,
-                                "description": lesson.description,
-                                "type": lesson.type,
-                                "number_of_answers": lesson.number_of_answers,
-                            }
-                            for lesson in enrolled_course.course.lessons.limit(
-                                limit_lessons
-                            )
-                        ],
-                    }
-                )
-
-        courses_with_lessons = (
-            db.query(models.Courses)
-            .join(models.Lessons, models.Courses.id == models.Lessons.course_id)
-            .all()
-        )
-        if courses_with_lessons:
-            for course in courses_with_lessons:
-                if course.id not in [
-                    enrolled_course.course.id
-                    for enrolled_course in enrolled_courses_with_lessons
-                ]:
-                    total_lessons_count = 0
-                    for _ in course.lessons:
-                        total_lessons_count += 1
-                    courses_response_data.append(
-                        {
-                            "id": course.id,
-                            "name": course.name,
-                            "description": course.description,
-                            "featured": course.featured,
-                            "enrolled": False,
-                            "total_lessons_count": total_lessons_count,
-                            "lang": course.lang,
-                            "tags": [
-                                {
-                                    "id": tag.id,
-                                    "name": tag.name,
-                                    "course_id": tag.course_id,
-                                }
-                                for tag in course.tags
-                            ],
-                            "lessons": [
-                                {
-                                    "id": lesson.id,
-                                    "name": lesson.name,
-                                    "description": lesson.description,
-                                    "type": lesson.type,
-                                    "number_of_answers": lesson.number_of_answers,
-                                }
-                                for lesson in course.lessons.limit(limit_lessons)
-                            ],
-                        }
-                    )
-    else:
-        enrolled_courses = (
-            db.query(models.EnrolledCourses)
-            .filter_by(user_id=user.id)
-            .join(models.Courses, models.Courses.id == models.EnrolledCourses.course_id)
-            .all()
-        )
-        if enrolled_courses:
-            for enrolled_course in enrolled_courses:
-                courses_response_data.append(
-                    {
-                        "id": enrolled_course.course.id,
-                        "name": enrolled_course.course.name,
-                        "description": enrolled_course.course.description,
-                        "featured": enrolled_course.course.featured,
-                        "enrolled": True,
-                        "lang": enrolled_course.course.lang,
-                        "tags": [
-                            {
-                                "id": tag.id,
-                                "name": tag.name,
-                                "course_id": tag.course_id,
-                            }
-                            for tag in enrolled_course.course.tags
-                        ],
-                    }
-                )
-
-        courses = db.query(models.Courses).all()
-        if courses:
-            for course in courses:
-                if course.id not in [
-                    enrolled_course.course.id for enrolled_course in enrolled_courses
-                ]:
-                    courses_response_data.append(
-                        {
-                            "id": course.id,
-                            "name": course.name,
-                            "description": course.description,
-                            "featured": course.featured,
-                            "enrolled": False,
-                            "lang": course.lang,
-                            "tags": [
-                                {
-                                    "id": tag.id,
-                                    "name": tag.name,
-                                    "course_id": tag.course_id,
-                                }
-                                for tag in course.tags
-                            ],
-                        }
-                    )
-
     return JSONResponse(
         status_code=status.HTTP_200_OK,
-        content={"data": courses_response_data.dict(), "error": None},
+        content={"data": courses_response_data, "next": next_cursor, "error": None},
     )
 
 
 @router.get("/courses/featured", tags=["courses"])
 def get_courses_all_featured(
+    request: Request,
     db: Session = Depends(deps.get_db),
 ):
+    cached = response_cache.get_cached_response(
+        request, response_cache.COURSES, response_cache.COURSE_TAGS
+    )
+    if cached is not None:
+        return cached
+
     courses = db.query(models.Courses).filter_by(featured=True).all()
     if courses is None:
         return JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
             content={"error": "Courses not found"},
         )
-    return JSONResponse(
+    response = JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
             "data": [
@@ -380,21 +227,16 @@ def get_courses_all_featured(
             "error": None,
         },
     )
+    return response_cache.cache_response(
+        request, response, response_cache.COURSES, response_cache.COURSE_TAGS
+    )
 
 
 @router.get("/courses/me", tags=["courses"])
 def get_courses_me(
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
     enrolled_courses = db.query(models.EnrolledCourses).filter_by(user_id=user.id).all()
     if enrolled_courses is None:
         return JSONResponse(
@@ -406,7 +248,7 @@ def get_courses_me(
         content={
             "data": [
                 {
-                    "username": username,
+                    "username": user.username,
                     "course_id": enrolled_course.course_id,
                     "start_date": str(enrolled_course.start_date),
                     "end_date": str(enrolled_course.end_date),
@@ -429,34 +271,20 @@ def get_courses_me(
 
 
 @router.get("/courses/enrolled", tags=["courses"])
-def get_enrolled_courses(
-    db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+async def get_enrolled_courses(
+    db: AsyncSession = Depends(deps.get_async_db),
+    user: deps.CurrentUser = Depends(deps.get_async_current_user),
     include_lessons: Union[bool, None] = Query(default=False),
     limit_lessons: Union[int, None] = Query(default=None, gt=0),
     limit: Union[int, None] = Query(default=None, gt=0),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
-
     try:
-        all_enrolled_courses = crud.courses.get_all_enrolled_courses(
-            db, user, include_lessons, limit_lessons
+        all_enrolled_courses = await db.run_sync(
+            crud.courses.get_all_enrolled_courses, user, include_lessons, limit_lessons
         )
         # TODO: add support for limit_lessons in dynamic courses
-        all_dynamic_courses = crud.dynamic_courses.get_all_dynamic_courses(
-            db, user, True
+        all_dynamic_courses = await db.run_sync(
+            crud.dynamic_courses.get_all_dynamic_courses, user, True
         )
         all_courses = all_enrolled_courses + all_dynamic_courses
 
@@ -475,38 +303,51 @@ def get_enrolled_courses(
 
 
 @router.get("/courses/{course_id}", tags=["courses"])
-def get_course_by_id(
-    db: Session = Depends(deps.get_db),
+async def get_course_by_id(
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_db),
     course_id: int = Path(title="id of the course"),
     include_lessons: Union[bool, None] = Query(default=False),
     limit_lessons: Union[int, None] = Query(default=None, gt=0),
 ):
-    lessons_exist = False
-    if include_lessons:
-        course = (
-            db.query(models.Courses)
-            .filter_by(id=course_id)
-            .join(
-                models.Lessons,
-                models.Lessons.course_id == models.Courses.id,
-            )
-            .filter_by(course_id=course_id)
-            .first()
-        )
-        if course:
-            lessons_exist = True
-
-    if not lessons_exist:
-        course = db.query(models.Courses).filter_by(id=course_id).first()
+    cached = await response_cache.get_cached_response_async(
+        request,
+        response_cache.COURSES,
+        response_cache.COURSE_TAGS,
+        response_cache.LESSONS,
+    )
+    if cached is not None:
+        return cached
 
+    course = await db.get(models.Courses, course_id)
     if course is None:
         return JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
             content={"error": "Course not found"},
         )
 
-    if lessons_exist:
-        return JSONResponse(
+    # tags and lessons are dynamic relationships, they can't be lazy loaded here
+    tags = (
+        (await db.execute(select(models.CourseTags).filter_by(course_id=course_id)))
+        .scalars()
+        .all()
+    )
+    lessons = []
+    if include_lessons:
+        lessons = (
+            (
+                await db.execute(
+                    select(models.Lessons)
+                    .filter_by(course_id=course_id)
+                    .limit(limit_lessons)
+                )
+            )
+            .scalars()
+            .all()
+        )
+
+    if lessons:
+        response = JSONResponse(
             status_code=status.HTTP_200_OK,
             content={
                 "data": {
@@ -521,7 +362,7 @@ def get_course_by_id(
                             "name": tag.name,
                             "course_id": tag.course_id,
                         }
-                        for tag in course.tags
+                        for tag in tags
                     ],
                     "lessons": [
                         {
@@ -532,13 +373,20 @@ def get_course_by_id(
                             "number_of_answers": lesson.number_of_answers,
                             "order": lesson.order,
                         }
-                        for lesson in course.lessons.limit(limit_lessons)
+                        for lesson in lessons
                     ],
                 },
                 "error": None,
             },
         )
-    return JSONResponse(
+        return await response_cache.cache_response_async(
+            request,
+            response,
+            response_cache.COURSES,
+            response_cache.COURSE_TAGS,
+            response_cache.LESSONS,
+        )
+    response = JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
             "data": {
@@ -553,38 +401,31 @@ def get_course_by_id(
                         "name": tag.name,
                         "course_id": tag.course_id,
                     }
-                    for tag in course.tags
+                    for tag in tags
                 ],
             },
             "error": None,
         },
     )
+    return await response_cache.cache_response_async(
+        request,
+        response,
+        response_cache.COURSES,
+        response_cache.COURSE_TAGS,
+        response_cache.LESSONS,
+    )
 
 
 @router.get("/courses/{course_id}/enrolled", tags=["courses"])
-def get_enrolled_course_by_id(
-    db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+async def get_enrolled_course_by_id(
+    db: AsyncSession = Depends(deps.get_async_db),
+    user: deps.CurrentUser = Depends(deps.get_async_current_user),
     course_id: int = Path(title="id of the course"),
     include_lessons: Union[bool, None] = Query(default=False),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
-
     try:
-        course = crud.courses.get_enrolled_course_by_id(
-            db, user, course_id, include_lessons
+        course = await db.run_sync(
+            crud.courses.get_enrolled_course_by_id, user, course_id, include_lessons
         )
         return JSONResponse(
             status_code=status.HTTP_200_OK,
@@ -601,17 +442,8 @@ def get_enrolled_course_by_id(
 def enroll_course_me(
     request_data: CourseJoinRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-
     course_wanted = request_data.data.course_id
     if course_wanted is None:
         return JSONResponse(
@@ -644,13 +476,14 @@ def enroll_course_me(
         completed=False,
     )
     db.add(enrolled_course)
+    crud.user_stats.increment_user_stats(db, user.id, enrolled_courses_count=1)
     db.commit()
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
             "data": {
-                "username": username,
+                "username": user.username,
                 "user_id": enrolled_course.user_id,
                 "id": enrolled_course.id,
                 "course_id": enrolled_course.course_id,
@@ -667,20 +500,8 @@ def enroll_course_me(
 def enroll_course_id(
     request_data: CourseJoinByIdRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    current_user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
     id = request_data.data.id
     user = db.query(models.User).filter_by(username=id).first()
     if user is None:
@@ -722,13 +543,14 @@ def enroll_course_id(
         completed=False,
     )
     db.add(enrolled_course)
+    crud.user_stats.increment_user_stats(db, user.id, enrolled_courses_count=1)
     db.commit()
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
             "data": {
-                "username": username,
+                "username": current_user.username,
                 "user_id": enrolled_course.user_id,
                 "course_id": enrolled_course.course_id,
                 "start_date": str(enrolled_course.start_date),
@@ -744,17 +566,8 @@ def enroll_course_id(
 def close_course_me(
     request_data: CourseCloseRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-
     course_wanted = request_data.data.course_id
 
     if course_wanted is None:
@@ -789,7 +602,7 @@ def close_course_me(
         status_code=status.HTTP_200_OK,
         content={
             "data": {
-                "username": username,
+                "username": user.username,
                 "user_id": course_to_close.user_id,
                 "course_id": course_to_close.course_id,
                 "start_date": str(course_to_close.start_date),
@@ -805,20 +618,8 @@ def close_course_me(
 def close_course_id(
     request_data: CourseCloseByIdRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    current_user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
     id = request_data.data.id
     user = db.query(models.User).filter_by(username=id).first()
     if user is None:
@@ -860,7 +661,7 @@ def close_course_id(
         status_code=status.HTTP_200_OK,
         content={
             "data": {
-                "username": username,
+                "username": current_user.username,
                 "user_id": course_to_close.user_id,
                 "course_id": course_to_close.course_id,
                 "start_date": str(course_to_close.start_date),
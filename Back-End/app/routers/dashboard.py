@@ -1,66 +1,32 @@
 from fastapi import APIRouter, Depends, status
 from fastapi.responses import JSONResponse
-from fastapi_jwt_auth import AuthJWT
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.routers import deps
-from app import models, crud
+from app import crud
 
 router = APIRouter()
 
 
 @router.get("/dashboard", tags=["dashboard"])
-def get_dashboard_me(
-    db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+async def get_dashboard_me(
+    db: AsyncSession = Depends(deps.get_async_db),
+    user: deps.CurrentUser = Depends(deps.get_async_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-
-    user = db.query(models.User).filter_by(username=username).first()
-
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
-
     try:
-        total_completed_lessons_count = crud.courses.get_total_completed_lessons_count(
-            db, user
-        )
-        total_enrolled_lessons_count = crud.courses.get_total_enrolled_lessons_count(
-            db, user
-        )
-        total_enrolled_courses_count = crud.courses.get_total_enrolled_courses_count(
-            db, user
-        )
-        total_dynamic_courses_count = (
-            crud.dynamic_courses.get_total_dynamic_courses_count(db, user)
-        )
-        total_number_of_answers = crud.answers.get_total_number_of_answers(db, user)
-        total_number_of_correct_answers = (
-            crud.answers.get_total_number_of_correct_answers(db, user)
-        )
-        total_number_of_incorrect_answers = (
-            crud.answers.get_total_number_of_incorrect_answers(db, user)
-        )
+        user_stats = await db.run_sync(crud.user_stats.get_user_stats, user)
 
         return JSONResponse(
             status_code=status.HTTP_200_OK,
             content={
                 "data": {
-                    "total_completed_lessons_count": total_completed_lessons_count,
-                    "total_enrolled_lessions_count": total_enrolled_lessons_count,
-                    "total_enrolled_courses_count": total_enrolled_courses_count,
-                    "total_dynamic_courses_count": total_dynamic_courses_count,
-                    "total_number_of_answers": total_number_of_answers,
-                    "total_number_of_correct_answers": total_number_of_correct_answers,
-                    "total_number_of_incorrect_answers": total_number_of_incorrect_answers,
+                    "total_completed_lessons_count": user_stats.completed_lessons_count,
+                    "total_enrolled_lessions_count": user_stats.enrolled_lessons_count,
+                    "total_enrolled_courses_count": user_stats.enrolled_courses_count,
+                    "total_dynamic_courses_count": user_stats.dynamic_courses_count,
+                    "total_number_of_answers": user_stats.correct_answers_count
+                    + user_stats.incorrect_answers_count,
+                    "total_number_of_correct_answers": user_stats.correct_answers_count,
+                    "total_number_of_incorrect_answers": user_stats.incorrect_answers_count,
                 }
             },
         )
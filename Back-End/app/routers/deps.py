@@ -1,7 +1,16 @@
 # pylint: disable=E0611
 import os
-from typing import Generator
-from app.db.session import SessionLocal
+import threading
+import time
+from typing import AsyncGenerator, Generator
+from fastapi import Depends, Request, status
+from fastapi_jwt_auth import AuthJWT
+from fastapi_jwt_auth.exceptions import AuthJWTException
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app import models, settings
+from app.db.session import AsyncSessionLocal, SessionLocal, get_async_engine
 from app.ipahttp import ipahttp
 
 
@@ -13,6 +22,11 @@ def get_db() -> Generator:
         db.close()
 
 
+async def get_async_db() -> AsyncGenerator:
+    async with AsyncSessionLocal(bind=get_async_engine()) as db:
+        yield db
+
+
 # TODO: switch between ipa2 and ipa1 if one of them is not available
 IPA_URL = "ipa2.zut.edu.pl"
 
@@ -60,3 +74,122 @@ def get_ipa() -> Generator:
     else:
         ipa_ = ipahttp.ipa(IPA_URL)
         yield ipa_
+
+
+class CurrentUserError(AuthJWTException):
+    # answered by the AuthJWTException handler like the other auth errors
+    def __init__(self, status_code: int, message: str):
+        self.status_code = status_code
+        self.message = message
+
+
+class CurrentUser:
+    # the part of the user every endpoint needs, cached between requests
+    def __init__(self, id: int, username: str, role_id: int):
+        # pylint: disable=W0622
+        self.id = id
+        self.username = username
+        self.role_id = role_id
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role_id == settings.ADMIN_ID
+
+
+class CurrentUserCache:
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._users: dict[str, tuple[float, CurrentUser]] = dict()
+        self._lock = threading.Lock()
+
+    def get(self, username: str):
+        with self._lock:
+            entry = self._users.get(username)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._users[username]
+                return None
+            return entry[1]
+
+    def set(self, user: CurrentUser):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._users[user.username] = (time.monotonic() + self.ttl, user)
+
+    def invalidate(self, username: str = None):
+        with self._lock:
+            if username is None:
+                self._users.clear()
+            else:
+                self._users.pop(username, None)
+
+
+current_user_cache = CurrentUserCache(settings.CURRENT_USER_CACHE_TTL)
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def invalidate_current_user(_mapper, _connection, target: models.User):
+    # a changed role has to apply to the next request, other workers pick it
+    # up when their entry expires
+    current_user_cache.invalidate(target.username)
+    for username in inspect(target).attrs.username.history.deleted:
+        current_user_cache.invalidate(username)
+
+
+def get_token_username(Authorize: AuthJWT) -> str:
+    Authorize.jwt_required()
+    username = Authorize.get_jwt_subject()
+    if username is None:
+        raise CurrentUserError(status.HTTP_401_UNAUTHORIZED, "Unauthorized")
+    return username
+
+
+def cache_current_user(row) -> CurrentUser:
+    if row is None:
+        raise CurrentUserError(status.HTTP_404_NOT_FOUND, "User not found")
+    user = CurrentUser(row.id, row.username, row.role_id)
+    current_user_cache.set(user)
+    return user
+
+
+def get_current_user(
+    db: Session = Depends(get_db),
+    Authorize: AuthJWT = Depends(),
+) -> CurrentUser:
+    username = get_token_username(Authorize)
+    user = current_user_cache.get(username)
+    if user is None:
+        user = cache_current_user(
+            db.query(models.User.id, models.User.username, models.User.role_id)
+            .filter_by(username=username)
+            .first()
+        )
+    return user
+
+
+async def get_async_current_user(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+) -> CurrentUser:
+    # get_current_user for async routes, runs on the event loop and shares the
+    # route's async session instead of taking a sync connection. AuthJWT is
+    # built here, as a dependency of its own it would run in the threadpool.
+    username = get_token_username(AuthJWT(req=request))
+    user = current_user_cache.get(username)
+    if user is None:
+        result = await db.execute(
+            select(models.User.id, models.User.username, models.User.role_id).filter_by(
+                username=username
+            )
+        )
+        user = cache_current_user(result.first())
+    return user
+
+
+def get_current_admin(user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
+    if not user.is_admin:
+        raise CurrentUserError(status.HTTP_403_FORBIDDEN, "Forbidden")
+    return user
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends, status, Path
+from fastapi import APIRouter, Depends, Request, status, Path
 from fastapi.responses import JSONResponse
-from fastapi_jwt_auth import AuthJWT
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from app.schemas.global_knowledge_test import (
     GlobalKnowledgeTestCreateRequest,
@@ -8,9 +8,7 @@ from app.schemas.global_knowledge_test import (
     GlobalKnowledgeTestUserResultsCreateRequest,
 )
 from app.routers import deps
-from app import models
-
-from app.settings import ADMIN_ID
+from app import models, response_cache
 
 router = APIRouter()
 
@@ -22,33 +20,15 @@ router = APIRouter()
 def create_globalknowledgetest(
     request_data: GlobalKnowledgeTestCreateRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
-
     globalknowledgetest = models.GlobalKnowledgeTest(
         name=request_data.data.name,
     )
     db.add(globalknowledgetest)
     db.commit()
 
+    response_cache.invalidate(response_cache.GLOBAL_KNOWLEDGE_TESTS)
     return JSONResponse(
         status_code=status.HTTP_201_CREATED,
         content={
@@ -67,27 +47,8 @@ def create_globalknowledgetest(
 def create_globalknowledgetest_question(
     request_data: GlobalKnowledgeTestQuestionsCreateRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
-
     if request_data.data.bulk and request_data.data.questions:
         questions = []
         for question_item in request_data.data.questions:
@@ -100,6 +61,7 @@ def create_globalknowledgetest_question(
             questions.append(question_)
             db.add(question_)
             db.commit()
+        response_cache.invalidate(response_cache.GLOBAL_KNOWLEDGE_TESTS)
         return JSONResponse(
             status_code=status.HTTP_201_CREATED,
             content={
@@ -126,6 +88,7 @@ def create_globalknowledgetest_question(
     db.add(globalknowledgetest_question)
     db.commit()
 
+    response_cache.invalidate(response_cache.GLOBAL_KNOWLEDGE_TESTS)
     return JSONResponse(
         status_code=status.HTTP_201_CREATED,
         content={
@@ -145,17 +108,17 @@ def create_globalknowledgetest_question(
     tags=["globalknowledgetests"],
 )
 def get_globalknowledgetest_by_id(
+    request: Request,
     global_knowledge_test_id: int = Path(title="id of the globalknowledgetest"),
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
+    cached = response_cache.get_cached_response(
+        request, response_cache.GLOBAL_KNOWLEDGE_TESTS
+    )
+    if cached is not None:
+        return cached
+
     globalknowledgetest = (
         db.query(models.GlobalKnowledgeTest)
         .filter_by(
@@ -174,7 +137,7 @@ def get_globalknowledgetest_by_id(
             content={"error": "Knowledge test not found"},
         )
 
-    return JSONResponse(
+    response = JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
             "data": {
@@ -192,6 +155,9 @@ def get_globalknowledgetest_by_id(
             }
         },
     )
+    return response_cache.cache_response(
+        request, response, response_cache.GLOBAL_KNOWLEDGE_TESTS
+    )
 
 
 @router.get(
@@ -199,16 +165,15 @@ def get_globalknowledgetest_by_id(
     tags=["globalknowledgetests"],
 )
 def get_globalknowledgetests(
+    request: Request,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
+    cached = response_cache.get_cached_response(
+        request, response_cache.GLOBAL_KNOWLEDGE_TESTS
+    )
+    if cached is not None:
+        return cached
 
     globalknowledgetests = (
         db.query(models.GlobalKnowledgeTest)
@@ -220,7 +185,7 @@ def get_globalknowledgetests(
         .all()
     )
 
-    return JSONResponse(
+    response = JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
             "data": [
@@ -241,6 +206,9 @@ def get_globalknowledgetests(
             ]
         },
     )
+    return response_cache.cache_response(
+        request, response, response_cache.GLOBAL_KNOWLEDGE_TESTS
+    )
 
 
 @router.get(
@@ -248,16 +216,15 @@ def get_globalknowledgetests(
     tags=["globalknowledgetests"],
 )
 def get_last_globalknowledgetest(
+    request: Request,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
+    cached = response_cache.get_cached_response(
+        request, response_cache.GLOBAL_KNOWLEDGE_TESTS
+    )
+    if cached is not None:
+        return cached
 
     globalknowledgetest = (
         db.query(models.GlobalKnowledgeTest)
@@ -270,7 +237,7 @@ def get_last_globalknowledgetest(
             content={"error": "Knowledge test not found"},
         )
 
-    return JSONResponse(
+    response = JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
             "data": {
@@ -289,6 +256,9 @@ def get_last_globalknowledgetest(
             }
         },
     )
+    return response_cache.cache_response(
+        request, response, response_cache.GLOBAL_KNOWLEDGE_TESTS
+    )
 
 
 @router.post(
@@ -298,21 +268,8 @@ def get_last_globalknowledgetest(
 def create_globalknowledgetest_user_results(
     request_data: GlobalKnowledgeTestUserResultsCreateRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
     globalknowledgetest = (
         db.query(models.GlobalKnowledgeTest)
         .filter_by(id=request_data.data.global_knowledge_test_id)
@@ -323,42 +280,46 @@ def create_globalknowledgetest_user_results(
             status_code=status.HTTP_404_NOT_FOUND,
             content={"error": "Knowledge test not found"},
         )
-    for globalknowledgetest_results in request_data.data.results:
-        question = (
-            db.query(models.GlobalKnowledgeTestQuestions)
-            .filter_by(
-                id=globalknowledgetest_results.question_id,
-                global_knowledge_test_id=request_data.data.global_knowledge_test_id,
-            )
-            .first()
+    # the last result sent for a question wins, like a resubmission
+    results = {
+        globalknowledgetest_results.question_id: globalknowledgetest_results
+        for globalknowledgetest_results in request_data.data.results
+    }
+    questions = {
+        question.id: question
+        for question in db.query(models.GlobalKnowledgeTestQuestions).filter(
+            models.GlobalKnowledgeTestQuestions.global_knowledge_test_id
+            == globalknowledgetest.id,
+            models.GlobalKnowledgeTestQuestions.id.in_(results),
         )
-        if question is None:
-            return JSONResponse(
-                status_code=status.HTTP_404_NOT_FOUND,
-                content={"error": "Question for question_id not found"},
-            )
-
-        globalknowledgetest_user_results = (
-            db.query(models.GlobalKnowledgeTestUserResults)
-            .filter_by(
-                user_id=user.id,
-                global_knowledge_test_id=request_data.data.global_knowledge_test_id,
-                question_id=globalknowledgetest_results.question_id,
-            )
-            .first()
+    }
+    if len(questions) != len(results):
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"error": "Question for question_id not found"},
         )
-        if globalknowledgetest_user_results is not None:
-            db.delete(globalknowledgetest_user_results)
-            db.commit()
 
-        globalknowledgetest_result = models.GlobalKnowledgeTestUserResults(
-            user_id=user.id,
-            global_knowledge_test_id=globalknowledgetest.id,
-            question_id=globalknowledgetest_results.question_id,
-            answer=globalknowledgetest_results.answer,
-            is_correct=globalknowledgetest_results.answer == question.answer,
+    if results:
+        db.query(models.GlobalKnowledgeTestUserResults).filter(
+            models.GlobalKnowledgeTestUserResults.user_id == user.id,
+            models.GlobalKnowledgeTestUserResults.global_knowledge_test_id
+            == globalknowledgetest.id,
+            models.GlobalKnowledgeTestUserResults.question_id.in_(results),
+        ).delete(synchronize_session=False)
+        db.execute(
+            insert(models.GlobalKnowledgeTestUserResults),
+            [
+                {
+                    "user_id": user.id,
+                    "global_knowledge_test_id": globalknowledgetest.id,
+                    "question_id": question_id,
+                    "answer": globalknowledgetest_results.answer,
+                    "is_correct": globalknowledgetest_results.answer
+                    == questions[question_id].answer,
+                }
+                for question_id, globalknowledgetest_results in results.items()
+            ],
         )
-        db.add(globalknowledgetest_result)
         db.commit()
 
     return JSONResponse(
@@ -382,22 +343,8 @@ def create_globalknowledgetest_user_results(
 def get_globalknowledgetest_user_results(
     global_knowledge_test_id: int = Path(title="id of the globalknowledgetest"),
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
     globalknowledgetest_results = (
         db.query(models.GlobalKnowledgeTestUserResults)
         .filter_by(global_knowledge_test_id=global_knowledge_test_id, user_id=user.id)
@@ -434,28 +381,8 @@ def delete_globalknowledgetest(
         title="id of the globalknowledgetest to delete"
     ),
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-
     db.query(models.GlobalKnowledgeTestUserResults).filter_by(
         global_knowledge_test_id=global_knowledge_test_id
     ).delete()
@@ -465,6 +392,7 @@ def delete_globalknowledgetest(
     db.query(models.GlobalKnowledgeTest).filter_by(id=global_knowledge_test_id).delete()
     db.commit()
 
+    response_cache.invalidate(response_cache.GLOBAL_KNOWLEDGE_TESTS)
     return JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
@@ -483,23 +411,8 @@ def delete_globalknowledgetest(
 def get_check_globalknowledgetest_user_results(
     global_knowledge_test_id: int = Path(title="id of the globalknowledgetest"),
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
-
     globalknowledgetest = (
         db.query(models.GlobalKnowledgeTest)
         .filter_by(id=global_knowledge_test_id)
@@ -1,6 +1,7 @@
+from collections import defaultdict
 from fastapi import APIRouter, Depends, status, Path
 from fastapi.responses import JSONResponse
-from fastapi_jwt_auth import AuthJWT
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from app.schemas.knowledge_test import (
     KnowledgeTestCreateRequest,
@@ -8,9 +9,8 @@ from app.schemas.knowledge_test import (
     KnowledgeTestUserResultsCreateRequest,
 )
 from app.routers import deps
-from app import models
+from app import models, pagination
 
-from app.settings import ADMIN_ID
 
 router = APIRouter()
 
@@ -22,27 +22,8 @@ router = APIRouter()
 def create_knowledgetest(
     request_data: KnowledgeTestCreateRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
-
     knowledgetest = models.KnowledgeTest(
         name=request_data.data.name,
         lesson_id=request_data.data.lesson_id,
@@ -69,27 +50,8 @@ def create_knowledgetest(
 def create_knowledgetest_question(
     request_data: KnowledgeTestQuestionsCreateRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
-
     if request_data.data.bulk and request_data.data.questions:
         questions = []
         for question_item in request_data.data.questions:
@@ -145,15 +107,8 @@ def create_knowledgetest_question(
 def get_knowledgetest_by_id(
     knowledge_test_id: int = Path(title="id of the knowledgetest"),
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
     knowledgetest = (
         db.query(models.KnowledgeTest)
         .filter_by(
@@ -198,15 +153,8 @@ def get_knowledgetest_by_id(
 def get_knowledgetest_by_lession_id(
     lesson_id: int = Path(title="id of the lesson"),
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
     knowledgetest = (
         db.query(models.KnowledgeTest)
         .filter_by(
@@ -244,50 +192,81 @@ def get_knowledgetest_by_lession_id(
     )
 
 
+KNOWLEDGE_TEST_FIELDS = ("id", "name", "lesson_id", "questions")
+
+
 @router.get(
     "/knowledgetests",
     tags=["knowledgetests"],
 )
 def get_knowledgetests(
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
+    page: pagination.PageParams = Depends(pagination.page_params),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
+    try:
+        after = page.after_values(1)
+        fields = page.select_fields(KNOWLEDGE_TEST_FIELDS)
+    except ValueError as err:
         return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-
-    knowledgetests = (
-        db.query(models.KnowledgeTest)
-        .join(
-            models.KnowledgeTestQuestions,
-            models.KnowledgeTestQuestions.knowledge_test_id == models.KnowledgeTest.id,
-        )
-        .all()
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"error": str(err)},
+        )
+
+    # only tests with questions are listed
+    query = (
+        db.query(
+            models.KnowledgeTest.id,
+            *(
+                getattr(models.KnowledgeTest, field)
+                for field in fields
+                if field not in ("id", "questions")
+            ),
+        )
+        .filter(models.KnowledgeTest.questions.any())
+        .order_by(models.KnowledgeTest.id)
+    )
+    if after is not None:
+        query = query.filter(models.KnowledgeTest.id > after[0])
+    if page.size is not None:
+        query = query.limit(page.size + 1)
+    knowledgetests, next_cursor = pagination.paginate(
+        query.all(), page.size, lambda knowledgetest: (knowledgetest.id,)
     )
 
+    questions = defaultdict(list)
+    if "questions" in fields:
+        for knowledgetest_question in (
+            db.query(models.KnowledgeTestQuestions)
+            .filter(
+                models.KnowledgeTestQuestions.knowledge_test_id.in_(
+                    [knowledgetest.id for knowledgetest in knowledgetests]
+                )
+            )
+            .order_by(models.KnowledgeTestQuestions.id)
+        ):
+            questions[knowledgetest_question.knowledge_test_id].append(
+                {
+                    "question_id": knowledgetest_question.id,
+                    "question": knowledgetest_question.question,
+                    "answer": knowledgetest_question.answer,
+                }
+            )
+
     return JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
             "data": [
-                {
-                    "id": knowledgetest.id,
-                    "name": knowledgetest.name,
-                    "lesson_id": knowledgetest.lesson_id,
-                    "questions": [
-                        {
-                            "question_id": knowledgetest_question.id,
-                            "question": knowledgetest_question.question,
-                            "answer": knowledgetest_question.answer,
-                        }
-                        for knowledgetest_question in knowledgetest.questions
-                    ],
-                }
+                pagination.project(
+                    {
+                        **knowledgetest._mapping,
+                        "questions": questions[knowledgetest.id],
+                    },
+                    fields,
+                )
                 for knowledgetest in knowledgetests
-            ]
+            ],
+            "next": next_cursor,
         },
     )
 
@@ -299,21 +278,8 @@ def get_knowledgetests(
 def create_knowledgetest_user_results(
     request_data: KnowledgeTestUserResultsCreateRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
     knowledgetest = (
         db.query(models.KnowledgeTest)
         .filter_by(id=request_data.data.knowledge_test_id)
@@ -324,42 +290,44 @@ def create_knowledgetest_user_results(
             status_code=status.HTTP_404_NOT_FOUND,
             content={"error": "Knowledge test not found"},
         )
-    for knowledgetest_results in request_data.data.results:
-        question = (
-            db.query(models.KnowledgeTestQuestions)
-            .filter_by(
-                id=knowledgetest_results.question_id,
-                knowledge_test_id=request_data.data.knowledge_test_id,
-            )
-            .first()
-        )
-        if question is None:
-            return JSONResponse(
-                status_code=status.HTTP_404_NOT_FOUND,
-                content={"error": "Question for question_id not found"},
-            )
-
-        knowledgetest_user_results = (
-            db.query(models.KnowledgeTestUserResults)
-            .filter_by(
-                user_id=user.id,
-                knowledge_test_id=request_data.data.knowledge_test_id,
-                question_id=knowledgetest_results.question_id,
-            )
-            .first()
-        )
-        if knowledgetest_user_results is not None:
-            db.delete(knowledgetest_user_results)
-            db.commit()
-
-        knowledgetest_result = models.KnowledgeTestUserResults(
-            user_id=user.id,
-            knowledge_test_id=knowledgetest.id,
-            question_id=knowledgetest_results.question_id,
-            answer=knowledgetest_results.answer,
-            is_correct=knowledgetest_results.answer == question.answer,
+    # the last result sent for a question wins, like a resubmission
+    results = {
+        knowledgetest_results.question_id: knowledgetest_results
+        for knowledgetest_results in request_data.data.results
+    }
+    questions = {
+        question.id: question
+        for question in db.query(models.KnowledgeTestQuestions).filter(
+            models.KnowledgeTestQuestions.knowledge_test_id == knowledgetest.id,
+            models.KnowledgeTestQuestions.id.in_(results),
+        )
+    }
+    if len(questions) != len(results):
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"error": "Question for question_id not found"},
+        )
+
+    if results:
+        db.query(models.KnowledgeTestUserResults).filter(
+            models.KnowledgeTestUserResults.user_id == user.id,
+            models.KnowledgeTestUserResults.knowledge_test_id == knowledgetest.id,
+            models.KnowledgeTestUserResults.question_id.in_(results),
+        ).delete(synchronize_session=False)
+        db.execute(
+            insert(models.KnowledgeTestUserResults),
+            [
+                {
+                    "user_id": user.id,
+                    "knowledge_test_id": knowledgetest.id,
+                    "question_id": question_id,
+                    "answer": knowledgetest_results.answer,
+                    "is_correct": knowledgetest_results.answer
+                    == questions[question_id].answer,
+                }
+                for question_id, knowledgetest_results in results.items()
+            ],
         )
-        db.add(knowledgetest_result)
         db.commit()
 
     return JSONResponse(
@@ -383,22 +351,8 @@ def create_knowledgetest_user_results(
 def get_knowledgetest_user_results(
     knowledge_test_id: int = Path(title="id of the knowledgetest"),
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
     knowledgetest_results = (
         db.query(models.KnowledgeTestUserResults)
         .filter_by(knowledge_test_id=knowledge_test_id, user_id=user.id)
@@ -431,28 +385,8 @@ def get_knowledgetest_user_results(
 def delete_knowledgetest(
     knowledge_test_id: int = Path(title="id of the knowledgetest to delete"),
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
-
     db.query(models.KnowledgeTestUserResults).filter_by(
         knowledge_test_id=knowledge_test_id
     ).delete()
@@ -477,28 +411,8 @@ def delete_knowledgetest(
 def delete_knowledgetest_by_lesson_id(
     lesson_id: int = Path(title="id of the lesson to delete knowledgetest"),
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
-
     knowledgetest = (
         db.query(models.KnowledgeTest).filter_by(lesson_id=lesson_id).first()
     )
@@ -527,23 +441,8 @@ def delete_knowledgetest_by_lesson_id(
 def get_check_knowledgetest_user_results(
     knowledge_test_id: int = Path(title="id of the knowledgetest"),
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
-
     knowledgetest = (
         db.query(models.KnowledgeTest).filter_by(id=knowledge_test_id).first()
     )
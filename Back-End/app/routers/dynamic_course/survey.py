@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends, status, Path
+from fastapi import APIRouter, Depends, Request, status, Path
 from fastapi.responses import JSONResponse
-from fastapi_jwt_auth import AuthJWT
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from app.schemas.dynamic_course import (
     DynamicCourseSurveyAnswerCreateRequest,
@@ -12,9 +12,8 @@ from app.schemas.dynamic_course import (
     DynamicCourseSurveyWithAnswersCreateRequest,
 )
 from app.routers import deps
-from app import models
+from app import models, response_cache
 
-from app.settings import ADMIN_ID
 
 router = APIRouter()
 
@@ -27,27 +26,8 @@ router = APIRouter()
 def create_dynamic_course_survey(
     request_data: DynamicCourseSurveyCreateRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
-
     if request_data.data.featured is True:
         db.query(models.DynamicCourseSurvey).filter_by(featured=True).update(
             {"featured": False}
@@ -60,6 +40,7 @@ def create_dynamic_course_survey(
     db.add(survey)
     db.commit()
 
+    response_cache.invalidate(response_cache.SURVEYS)
     return JSONResponse(
         status_code=status.HTTP_201_CREATED,
         content={
@@ -79,27 +60,8 @@ def create_dynamic_course_survey(
 def create_dynamic_course_survey_question(
     request_data: DynamicCourseSurveyQuestionCreateRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
-
     if request_data.data.bulk and request_data.data.questions:
         questions = []
         for question_item in request_data.data.questions:
@@ -110,6 +72,7 @@ def create_dynamic_course_survey_question(
             questions.append(question_)
             db.add(question_)
             db.commit()
+        response_cache.invalidate(response_cache.SURVEYS)
         return JSONResponse(
             status_code=status.HTTP_201_CREATED,
             content={
@@ -132,6 +95,7 @@ def create_dynamic_course_survey_question(
     db.add(survey_question)
     db.commit()
 
+    response_cache.invalidate(response_cache.SURVEYS)
     return JSONResponse(
         status_code=status.HTTP_201_CREATED,
         content={
@@ -149,17 +113,15 @@ def create_dynamic_course_survey_question(
     tags=["surveys"],
 )
 def get_dynamic_course_survey_by_id(
+    request: Request,
     survey_id: int = Path(title="id of the survey"),
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
+    cached = response_cache.get_cached_response(request, response_cache.SURVEYS)
+    if cached is not None:
+        return cached
+
     survey = (
         db.query(models.DynamicCourseSurvey)
         .filter_by(
@@ -183,7 +145,7 @@ def get_dynamic_course_survey_by_id(
             content={"error": "Survey not found"},
         )
 
-    return JSONResponse(
+    response = JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
             "data": {
@@ -209,6 +171,7 @@ def get_dynamic_course_survey_by_id(
             }
         },
     )
+    return response_cache.cache_response(request, response, response_cache.SURVEYS)
 
 
 @router.get(
@@ -216,16 +179,13 @@ def get_dynamic_course_survey_by_id(
     tags=["surveys"],
 )
 def get_dynamic_course_surveys(
+    request: Request,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
+    cached = response_cache.get_cached_response(request, response_cache.SURVEYS)
+    if cached is not None:
+        return cached
 
     surveys = (
         db.query(models.DynamicCourseSurvey)
@@ -242,7 +202,7 @@ def get_dynamic_course_surveys(
         .all()
     )
 
-    return JSONResponse(
+    response = JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
             "data": [
@@ -271,6 +231,7 @@ def get_dynamic_course_surveys(
             ]
         },
     )
+    return response_cache.cache_response(request, response, response_cache.SURVEYS)
 
 
 @router.get(
@@ -278,16 +239,14 @@ def get_dynamic_course_surveys(
     tags=["surveys"],
 )
 def get_dynamic_course_survey_featured(
+    request: Request,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
+    cached = response_cache.get_cached_response(request, response_cache.SURVEYS)
+    if cached is not None:
+        return cached
+
     survey = (
         db.query(models.DynamicCourseSurvey)
         .filter_by(
@@ -311,7 +270,7 @@ def get_dynamic_course_survey_featured(
             content={"error": "Survey not found"},
         )
 
-    return JSONResponse(
+    response = JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
             "data": {
@@ -337,6 +296,7 @@ def get_dynamic_course_survey_featured(
             }
         },
     )
+    return response_cache.cache_response(request, response, response_cache.SURVEYS)
 
 
 @router.post(
@@ -346,28 +306,10 @@ def get_dynamic_course_survey_featured(
 def create_dynamic_course_survey_answer(
     request_data: DynamicCourseSurveyAnswerCreateRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
     rule_type = 0
     rule_value = 0
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
     question = (
         db.query(models.DynamicCourseSurveyQuestions)
         .filter_by(id=request_data.data.question_id)
@@ -410,6 +352,7 @@ def create_dynamic_course_survey_answer(
             answers_list.append(answer_)
             db.add(answer_)
             db.commit()
+        response_cache.invalidate(response_cache.SURVEYS)
         return JSONResponse(
             status_code=status.HTTP_201_CREATED,
             content={
@@ -456,6 +399,7 @@ def create_dynamic_course_survey_answer(
         db.add(question_answer)
         db.commit()
 
+        response_cache.invalidate(response_cache.SURVEYS)
         return JSONResponse(
             status_code=status.HTTP_201_CREATED,
             content={
@@ -477,29 +421,10 @@ def create_dynamic_course_survey_answer(
 def create_dynamic_course_survey_question_with_answers(
     request_data: DynamicCourseSurveyWithAnswersCreateRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
     rule_type = 0
     rule_value = 0
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
-
     survey_question = models.DynamicCourseSurveyQuestions(
         question=request_data.data.question,
         survey_id=request_data.data.survey_id,
@@ -535,6 +460,7 @@ def create_dynamic_course_survey_question_with_answers(
         db.add(answer_)
         db.commit()
 
+    response_cache.invalidate(response_cache.SURVEYS)
     return JSONResponse(
         status_code=status.HTTP_201_CREATED,
         content={
@@ -563,21 +489,8 @@ def create_dynamic_course_survey_question_with_answers(
 def create_dynamic_course_survey_user_results(
     request_data: DynamicCourseSurveyUserResultsCreateRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
     survey = (
         db.query(models.DynamicCourseSurvey)
         .filter_by(id=request_data.data.survey_id)
@@ -588,38 +501,62 @@ def create_dynamic_course_survey_user_results(
             status_code=status.HTTP_404_NOT_FOUND,
             content={"error": "Survey not found"},
         )
-    for survey_results in request_data.data.survey_results:
-        question = (
-            db.query(models.DynamicCourseSurveyQuestions)
-            .filter_by(
-                id=survey_results.question_id, survey_id=request_data.data.survey_id
-            )
-            .first()
+    question_ids = {
+        survey_results.question_id
+        for survey_results in request_data.data.survey_results
+    }
+    questions_count = (
+        db.query(models.DynamicCourseSurveyQuestions)
+        .filter(
+            models.DynamicCourseSurveyQuestions.survey_id == survey.id,
+            models.DynamicCourseSurveyQuestions.id.in_(question_ids),
         )
-        if question is None:
-            return JSONResponse(
-                status_code=status.HTTP_404_NOT_FOUND,
-                content={"error": "Question for question_id not found"},
-            )
-        answer = (
-            db.query(models.DynamicCourseSurveyAnswers)
-            .filter_by(
-                id=survey_results.answer_id, question_id=survey_results.question_id
+        .count()
+    )
+    if questions_count != len(question_ids):
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"error": "Question for question_id not found"},
+        )
+    answer_questions = dict(
+        db.query(
+            models.DynamicCourseSurveyAnswers.id,
+            models.DynamicCourseSurveyAnswers.question_id,
+        ).filter(
+            models.DynamicCourseSurveyAnswers.id.in_(
+                {
+                    survey_results.answer_id
+                    for survey_results in request_data.data.survey_results
+                }
             )
-            .first()
         )
-        if answer is None:
+    )
+    for survey_results in request_data.data.survey_results:
+        if answer_questions.get(survey_results.answer_id) != survey_results.question_id:
             return JSONResponse(
                 status_code=status.HTTP_404_NOT_FOUND,
                 content={"error": "Answer for answer_id not found"},
             )
-        survey_result = models.DynamicCourseSurveyUserResults(
-            user_id=user.id,
-            survey_id=survey.id,
-            question_id=survey_results.question_id,
-            answer_id=survey_results.answer_id,
+
+    if request_data.data.survey_results:
+        # a question answered again replaces its earlier answers
+        db.query(models.DynamicCourseSurveyUserResults).filter(
+            models.DynamicCourseSurveyUserResults.user_id == user.id,
+            models.DynamicCourseSurveyUserResults.survey_id == survey.id,
+            models.DynamicCourseSurveyUserResults.question_id.in_(question_ids),
+        ).delete(synchronize_session=False)
+        db.execute(
+            insert(models.DynamicCourseSurveyUserResults),
+            [
+                {
+                    "user_id": user.id,
+                    "survey_id": survey.id,
+                    "question_id": survey_results.question_id,
+                    "answer_id": survey_results.answer_id,
+                }
+                for survey_results in request_data.data.survey_results
+            ],
         )
-        db.add(survey_result)
         db.commit()
 
     return JSONResponse(
@@ -643,22 +580,8 @@ def create_dynamic_course_survey_user_results(
 def get_dynamic_course_survey_user_results(
     survey_id: int = Path(title="id of the survey"),
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
     survey_results = (
         db.query(models.DynamicCourseSurveyUserResults)
         .filter_by(survey_id=survey_id, user_id=user.id)
@@ -691,28 +614,8 @@ def get_dynamic_course_survey_user_results(
 def delete_dynamic_course_survey(
     survey_id: int = Path(title="id of the survey to delete"),
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-
-    user = db.query(models.User).filter_by(username=username).first()
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
-
     db.query(models.DynamicCourseSurveyUserResults).filter_by(
         survey_id=survey_id
     ).delete()
@@ -731,6 +634,7 @@ def delete_dynamic_course_survey(
     db.query(models.DynamicCourseSurvey).filter_by(id=survey_id).delete()
     db.commit()
 
+    response_cache.invalidate(response_cache.SURVEYS)
     return JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
@@ -1,17 +1,17 @@
 from datetime import datetime
-from fastapi import APIRouter, Depends, status, Path
+from fastapi import APIRouter, Depends, Request, status, Path
 from fastapi.responses import JSONResponse
-from fastapi_jwt_auth import AuthJWT
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 from app.routers import deps
-from app import models
+from app import answer_rules, models, crud, pagination, response_cache
 from app.schemas.lesson import (
     LessonCreateRequest,
     LessonEditRequest,
     LessonEnrollResponse,
     LessonEnrollRequest,
 )
-from app.settings import ADMIN_ID
 
 router = APIRouter()
 
@@ -20,20 +20,8 @@ router = APIRouter()
 def create_lesson(
     request_data: LessonCreateRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
     course = db.query(models.Courses).filter_by(id=request_data.data.course_id).first()
     if course is None:
         return JSONResponse(
@@ -61,7 +49,9 @@ def create_lesson(
 
     db.add(new_answer)
     db.commit()
+    answer_rules.compiled_lessons.invalidate(new_lesson.id)
 
+    response_cache.invalidate(response_cache.LESSONS)
     return JSONResponse(
         status_code=status.HTTP_201_CREATED,
         content={
@@ -88,21 +78,8 @@ def create_lesson(
 def edit_lesson(
     request_data: LessonEditRequest,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
-
     lesson_id = request_data.data.lesson_id
     lesson_edit = db.query(models.Lessons).filter_by(id=lesson_id).first()
     if lesson_edit is None:
@@ -162,7 +139,9 @@ def edit_lesson(
 
     if to_commit:
         db.commit()
+        answer_rules.compiled_lessons.invalidate(lesson_id)
 
+    response_cache.invalidate(response_cache.LESSONS)
     return JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
@@ -186,29 +165,20 @@ def edit_lesson(
 def delete_lesson(
     lesson_id: int = Path(title="id of the lesson to delete"),
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
-
+    user_ids = crud.user_stats.lesson_user_ids(db, [lesson_id])
     if db.query(models.EnrolledLessons).filter_by(lesson_id=lesson_id).first():
         db.query(models.EnrolledLessons).filter_by(lesson_id=lesson_id).delete()
 
     db.query(models.Answers).filter_by(lesson_id=lesson_id).delete()
     db.query(models.Lessons).filter_by(id=lesson_id).delete()
+    crud.user_stats.invalidate_user_stats(db, user_ids)
 
     db.commit()
+    answer_rules.compiled_lessons.invalidate(lesson_id)
 
+    response_cache.invalidate(response_cache.LESSONS)
     return JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
@@ -219,22 +189,21 @@ def delete_lesson(
 
 
 @router.get("/courses/{course_id}/lessons", tags=["lessons"])
-def get_lessons_by_course_id(
+async def get_lessons_by_course_id(
     course_id: int = Path(title="id of the course"),
-    db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    db: AsyncSession = Depends(deps.get_async_db),
+    user: deps.CurrentUser = Depends(deps.get_async_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
     lessons = (
-        db.query(models.Lessons)
-        .filter_by(course_id=course_id)
-        .order_by(models.Lessons.order)
+        (
+            await db.execute(
+                select(models.Lessons)
+                .options(selectinload(models.Lessons.answers))
+                .filter_by(course_id=course_id)
+                .order_by(models.Lessons.order)
+            )
+        )
+        .scalars()
         .all()
     )
     if lessons is None:
@@ -265,62 +234,83 @@ def get_lessons_by_course_id(
     )
 
 
+LESSON_FIELDS = (
+    "id",
+    "name",
+    "description",
+    "course_id",
+    "type",
+    "number_of_answers",
+    "order",
+)
+
+
 @router.get("/lessons", tags=["lessons"])
-def get_lessons_all(
-    db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+async def get_lessons_all(
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_db),
+    user: deps.CurrentUser = Depends(deps.get_async_current_user),
+    page: pagination.PageParams = Depends(pagination.page_params),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    lessons = db.query(models.Lessons).order_by(models.Lessons.order).all()
-    if lessons is None:
+    cached = await response_cache.get_cached_response_async(
+        request, response_cache.LESSONS
+    )
+    if cached is not None:
+        return cached
+
+    try:
+        after = page.after_values(2)
+        fields = page.select_fields(LESSON_FIELDS)
+    except ValueError as err:
         return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "Lessons not found"},
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"error": str(err)},
         )
+    # pages follow (order, id), the id keeps lessons sharing an order apart
+    keys = (models.Lessons.order, models.Lessons.id)
+    query = select(
+        *keys,
+        *(
+            getattr(models.Lessons, field)
+            for field in fields
+            if field not in ("order", "id")
+        ),
+    ).order_by(*keys)
+    if after is not None:
+        query = query.where(pagination.after_keys(keys, after))
+    if page.size is not None:
+        query = query.limit(page.size + 1)
+    lessons, next_cursor = pagination.paginate(
+        (await db.execute(query)).all(),
+        page.size,
+        lambda lesson: (lesson.order, lesson.id),
+    )
 
-    return JSONResponse(
+    response = JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
-            "data": [
-                {
-                    "id": lesson.id,
-                    "name": lesson.name,
-                    "description": lesson.description,
-                    "course_id": lesson.course_id,
-                    "type": lesson.type,
-                    "number_of_answers": lesson.number_of_answers,
-                    "order": lesson.order,
-                }
-                for lesson in lessons
-            ],
+            "data": [pagination.project(lesson._mapping, fields) for lesson in lessons],
+            "next": next_cursor,
             "error": None,
         },
     )
+    return await response_cache.cache_response_async(
+        request, response, response_cache.LESSONS
+    )
 
 
 @router.get("/courses/{course_id}/lessons/{lesson_id}", tags=["lessons"])
-def get_lesson_by_course_id(
+async def get_lesson_by_course_id(
     course_id: int = Path(title="id of the course"),
     lesson_id: int = Path(title="id of the lesson"),
-    db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    db: AsyncSession = Depends(deps.get_async_db),
+    user: deps.CurrentUser = Depends(deps.get_async_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
     lesson = (
-        db.query(models.Lessons).filter_by(course_id=course_id, id=lesson_id).first()
-    )
+        await db.execute(
+            select(models.Lessons).filter_by(course_id=course_id, id=lesson_id)
+        )
+    ).scalar()
     if lesson is None:
         return JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -345,19 +335,12 @@ def get_lesson_by_course_id(
 
 
 @router.get("/lessons/{lesson_id}", tags=["lessons"])
-def get_lesson_by_lesson_id(
+async def get_lesson_by_lesson_id(
     lesson_id: int = Path(title="id of the lesson"),
-    db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    db: AsyncSession = Depends(deps.get_async_db),
+    user: deps.CurrentUser = Depends(deps.get_async_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    lesson = db.query(models.Lessons).filter_by(id=lesson_id).first()
+    lesson = await db.get(models.Lessons, lesson_id)
     if lesson is None:
         return JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -382,24 +365,19 @@ def get_lesson_by_lesson_id(
 
 
 @router.get("/courses/lessons/{lesson_id}/{enrolled_lesson_id}", tags=["lessons"])
-def get_enrolled_lesson(
+async def get_enrolled_lesson(
     lesson_id: int = Path(title="id of the lesson"),
     enrolled_lesson_id: int = Path(title="id of the joined lesson"),
-    db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    db: AsyncSession = Depends(deps.get_async_db),
+    user: deps.CurrentUser = Depends(deps.get_async_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
     lesson_enrolled = (
-        db.query(models.EnrolledLessons)
-        .filter_by(id=enrolled_lesson_id, lesson_id=lesson_id)
-        .first()
-    )
+        await db.execute(
+            select(models.EnrolledLessons)
+            .options(selectinload(models.EnrolledLessons.lesson))
+            .filter_by(id=enrolled_lesson_id, lesson_id=lesson_id)
+        )
+    ).scalar()
     if lesson_enrolled is None:
         return JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -424,27 +402,18 @@ def get_enrolled_lesson(
 
 
 @router.post("/lesson", tags=["lessons"], response_model=LessonEnrollResponse)
-def enroll_lesson_me(
+async def enroll_lesson_me(
     request_data: LessonEnrollRequest,
-    db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    db: AsyncSession = Depends(deps.get_async_db),
+    user: deps.CurrentUser = Depends(deps.get_async_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    user = db.query(models.User).filter_by(username=username).first()
-
     lesson_wanted = request_data.data.lesson_id
     if lesson_wanted is None:
         return JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
             content={"error": "Lesson does not exist"},
         )
-    lesson_query = db.query(models.Lessons).filter_by(id=lesson_wanted).first()
+    lesson_query = await db.get(models.Lessons, lesson_wanted)
     if lesson_query is None:
         return JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -452,10 +421,12 @@ def enroll_lesson_me(
         )
 
     enrolled_lesson_exists = (
-        db.query(models.EnrolledLessons)
-        .filter_by(lesson_id=lesson_wanted, user_id=user.id)
-        .first()
-    )
+        await db.execute(
+            select(models.EnrolledLessons).filter_by(
+                lesson_id=lesson_wanted, user_id=user.id
+            )
+        )
+    ).scalar()
 
     if enrolled_lesson_exists:
         return JSONResponse(
@@ -465,8 +436,8 @@ def enroll_lesson_me(
                     "id": enrolled_lesson_exists.id,
                     "lesson_id": enrolled_lesson_exists.lesson_id,
                     "enrolled_course_id": enrolled_lesson_exists.enrolled_course_id,
-                    "name": enrolled_lesson_exists.lesson.name,
-                    "description": enrolled_lesson_exists.lesson.description,
+                    "name": lesson_query.name,
+                    "description": lesson_query.description,
                     "user_id": enrolled_lesson_exists.user_id,
                     "start_date": str(enrolled_lesson_exists.start_date),
                     "end_date": str(enrolled_lesson_exists.end_date),
@@ -485,7 +456,10 @@ def enroll_lesson_me(
         completed=False,
     )
     db.add(lesson_enrolled)
-    db.commit()
+    await db.run_sync(
+        crud.user_stats.increment_user_stats, user.id, enrolled_lessons_count=1
+    )
+    await db.commit()
 
     return JSONResponse(
         status_code=status.HTTP_201_CREATED,
@@ -494,8 +468,8 @@ def enroll_lesson_me(
                 "id": lesson_enrolled.id,
                 "lesson_id": lesson_enrolled.lesson_id,
                 "enrolled_course_id": lesson_enrolled.enrolled_course_id,
-                "name": lesson_enrolled.lesson.name,
-                "description": lesson_enrolled.lesson.description,
+                "name": lesson_query.name,
+                "description": lesson_query.description,
                 "user_id": lesson_enrolled.user_id,
                 "start_date": str(lesson_enrolled.start_date),
                 "end_date": str(lesson_enrolled.end_date),
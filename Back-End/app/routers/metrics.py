@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends, status
+from fastapi.responses import JSONResponse
+from app.db.pool import get_pool_metrics
+from app.db.session import engine, get_async_engine
+from app.routers import deps
+
+router = APIRouter()
+
+
+@router.get("/metrics/db", tags=["metrics"])
+def get_db_metrics(
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
+):
+    # connection pool numbers of the worker that serves the request, the async
+    # engine is only reported once a request has created it
+    async_metrics = None
+    if get_async_engine.cache_info().currsize:
+        async_metrics = get_pool_metrics(get_async_engine().sync_engine)
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "data": {"sync": get_pool_metrics(engine), "async": async_metrics},
+            "error": None,
+        },
+    )
@@ -1,26 +1,212 @@
-from fastapi import APIRouter, status
+import json
+from typing import Union
+from fastapi import (
+    APIRouter,
+    Depends,
+    Path,
+    Query,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
 from fastapi.responses import JSONResponse
-from app.schemas.playground import PlaygroundRequest, PlaygroundResponse
-from app.python_runner import RemotePythonRunner
+from fastapi_jwt_auth import AuthJWT
+from pydantic import ValidationError
+from fastapi_jwt_auth.exceptions import AuthJWTException
+from app import python_runner
+from app.constants import Actions, PlaygroundActions
+from app.python_runner.jobs import JobRejectedError, PlaygroundJob, job_queue
+from app.routers import deps
+from app.schemas.playground import (
+    PlaygroundJobResponse,
+    PlaygroundRequest,
+    PlaygroundResponse,
+)
+from app.websockets.managers.pubsub_manager import pubsub_manager
 
 router = APIRouter()
 
 
+def get_job_owner(Authorize: AuthJWT) -> str:
+    # jobs are limited per owner, a client address could be shared by a
+    # whole network behind NAT so only signed in users can submit code
+    return deps.get_token_username(Authorize)
+
+
+async def push_job_result(job: PlaygroundJob):
+    payload = json.dumps(
+        {"action": Actions.PLAYGROUND_RESULT.value, "data": job.to_json()}
+    )
+    await pubsub_manager.send_to_user(
+        classroom_id=job.classroom_id, user_id=job.owner, payload=payload
+    )
+
+
+def submit_job(request_data: PlaygroundRequest, owner: str) -> PlaygroundJob:
+    return job_queue.submit(
+        owner=owner,
+        code=request_data.data.content,
+        classroom_id=request_data.data.classroom_id,
+        on_finished=(
+            push_job_result if request_data.data.classroom_id is not None else None
+        ),
+    )
+
+
 @router.post("/playground", tags=["playground"], response_model=PlaygroundResponse)
-def playground(
+async def playground(
     request_data: PlaygroundRequest,
+    Authorize: AuthJWT = Depends(),
 ):
-    rpr = RemotePythonRunner()
-    text, err = rpr.run_code(request_data.data.content)
-    if len(err) == 0:
+    try:
+        job = submit_job(request_data, get_job_owner(Authorize))
+    except JobRejectedError as err:
+        return JSONResponse(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            content={"error": str(err)},
+        )
+    await job.wait()
+
+    if len(job.stderr) == 0:
         return JSONResponse(
             status_code=status.HTTP_200_OK,
             content={
-                "data": {"content": text},
+                "data": {"content": job.stdout},
                 "error": None,
             },
         )
     return JSONResponse(
         status_code=status.HTTP_200_OK,
-        content={"error": err},
+        content={"error": job.stderr},
+    )
+
+
+@router.post(
+    "/playground/jobs", tags=["playground"], response_model=PlaygroundJobResponse
+)
+async def create_playground_job(
+    request_data: PlaygroundRequest,
+    Authorize: AuthJWT = Depends(),
+):
+    try:
+        job = submit_job(request_data, get_job_owner(Authorize))
+    except JobRejectedError as err:
+        return JSONResponse(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            content={"error": str(err)},
+        )
+
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"data": job.to_json(), "error": None},
+    )
+
+
+@router.get(
+    "/playground/jobs/{job_id}",
+    tags=["playground"],
+    response_model=PlaygroundJobResponse,
+)
+async def get_playground_job(
+    job_id: str = Path(title="id of the playground job"),
+    Authorize: AuthJWT = Depends(),
+):
+    job = job_queue.get_job(job_id)
+    if job is None or job.owner != get_job_owner(Authorize):
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"error": "Job not found"},
+        )
+
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={"data": job.to_json(), "error": None},
     )
+
+
+@router.get("/playground/cache", tags=["playground"])
+def get_playground_cache_stats(
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
+):
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={"data": python_runner.cache_stats(), "error": None},
+    )
+
+
+async def send_stream_error(websocket: WebSocket, message: str):
+    await websocket.send_text(
+        json.dumps(
+            {
+                "action": PlaygroundActions.ERROR.value,
+                "data": {"error": message},
+            }
+        )
+    )
+
+
+@router.websocket("/playground/ws")
+async def playground_stream(
+    websocket: WebSocket,
+    token: Union[str, None] = Query(default=None),
+    Authorize: AuthJWT = Depends(),
+):
+    await websocket.accept()
+    try:
+        if token is None:
+            raise deps.CurrentUserError(status.HTTP_401_UNAUTHORIZED, "Unauthorized")
+        Authorize.jwt_required("websocket", token=token)
+        owner = Authorize.get_jwt_subject()
+    except AuthJWTException as err:
+        await send_stream_error(websocket, err.message)
+        await websocket.close()
+        return
+
+    try:
+        while True:
+            try:
+                request_data = PlaygroundRequest.parse_raw(
+                    await websocket.receive_text()
+                )
+            except ValidationError:
+                # a malformed frame is answered, the socket stays open
+                await send_stream_error(
+                    websocket, 'Expected {"data": {"content": "<code>"}}'
+                )
+                continue
+            try:
+                job = job_queue.submit(
+                    owner=owner, code=request_data.data.content, stream=True
+                )
+            except JobRejectedError as err:
+                await send_stream_error(websocket, str(err))
+                continue
+
+            while True:
+                chunk = await job.output.get()
+                if chunk is None:
+                    break
+                stream, text = chunk
+                await websocket.send_text(
+                    json.dumps(
+                        {
+                            "action": PlaygroundActions.OUTPUT.value,
+                            "data": {
+                                "job_id": job.id,
+                                "stream": stream,
+                                "content": text,
+                            },
+                        }
+                    )
+                )
+
+            await websocket.send_text(
+                json.dumps(
+                    {
+                        "action": PlaygroundActions.EXIT.value,
+                        "data": {"job_id": job.id, "status": job.status},
+                    }
+                )
+            )
+    except WebSocketDisconnect:
+        pass
@@ -1,9 +1,8 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, status
 from fastapi.responses import JSONResponse
-from fastapi_jwt_auth import AuthJWT
 from sqlalchemy.orm import Session
 from app.routers import deps
-from app import models, crud
+from app import crud, recommender, settings
 
 router = APIRouter()
 
@@ -11,26 +10,13 @@ router = APIRouter()
 @router.get("/recommender/courses", tags=["recommender"])
 def get_recommended_courses_by_course_tags(
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
+    limit: int = Query(
+        default=settings.RECOMMENDER_COURSES_LIMIT, gt=0, le=settings.PAGE_SIZE_MAX
+    ),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-
-    user = db.query(models.User).filter_by(username=username).first()
-
-    if user is None:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
-        )
-
     try:
-        similar_courses = crud.courses.get_similar_courses(db, user)
+        similar_courses = crud.courses.get_similar_courses(db, user, limit)
 
         return JSONResponse(
             status_code=status.HTTP_200_OK,
@@ -44,11 +30,13 @@ def get_recommended_courses_by_course_tags(
                         "featured": course.featured,
                         "tags": [
                             {
-                                "id": tag.id,
-                                "name": tag.name,
-                                "course_id": tag.course_id,
+                                "id": tag_id,
+                                "name": tag_name,
+                                "course_id": course.id,
                             }
-                            for tag in course.tags
+                            for tag_id, tag_name in recommender.course_tag_index.tags_of(
+                                course.id
+                            )
                         ],
                     }
                     for course in similar_courses
@@ -62,25 +50,73 @@ def get_recommended_courses_by_course_tags(
         )
 
 
-@router.get("/recommender/lessons", tags=["recommender"])
-def get_lessons_for_incorrect_answers(
+@router.get("/recommender/courses/cohort", tags=["recommender"])
+def get_recommended_courses_by_cohort(
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
+    limit: int = Query(
+        default=settings.RECOMMENDER_COURSES_LIMIT, gt=0, le=settings.PAGE_SIZE_MAX
+    ),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
+    cohort_courses = crud.courses.get_cohort_courses(db, user, limit)
+    recommender.course_tag_index.ensure_loaded(db)
+
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "data": [
+                {
+                    "id": course.id,
+                    "name": course.name,
+                    "description": course.description,
+                    "lang": course.lang,
+                    "featured": course.featured,
+                    "score": score,
+                    "tags": [
+                        {
+                            "id": tag_id,
+                            "name": tag_name,
+                            "course_id": course.id,
+                        }
+                        for tag_id, tag_name in recommender.course_tag_index.tags_of(
+                            course.id
+                        )
+                    ],
+                }
+                for course, score in cohort_courses
+            ]
+        },
+    )
 
-    user = db.query(models.User).filter_by(username=username).first()
 
-    if user is None:
+@router.get("/recommender/lessons", tags=["recommender"])
+def get_lessons_for_incorrect_answers(
+    db: Session = Depends(deps.get_db),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
+    ranked: bool = Query(
+        default=False, title="Rank the lessons by how much the user struggles"
+    ),
+    limit: int = Query(
+        default=settings.RECOMMENDER_COURSES_LIMIT, gt=0, le=settings.PAGE_SIZE_MAX
+    ),
+):
+    if ranked:
+        weakest_lessons = crud.courses.get_weakest_lessons(db, user, limit)
         return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": "User not found"},
+            status_code=status.HTTP_200_OK,
+            content={
+                "data": [
+                    {
+                        "id": lesson.id,
+                        "name": lesson.name,
+                        "description": lesson.description,
+                        "course_id": lesson.course_id,
+                        "incorrect_answers_count": incorrect_answers_count,
+                        "solved": bool(solved),
+                    }
+                    for lesson, incorrect_answers_count, solved in weakest_lessons
+                ]
+            },
         )
 
     try:
@@ -105,3 +141,30 @@ def get_lessons_for_incorrect_answers(
             status_code=status.HTTP_404_NOT_FOUND,
             content={"error": str(err)},
         )
+
+
+@router.get("/recommender/lessons/cohort", tags=["recommender"])
+def get_recommended_lessons_by_cohort(
+    db: Session = Depends(deps.get_db),
+    user: deps.CurrentUser = Depends(deps.get_current_user),
+    limit: int = Query(
+        default=settings.RECOMMENDER_COURSES_LIMIT, gt=0, le=settings.PAGE_SIZE_MAX
+    ),
+):
+    cohort_lessons = crud.courses.get_cohort_lessons(db, user, limit)
+
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "data": [
+                {
+                    "id": lesson.id,
+                    "name": lesson.name,
+                    "description": lesson.description,
+                    "course_id": lesson.course_id,
+                    "score": score,
+                }
+                for lesson, score in cohort_lessons
+            ]
+        },
+    )
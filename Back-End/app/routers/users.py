@@ -1,11 +1,9 @@
 from fastapi import APIRouter, Depends, status
 from fastapi.responses import JSONResponse
-from fastapi_jwt_auth import AuthJWT
 from sqlalchemy.orm import Session
 from app.routers import deps
 from app import models
 from app.schemas.user import RoleCreate, UserByUsername
-from app.settings import ADMIN_ID
 
 router = APIRouter()
 
@@ -13,19 +11,12 @@ router = APIRouter()
 @router.get("/users/me", tags=["users"])
 def get_user_me(
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    current_user: deps.CurrentUser = Depends(deps.get_current_user),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-
-    user = db.query(models.User).filter_by(username=username).first()
-
+    user = db.get(models.User, current_user.id)
     if user is None:
+        # deleted without going through the session, drop the stale entry
+        deps.current_user_cache.invalidate(current_user.username)
         return JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
             content={"error": "User not found"},
@@ -73,20 +64,8 @@ def get_user_by_username(
 def create_role(
     request_data: RoleCreate,
     db: Session = Depends(deps.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: deps.CurrentUser = Depends(deps.get_current_admin),
 ):
-    Authorize.jwt_required()
-    username = Authorize.get_jwt_subject()
-    if username is None:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"error": "Unauthorized"},
-        )
-    if db.query(models.User).filter_by(username=username).first().role_id != ADMIN_ID:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": "Forbidden"},
-        )
     if (
         db.query(models.Roles).filter_by(role_name=request_data.role_name).first()
     ) is not None:
@@ -9,3 +9,8 @@ class BaseJSONRequest(BaseModel):
 class BaseJSONResponse(BaseModel):
     data: Any
     error: Optional[str] = None
+
+
+class BaseJSONPageResponse(BaseJSONResponse):
+    # cursor to pass as after for the next page, None on the last one
+    next: Optional[str] = None
@@ -1,7 +1,7 @@
 from typing import Any, Optional
 from pydantic import BaseModel
 from pydantic_collections import BaseCollectionModel
-from app.schemas.base import BaseJSONRequest, BaseJSONResponse
+from app.schemas.base import BaseJSONPageResponse, BaseJSONRequest, BaseJSONResponse
 
 
 class ClassroomCreateData(BaseModel):
@@ -40,7 +40,7 @@ class ClassroomsAllResponseDataCollection(BaseCollectionModel[ClassroomsAllRespo
         validate_assignment_strict = False
 
 
-class ClassroomsAllResponse(BaseJSONResponse):
+class ClassroomsAllResponse(BaseJSONPageResponse):
     data: list[ClassroomsAllResponseData]
 
 
@@ -1,7 +1,7 @@
 from typing import Any, Optional
 from pydantic import BaseModel
 from pydantic_collections import BaseCollectionModel
-from app.schemas.base import BaseJSONRequest, BaseJSONResponse
+from app.schemas.base import BaseJSONPageResponse, BaseJSONRequest, BaseJSONResponse
 
 class ClassroomSessionsAllResponseData(BaseModel):
     id: int
@@ -15,7 +15,7 @@ class ClassroomSessionsAllResponseDataCollection(BaseCollectionModel[ClassroomSe
         validate_assignment_strict = False
 
 
-class ClassroomSessionsAllResponse(BaseJSONResponse):
+class ClassroomSessionsAllResponse(BaseJSONPageResponse):
     data: list[ClassroomSessionsAllResponseData]
 
 
@@ -1,7 +1,7 @@
 from typing import Any, Optional
 from pydantic import BaseModel
 from pydantic_collections import BaseCollectionModel
-from app.schemas.base import BaseJSONRequest, BaseJSONResponse
+from app.schemas.base import BaseJSONPageResponse, BaseJSONRequest, BaseJSONResponse
 
 
 class CourseCreateData(BaseModel):
@@ -105,7 +105,7 @@ class CoursesAllResponseDataCollection(BaseCollectionModel[CoursesAllResponseDat
         validate_assignment_strict = False
 
 
-class CoursesAllResponse(BaseJSONResponse):
+class CoursesAllResponse(BaseJSONPageResponse):
     data: list[CoursesAllResponseData]
 
 
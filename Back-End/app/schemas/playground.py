@@ -1,9 +1,12 @@
+from typing import Optional
 from pydantic import BaseModel
 from app.schemas.base import BaseJSONRequest, BaseJSONResponse
 
 
 class PlaygroundData(BaseModel):
     content: str
+    # when set, the result is also pushed over /ws/{classroom_id}
+    classroom_id: Optional[int] = None
 
 
 class PlaygroundRequest(BaseJSONRequest):
@@ -16,3 +19,16 @@ class PlaygroundResponseData(BaseModel):
 
 class PlaygroundResponse(BaseJSONResponse):
     data: PlaygroundResponseData
+
+
+class PlaygroundJobResponseData(BaseModel):
+    job_id: str
+    status: str
+    content: str
+    error: Optional[str] = None
+    created_at: str
+    finished_at: Optional[str] = None
+
+
+class PlaygroundJobResponse(BaseJSONResponse):
+    data: PlaygroundJobResponseData
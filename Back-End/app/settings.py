@@ -14,6 +14,106 @@ DEBUG = True
 JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY")
 
 SQLALCHEMY_DATABASE_URL: str = os.getenv("SQLALCHEMY_DATABASE_URI")
+# Async routes use the same database through an asyncio driver (aiomysql),
+# set only when the derived url does not fit
+ASYNC_SQLALCHEMY_DATABASE_URL: str = os.getenv("ASYNC_SQLALCHEMY_DATABASE_URI")
+# Connections kept open per worker process, overflow connections are closed
+# when returned, a request waits at most DB_POOL_TIMEOUT seconds for one
+DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+# The async routes have a pool of their own, a worker may hold up to both
+# pools' size + overflow connections at once
+ASYNC_DB_POOL_SIZE: int = int(os.getenv("ASYNC_DB_POOL_SIZE", "5"))
+ASYNC_DB_MAX_OVERFLOW: int = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Recycle connections before MySQL's wait_timeout drops them
+DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
 
 
 ADMIN_ID = 1
+
+# How long the id and role behind a token are reused before the user is read
+# from the database again, 0 reads it on every request
+CURRENT_USER_CACHE_TTL: int = int(os.getenv("CURRENT_USER_CACHE_TTL", "60"))
+
+# Answers of a lesson are compiled into checkers once and reused, the ttl bounds
+# how long another worker keeps a lesson edited elsewhere, size 0 disables it
+ANSWER_RULES_CACHE_SIZE: int = int(os.getenv("ANSWER_RULES_CACHE_SIZE", "1024"))
+ANSWER_RULES_CACHE_TTL: int = int(os.getenv("ANSWER_RULES_CACHE_TTL", "300"))
+# Seconds a "regex" answer may spend matching before it counts as incorrect
+ANSWER_CHECK_REGEX_TIMEOUT: float = float(
+    os.getenv("ANSWER_CHECK_REGEX_TIMEOUT", "0.1")
+)
+
+# Public catalog responses are cached with an ETag and dropped when an admin
+# edits what they show, "memory" is per worker, "redis" shares it between them
+RESPONSE_CACHE_BACKEND: str = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_SIZE: int = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL: int = int(os.getenv("RESPONSE_CACHE_TTL", "300"))
+RESPONSE_CACHE_REDIS_URL: str = os.getenv(
+    "RESPONSE_CACHE_REDIS_URL", "redis://localhost:6379/0"
+)
+
+# List endpoints return the whole list unless a page is asked for with `after`
+# or `limit`, PAGE_SIZE_DEFAULT applies when only `after` is given
+PAGE_SIZE_DEFAULT: int = int(os.getenv("PAGE_SIZE_DEFAULT", "50"))
+PAGE_SIZE_MAX: int = int(os.getenv("PAGE_SIZE_MAX", "200"))
+
+# Course tags are indexed in memory for recommendations, edits made through
+# the API apply at once, the index is rebuilt after the ttl for other workers
+RECOMMENDER_INDEX_TTL: int = int(os.getenv("RECOMMENDER_INDEX_TTL", "300"))
+RECOMMENDER_COURSES_LIMIT: int = int(os.getenv("RECOMMENDER_COURSES_LIMIT", "10"))
+# Similar courses and lessons kept per item by rebuild_recommendations.py
+RECOMMENDER_SIMILAR_ITEMS: int = int(os.getenv("RECOMMENDER_SIMILAR_ITEMS", "20"))
+# Share of its mistakes a lesson answered correctly since still counts with
+# when /recommender/lessons ranks the lessons to repeat
+RECOMMENDER_SOLVED_LESSON_WEIGHT: float = float(
+    os.getenv("RECOMMENDER_SOLVED_LESSON_WEIGHT", "0.25")
+)
+
+# Playground code execution: "ssh" runs code on the remote sandbox host,
+# "local" uses a warm pool of resource-limited python worker processes
+PYTHON_RUNNER_BACKEND: str = os.getenv("PYTHON_RUNNER_BACKEND", "ssh")
+PYTHON_RUNNER_POOL_SIZE: int = int(os.getenv("PYTHON_RUNNER_POOL_SIZE", "4"))
+PYTHON_RUNNER_TIMEOUT: int = int(os.getenv("PYTHON_RUNNER_TIMEOUT", "5"))
+PYTHON_RUNNER_MEMORY_LIMIT_MB: int = int(
+    os.getenv("PYTHON_RUNNER_MEMORY_LIMIT_MB", "256")
+)
+# stdout + stderr a single run may produce before it is killed
+PYTHON_RUNNER_MAX_OUTPUT_BYTES: int = int(
+    os.getenv("PYTHON_RUNNER_MAX_OUTPUT_BYTES", "65536")
+)
+# Account the "local" workers run as, it must not be able to read .env. Without
+# it the backend refuses to start unless PYTHON_RUNNER_LOCAL_INSECURE is set,
+# which runs student code as the API user and is meant for development only
+PYTHON_RUNNER_LOCAL_USER: str = os.getenv("PYTHON_RUNNER_LOCAL_USER", "")
+PYTHON_RUNNER_LOCAL_INSECURE: bool = (
+    os.getenv("PYTHON_RUNNER_LOCAL_INSECURE", "false").lower() == "true"
+)
+PYTHON_RUNNER_SSH_HOST: str = os.getenv("PYTHON_RUNNER_SSH_HOST", "10.179.8.194")
+PYTHON_RUNNER_SSH_USERNAME: str = os.getenv("PYTHON_RUNNER_SSH_USERNAME", "test")
+PYTHON_RUNNER_SSH_PASSWORD: str = os.getenv("PYTHON_RUNNER_SSH_PASSWORD", "test")
+# Results of identical scripts are reused, size 0 disables the cache
+PYTHON_RUNNER_CACHE_SIZE: int = int(os.getenv("PYTHON_RUNNER_CACHE_SIZE", "1024"))
+PYTHON_RUNNER_CACHE_TTL: int = int(os.getenv("PYTHON_RUNNER_CACHE_TTL", "3600"))
+
+# Playground job queue: runs beyond the queue size or the per user limit are
+# rejected instead of piling up on the worker
+PLAYGROUND_MAX_QUEUED_JOBS: int = int(os.getenv("PLAYGROUND_MAX_QUEUED_JOBS", "100"))
+PLAYGROUND_WORKERS: int = int(
+    os.getenv("PLAYGROUND_WORKERS", str(PYTHON_RUNNER_POOL_SIZE))
+)
+PLAYGROUND_JOBS_PER_USER: int = int(os.getenv("PLAYGROUND_JOBS_PER_USER", "2"))
+PLAYGROUND_FINISHED_JOBS_KEPT: int = int(
+    os.getenv("PLAYGROUND_FINISHED_JOBS_KEPT", "1000")
+)
+
+# Classroom websocket state: "memory" keeps it inside one worker, "redis" shares
+# it between gunicorn workers
+CLASSROOM_BACKEND: str = os.getenv("CLASSROOM_BACKEND", "memory")
+CLASSROOM_REDIS_URL: str = os.getenv("CLASSROOM_REDIS_URL", "redis://localhost:6379/0")
+# Every classroom socket gets its own outbound queue, a socket that falls this
+# far behind or takes longer than the timeout to accept a frame is disconnected
+CLASSROOM_OUTBOX_SIZE: int = int(os.getenv("CLASSROOM_OUTBOX_SIZE", "256"))
+CLASSROOM_SEND_TIMEOUT: int = int(os.getenv("CLASSROOM_SEND_TIMEOUT", "5"))
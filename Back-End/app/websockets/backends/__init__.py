@@ -0,0 +1,34 @@
+from app import settings
+from app.websockets.backends.memory import MemoryBackend
+
+_backend = None
+
+
+def create_backend():
+    if settings.CLASSROOM_BACKEND == "memory":
+        return MemoryBackend()
+    if settings.CLASSROOM_BACKEND == "redis":
+        # redis is only needed when classrooms are shared between workers
+        from app.websockets.backends.broker import RedisBackend
+
+        return RedisBackend(url=settings.CLASSROOM_REDIS_URL)
+    raise ValueError(f"Unknown classroom backend: {settings.CLASSROOM_BACKEND}")
+
+
+def get_backend():
+    global _backend  # pylint: disable=W0603
+    if _backend is None:
+        _backend = create_backend()
+    return _backend
+
+
+def set_backend(backend):
+    global _backend  # pylint: disable=W0603
+    _backend = backend
+
+
+async def close_backend():
+    global _backend  # pylint: disable=W0603
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
@@ -0,0 +1,78 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+import redis.asyncio as redis
+
+Callback = Callable[[str], Awaitable[None]]
+
+logger = logging.getLogger(__name__)
+
+# Workers write the state after every message they applied, a slower worker
+# must not overwrite a newer state with its older one.
+SET_STATE_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'version')
+if current and tonumber(current) >= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'version', ARGV[1], 'value', ARGV[2])
+return 1
+"""
+
+
+class RedisBackend:
+    shared = True
+
+    def __init__(self, url: str, client=None):
+        # tests pass their own client in place of a real redis server
+        self._client = client if client is not None else redis.from_url(
+            url, decode_responses=True
+        )
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._set_state = self._client.register_script(SET_STATE_SCRIPT)
+        self._callbacks: Dict[str, Callback] = dict()
+        self._reader: Optional[asyncio.Task] = None
+
+    async def publish(self, channel: str, message: str):
+        await self._client.publish(channel, message)
+
+    async def subscribe(self, channel: str, callback: Callback):
+        self._callbacks[channel] = callback
+        await self._pubsub.subscribe(channel)
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read())
+
+    async def unsubscribe(self, channel: str):
+        self._callbacks.pop(channel, None)
+        await self._pubsub.unsubscribe(channel)
+
+    async def _read(self):
+        # one reader per worker keeps messages of a channel in publish order
+        while self._callbacks:
+            message = await self._pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=1.0
+            )
+            if message is None:
+                continue
+            callback = self._callbacks.get(message["channel"])
+            if callback is None:
+                continue
+            try:
+                await callback(message["data"])
+            except Exception:  # pylint: disable=W0703
+                logger.exception("Failed to handle message on %s", message["channel"])
+
+    async def get_state(self, key: str) -> Optional[str]:
+        return await self._client.hget(key, "value")
+
+    async def set_state(self, key: str, value: str, version: int) -> bool:
+        return bool(await self._set_state(keys=[key], args=[version, value]))
+
+    async def delete_state(self, key: str):
+        await self._client.delete(key)
+
+    async def close(self):
+        self._callbacks.clear()
+        if self._reader is not None:
+            self._reader.cancel()
+        await self._pubsub.close()
+        await self._client.close()
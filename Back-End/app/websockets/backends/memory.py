@@ -0,0 +1,42 @@
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+Callback = Callable[[str], Awaitable[None]]
+
+
+class MemoryBackend:
+    # messages never leave the process, only usable with a single worker
+    shared = False
+
+    def __init__(self):
+        self._callbacks: Dict[str, Callback] = dict()
+        # key -> (version, value)
+        self._state: Dict[str, Tuple[int, str]] = dict()
+
+    async def publish(self, channel: str, message: str):
+        callback = self._callbacks.get(channel)
+        if callback is not None:
+            await callback(message)
+
+    async def subscribe(self, channel: str, callback: Callback):
+        self._callbacks[channel] = callback
+
+    async def unsubscribe(self, channel: str):
+        self._callbacks.pop(channel, None)
+
+    async def get_state(self, key: str) -> Optional[str]:
+        state = self._state.get(key)
+        return state[1] if state is not None else None
+
+    async def set_state(self, key: str, value: str, version: int) -> bool:
+        # same compare-and-set as the redis backend, an older version is ignored
+        current = self._state.get(key)
+        if current is not None and current[0] >= version:
+            return False
+        self._state[key] = (version, value)
+        return True
+
+    async def delete_state(self, key: str):
+        self._state.pop(key, None)
+
+    async def close(self):
+        self._callbacks.clear()
@@ -15,10 +15,11 @@ class ClassroomManager:
         else:
             return None
 
-    def add_classroom(self, classroom_id: int):
+    def add_classroom(self, classroom_id: int, classroom: Classroom = None):
         if classroom_id not in self.existing_classes:
-            self.existing_classes[classroom_id] = Classroom(
-                classroom_id=classroom_id)
+            if classroom is None:
+                classroom = Classroom(classroom_id=classroom_id)
+            self.existing_classes[classroom_id] = classroom
 
     def remove_classroom(self, classroom_id: int):
         self.existing_classes.pop(classroom_id)
@@ -1,56 +1,191 @@
 # IMPORTS
-import json
-from typing import List, Dict
+import asyncio
+import time
+import uuid
+from collections import deque
+from typing import Dict
 from fastapi import WebSocket
 
 # MODELS
 from app.websockets.models.classroom import Classroom
 
 # CONSTANTS
-from app.constants import Actions
+from app import settings
 
 # MANAGERS
 from app.websockets.managers.classroom_manager import class_manager
 
 
+class BroadcastMetrics:
+    def __init__(self):
+        self.frames_sent = 0
+        self.frames_coalesced = 0
+        self.connections_evicted = 0
+        self.total_send_latency = 0.0
+        self.max_send_latency = 0.0
+
+    def record_send(self, latency: float):
+        self.frames_sent += 1
+        self.total_send_latency += latency
+        self.max_send_latency = max(self.max_send_latency, latency)
+
+
+class Outbox:
+    # Frames for one socket are sent in order by a task of their own, so a slow
+    # socket only holds up itself. Frames sent with a coalesce key are updates
+    # of one thing (e.g. a whiteboard). A full frame carries its whole state,
+    # the queued frames of the same key are already part of it and are dropped
+    # instead of being sent ahead of it.
+    def __init__(self, websocket: WebSocket, metrics: BroadcastMetrics):
+        self._websocket = websocket
+        self._metrics = metrics
+        # entries are [payload, coalesce_key, enqueued_at], payload None once superseded
+        self._frames = deque()
+        # coalesce key -> its queued entries, oldest first
+        self._pending: Dict[str, deque] = dict()
+        self._size = 0
+        self._wakeup = asyncio.Event()
+        self._closed = False
+        self._task = asyncio.create_task(self._run())
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def put(self, payload: str, coalesce_key: str = None, full: bool = False):
+        if self._closed:
+            return
+
+        if full and coalesce_key in self._pending:
+            superseded = self._pending.pop(coalesce_key)
+            for entry in superseded:
+                entry[0] = None
+            self._size -= len(superseded)
+            self._metrics.frames_coalesced += len(superseded)
+        elif self._size >= settings.CLASSROOM_OUTBOX_SIZE:
+            # the client is not keeping up, it resyncs when it reconnects
+            self.evict()
+            return
+
+        entry = [payload, coalesce_key, time.monotonic()]
+        self._frames.append(entry)
+        if coalesce_key is not None:
+            self._pending.setdefault(coalesce_key, deque()).append(entry)
+        self._size += 1
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            if not self._frames:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            payload, coalesce_key, enqueued_at = self._frames.popleft()
+            if payload is None:
+                continue
+            self._size -= 1
+            if coalesce_key is not None:
+                pending = self._pending[coalesce_key]
+                pending.popleft()
+                if not pending:
+                    del self._pending[coalesce_key]
+
+            try:
+                await asyncio.wait_for(self._websocket.send_text(payload), timeout=settings.CLASSROOM_SEND_TIMEOUT)
+            except Exception:  # pylint: disable=W0703
+                self.evict()
+                return
+            self._metrics.record_send(time.monotonic() - enqueued_at)
+
+    def evict(self):
+        if self._closed:
+            return
+        self._metrics.connections_evicted += 1
+        self.close()
+        # closing the socket ends its receive loop, which runs the usual disconnect
+        asyncio.create_task(self._close_websocket())
+
+    async def _close_websocket(self):
+        try:
+            await self._websocket.close()
+        except Exception:  # pylint: disable=W0703
+            pass
+
+    def close(self):
+        self._closed = True
+        self._frames.clear()
+        self._pending.clear()
+        self._size = 0
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+
+
 class ConnectionManager:
     def __init__(self):
         self.existing_classes: Dict[int, Classroom] = dict()
+        # only the sockets connected to this worker
+        self.connections: Dict[str, WebSocket] = dict()
+        self.outboxes: Dict[WebSocket, Outbox] = dict()
+        self.metrics = BroadcastMetrics()
 
-    async def connect(self, classroom_id: int, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        class_manager.add_classroom(classroom_id)
-
-    async def disconnect(self, classroom_id: int, websocket: WebSocket):
-        user = class_manager.get_classroom(classroom_id=classroom_id).get_user(
-            websocket=websocket)
-        if(user):
-            user.go_offline()
-            payload = json.dumps(
-                {"action": Actions.LEAVE.value, "data": user.to_json()})
-            await self.broadcast_class_online(
-                classroom_id=classroom_id, payload=payload)
-
-    async def send_personal_payload(self, payload: str, websocket: WebSocket):
-        await websocket.send_text(payload)
-
-    async def broadcast_class(self, payload: str, classroom_id: int):
+        connection_id = uuid.uuid4().hex
+        self.connections[connection_id] = websocket
+        self.outboxes[websocket] = Outbox(websocket, self.metrics)
+        return connection_id
+
+    def disconnect(self, connection_id: str):
+        websocket = self.connections.pop(connection_id, None)
+        outbox = self.outboxes.pop(websocket, None)
+        if outbox is not None:
+            outbox.close()
+        return websocket
+
+    def get_websocket(self, connection_id: str):
+        return self.connections.get(connection_id)
+
+    def get_metrics(self):
+        queue_depths = [outbox.size for outbox in self.outboxes.values()]
+        return {
+            "connections": len(self.outboxes),
+            "queued_frames": sum(queue_depths),
+            "max_queue_depth": max(queue_depths, default=0),
+            "frames_sent": self.metrics.frames_sent,
+            "frames_coalesced": self.metrics.frames_coalesced,
+            "connections_evicted": self.metrics.connections_evicted,
+            "avg_send_latency_ms": self.metrics.total_send_latency / self.metrics.frames_sent * 1000 if self.metrics.frames_sent else 0.0,
+            "max_send_latency_ms": self.metrics.max_send_latency * 1000,
+        }
+
+    async def send_personal_payload(self, payload: str, websocket: WebSocket, coalesce_key: str = None, full: bool = False):
+        # sockets of other workers and closed sockets have no outbox
+        outbox = self.outboxes.get(websocket)
+        if outbox is not None:
+            outbox.put(payload, coalesce_key=coalesce_key, full=full)
+
+    async def broadcast_class(self, payload: str, classroom_id: int, coalesce_key: str = None, full: bool = False):
         for user in class_manager.get_classroom(classroom_id).users:
-            await user.websocket.send_text(payload)
+            await self.send_personal_payload(payload=payload, websocket=user.websocket, coalesce_key=coalesce_key, full=full)
 
-    async def broadcast_class_except(self, payload: str, classroom_id: int,  websocket: WebSocket):
+    async def broadcast_class_except(self, payload: str, classroom_id: int,  websocket: WebSocket, coalesce_key: str = None, full: bool = False):
         for user in class_manager.get_classroom(classroom_id).users:
             if user.websocket != websocket:
-                await user.websocket.send_text(payload)
+                await self.send_personal_payload(payload=payload, websocket=user.websocket, coalesce_key=coalesce_key, full=full)
 
-    async def broadcast_class_online(self, payload: str, classroom_id: int, ):
+    async def broadcast_class_online(self, payload: str, classroom_id: int, coalesce_key: str = None, full: bool = False):
         for user in class_manager.get_classroom(classroom_id).users:
             if user.status.value:
-                await user.websocket.send_text(payload)
+                await self.send_personal_payload(payload=payload, websocket=user.websocket, coalesce_key=coalesce_key, full=full)
 
-    async def broadcast_class_students(self, payload: str, classroom_id: int, ):
+    async def broadcast_class_students(self, payload: str, classroom_id: int, coalesce_key: str = None, full: bool = False):
         for user in class_manager.get_classroom(classroom_id).get_all_students():
-            await user.websocket.send_text(payload)
+            await self.send_personal_payload(payload=payload, websocket=user.websocket, coalesce_key=coalesce_key, full=full)
 
 
 conn_manager = ConnectionManager()
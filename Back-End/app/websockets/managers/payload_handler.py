@@ -1,13 +1,14 @@
 # IMPORTS
 import datetime
-import json
 from fastapi import WebSocket
 
 # MODELS
 from app.websockets.models.user import User
 from app.websockets.models.assignment import UserAssignment
 from app.websockets.models.assignment import Assignment
-from app.websockets.models.classroom import Classroom
+from app.websockets.models.whiteboard import Whiteboard
+from app.websockets.models.snapshot import encode
+from app.websockets.models.message_context import MessageContext
 
 # CONSTANTS
 from app.constants import UserStatus
@@ -24,396 +25,365 @@ from app.websockets.managers.classroom_manager import class_manager
 
 class PayloadHandler:
     def __init__(self):
-        self._payload_action: int = None
-        self._payload_user_id: str = None
-        self._payload_data: dict = None
-        self._source_classroom_id: int = None
-        self._selected_classroom: Classroom = None
-        self._source_websocket: WebSocket = None
-
-    @property
-    def payload_action(self):
-        return self._payload_action
-
-    @payload_action.setter
-    def payload_action(self, payload_action: int):
-        self._payload_action = payload_action
-
-    @property
-    def payload_user_id(self):
-        return self._payload_user_id
-
-    @payload_user_id.setter
-    def payload_user_id(self, payload_user_id: str):
-        self._payload_user_id = payload_user_id
-
-    @property
-    def payload_data(self):
-        return self._payload_data
-
-    @payload_data.setter
-    def payload_data(self, payload_data: dict):
-        self._payload_data = payload_data
-
-    @property
-    def source_classroom_id(self):
-        return self._source_classroom_id
-
-    @source_classroom_id.setter
-    def source_classroom_id(self, source_classroom_id: int):
-        self._source_classroom_id = source_classroom_id
-
-    @property
-    def selected_classroom(self):
-        return self._selected_classroom
-
-    @selected_classroom.setter
-    def selected_classroom(self, selected_classroom: Classroom):
-        self._selected_classroom = selected_classroom
-
-    @property
-    def source_websocket(self):
-        return self._source_websocket
-
-    @source_websocket.setter
-    def source_websocket(self, source_websocket: WebSocket):
-        self._source_websocket = source_websocket
-
-    def set_message_data(self, payload: dict, classroom_id: int, websocket: WebSocket):
-        self.payload_action = payload['action']
-        self.payload_user_id = payload['user_id']
-        self.payload_data = payload['data']
-        self.source_classroom_id = classroom_id
-        self.selected_classroom = class_manager.get_classroom(
-            classroom_id=classroom_id)
-        self.source_websocket = websocket
-
-    async def process_message(self, payload: dict, classroom_id: int, websocket: WebSocket):
-        self.set_message_data(
-            payload=payload, classroom_id=classroom_id, websocket=websocket)
-
-        if self.payload_action == Actions.JOIN.value:
-            await self.join()
-
-        elif self.payload_action == Actions.TEACHER_JOIN.value:
-            await self.teacher_join()
-
-        elif self.payload_action == Actions.CODE_CHANGE.value:
-            await self.code_change()
-
-        elif self.payload_action == Actions.GET_DATA.value:
-            await self.get_data()
-
-        elif self.payload_action == Actions.ASSIGNMENT_CREATE.value:
-            await self.assignment_create()
-
-        elif self.payload_action == Actions.LOCK_CODE.value:
-            await self.lock_code()
-
-        elif self.payload_action == Actions.UNLOCK_CODE.value:
-            await self.unlock_code()
-
-        elif self.payload_action == Actions.CLASSROOM_DELETED.value:
-            await self.classroom_deleted()
-
-        elif self.payload_action == Actions.SUBMIT_ASSIGNMENT.value:
-            await self.submit_assignment()
-
-        elif self.payload_action == Actions.GRADE_ASSIGNMENT.value:
-            await self.grade_assignment()
-
-    async def join(self):
+        self._routes = {
+            Actions.JOIN.value: self.join,
+            Actions.TEACHER_JOIN.value: self.teacher_join,
+            Actions.CODE_CHANGE.value: self.code_change,
+            Actions.GET_DATA.value: self.get_data,
+            Actions.ASSIGNMENT_CREATE.value: self.assignment_create,
+            Actions.LOCK_CODE.value: self.lock_code,
+            Actions.UNLOCK_CODE.value: self.unlock_code,
+            Actions.CLASSROOM_DELETED.value: self.classroom_deleted,
+            Actions.SUBMIT_ASSIGNMENT.value: self.submit_assignment,
+            Actions.GRADE_ASSIGNMENT.value: self.grade_assignment,
+            Actions.LEAVE.value: self.leave,
+        }
+
+    async def process_message(self, payload: dict, classroom_id: int, websocket: WebSocket, connection_id: str = None, message_id: str = None):
+        context = MessageContext(payload=payload, classroom=class_manager.get_classroom(
+            classroom_id=classroom_id), classroom_id=classroom_id, websocket=websocket, connection_id=connection_id, message_id=message_id)
+
+        handler = self._routes.get(context.payload_action)
+        if handler is not None:
+            await handler(context)
+
+    async def join(self, context: MessageContext):
         # check if user is already in classroom and is reconnecting
-        user = self.selected_classroom.get_user_by_id(self.payload_user_id)
+        user = context.selected_classroom.get_user_by_id(context.payload_user_id)
         if user is not None:
             # Update websocket and status
-            user.websocket = self.source_websocket
+            user.websocket = context.source_websocket
+            user.connection_id = context.connection_id
             user.status = UserStatus.ONLINE
 
             # Send message to user
             active_students = [
-                user.to_json() for user in self.selected_classroom.get_online_students()]
-            response_payload = json.dumps({
+                user.to_json_str() for user in context.selected_classroom.get_online_students()]
+            response_payload = encode({
                 "action": Actions.SYNC_DATA.value,
                 "data": {
                     "users": active_students,
-                    "teacher": self.selected_classroom.get_teacher().to_json(),
-                    "personalData": user.to_json(),
-                    "classroomData": self.selected_classroom.to_json()
+                    "teacher": context.selected_classroom.get_teacher().to_json_str(),
+                    "personalData": user.to_json_str(),
+                    "classroomData": context.selected_classroom.to_json_str()
                 }
             })
 
-            await conn_manager.send_personal_payload(payload=response_payload, websocket=self.source_websocket)
+            await conn_manager.send_personal_payload(payload=response_payload, websocket=context.source_websocket)
 
         else:
             # Create new user
             user = user_manager.create_student(
-                user_id=self.payload_user_id, classroom=self.selected_classroom, websocket=self.source_websocket)
+                user_id=context.payload_user_id, classroom=context.selected_classroom, websocket=context.source_websocket, connection_id=context.connection_id)
 
             # Add user to classroom
-            self.selected_classroom.add_user(user)
+            context.selected_classroom.add_user(user)
 
             # Send message to user
             active_students = [
-                user.to_json() for user in self.selected_classroom.get_online_students()]
-            response_payload = json.dumps({
+                user.to_json_str() for user in context.selected_classroom.get_online_students()]
+            response_payload = encode({
                 "action": Actions.SYNC_DATA.value,
                 "data": {
                     "users": active_students,
-                    "teacher": self.selected_classroom.get_teacher().to_json(),
-                    "personalData": user.to_json(),
-                    "classroomData": self.selected_classroom.to_json()
+                    "teacher": context.selected_classroom.get_teacher().to_json_str(),
+                    "personalData": user.to_json_str(),
+                    "classroomData": context.selected_classroom.to_json_str()
                 }
             })
 
-            await conn_manager.send_personal_payload(payload=response_payload, websocket=self.source_websocket)
+            await conn_manager.send_personal_payload(payload=response_payload, websocket=context.source_websocket)
 
         # Broadcast message to all users in classroom that a new user has joined
-        class_payload = json.dumps({
+        class_payload = encode({
             "action": Actions.JOIN.value,
-            "data": user.to_json()
+            "data": user.to_json_str()
         })
 
-        await conn_manager.broadcast_class_except(classroom_id=self.source_classroom_id, payload=class_payload, websocket=self.source_websocket)
+        await conn_manager.broadcast_class_except(classroom_id=context.source_classroom_id, payload=class_payload, websocket=context.source_websocket)
 
-    async def teacher_join(self):
+    async def teacher_join(self, context: MessageContext):
         response_payload = None
 
         # check if teacher is already in classroom and is reconnecting
-        user = self.selected_classroom.get_user_by_id(self.payload_user_id)
+        user = context.selected_classroom.get_user_by_id(context.payload_user_id)
         if user is not None:
             # Update websocket and status
-            user.websocket = self._source_websocket
+            user.websocket = context.source_websocket
+            user.connection_id = context.connection_id
             user.status = UserStatus.ONLINE
 
-            response_payload = json.dumps({
+            response_payload = encode({
                 "action": Actions.SYNC_DATA.value,
                 "data": {
-                    "classroomData": self.selected_classroom.to_json(),
-                    "personalData": user.to_json()
+                    "classroomData": context.selected_classroom.to_json_str(),
+                    "personalData": user.to_json_str()
                 }
             })
 
-            await conn_manager.send_personal_payload(payload=response_payload, websocket=self.source_websocket)
+            await conn_manager.send_personal_payload(payload=response_payload, websocket=context.source_websocket)
         else:
             # Create new teacher
             new_user = user_manager.create_teacher(
-                user_id=self.payload_user_id, websocket=self.source_websocket)
+                user_id=context.payload_user_id, websocket=context.source_websocket, connection_id=context.connection_id)
 
             # Add teacher to classroom
-            self.selected_classroom.add_user(new_user)
+            context.selected_classroom.add_user(new_user)
 
-    async def code_change(self):
-        source_user = self.selected_classroom.get_user(
-            websocket=self.source_websocket)
-        source_code = self.payload_data["code"]
-        source_whiteboard_type = self.payload_data["whiteboard_type"]
+    async def code_change(self, context: MessageContext):
+        source_user = context.selected_classroom.get_user_by_id(
+            context.payload_user_id)
+        source_whiteboard_type = context.payload_data["whiteboard_type"]
 
         # Check if user is teacher
         if source_user.role == ClassroomUserRole.TEACHER:
             # Check whiteboard type
             if source_whiteboard_type == WhiteboardType.PUBLIC.value:
                 # Update shared whiteboard code and broadcast to all students
-                self.selected_classroom.shared_whiteboard.code = source_code
-
-                response_payload = json.dumps({
-                    "action": Actions.CODE_CHANGE.value,
-                    "data": {
-                        "source": source_user.to_json(),
-                        "whiteboard": self.selected_classroom.shared_whiteboard.to_json()
-                    }
-                })
+                response_payload = await self.update_whiteboard(
+                    context=context, source_user=source_user, whiteboard=context.selected_classroom.shared_whiteboard)
+                if response_payload is None:
+                    return
 
-                await conn_manager.broadcast_class_students(classroom_id=self.source_classroom_id, payload=response_payload)
+                await conn_manager.broadcast_class_students(classroom_id=context.source_classroom_id, payload=response_payload, **self.get_frame_options(context, context.selected_classroom.shared_whiteboard))
 
             elif source_whiteboard_type == WhiteboardType.PRIVATE.value:
                 # Update user whiteboard code and send it to user
-                target_user = self.selected_classroom.get_user_by_id(
-                    self.payload_data["target_user"])
-                target_user.whiteboard.code = source_code
-
-                response_payload = json.dumps({
-                    "action": Actions.CODE_CHANGE.value,
-                    "data": {
-                        "source": source_user.to_json(),
-                        "whiteboard": target_user.whiteboard.to_json()
-                    }
-                })
+                target_user = context.selected_classroom.get_user_by_id(
+                    context.payload_data["target_user"])
+                response_payload = await self.update_whiteboard(
+                    context=context, source_user=source_user, whiteboard=target_user.whiteboard)
+                if response_payload is None:
+                    return
 
-                await conn_manager.send_personal_payload(payload=response_payload, websocket=target_user.websocket)
+                await conn_manager.send_personal_payload(payload=response_payload, websocket=target_user.websocket, **self.get_frame_options(context, target_user.whiteboard))
 
             elif source_whiteboard_type == WhiteboardType.ASSIGNMENT.value:
                 # Update user assignment whiteboard code and send it to user
-                target_user = self.selected_classroom.get_user_by_id(
-                    self.payload_data["target_user"])
-                assignment_name = self.payload_data["assignment_name"]
+                target_user = context.selected_classroom.get_user_by_id(
+                    context.payload_data["target_user"])
+                assignment_name = context.payload_data["assignment_name"]
                 user_assignment = target_user.get_user_assignment(
                     assignment_name=assignment_name)
-                user_assignment.whiteboard.code = source_code
-
-                response_payload = json.dumps({
-                    "action": Actions.CODE_CHANGE.value,
-                    "data": {
-                        "source": source_user.to_json(),
-                        "whiteboard": user_assignment.whiteboard.to_json(),
-                        "userAssignment": user_assignment.to_json()
-                    }
-                })
+                response_payload = await self.update_whiteboard(
+                    context=context, source_user=source_user, whiteboard=user_assignment.whiteboard, user_assignment=user_assignment)
+                if response_payload is None:
+                    return
 
-                await conn_manager.send_personal_payload(payload=response_payload, websocket=target_user.websocket)
+                await conn_manager.send_personal_payload(payload=response_payload, websocket=target_user.websocket, **self.get_frame_options(context, user_assignment.whiteboard))
 
         else:
             if source_whiteboard_type == WhiteboardType.PRIVATE.value:
                 # Update user private whiteboard code and send it to teacher
-                source_user.whiteboard.code = source_code
-
-                response_payload = json.dumps({
-                    "action": Actions.CODE_CHANGE.value,
-                    "data": {
-                        "source": source_user.to_json(),
-                        "whiteboard": source_user.whiteboard.to_json()
-                    }
-                })
+                response_payload = await self.update_whiteboard(
+                    context=context, source_user=source_user, whiteboard=source_user.whiteboard)
+                if response_payload is None:
+                    return
 
-                await conn_manager.send_personal_payload(payload=response_payload, websocket=self.selected_classroom.get_teacher().websocket)
+                await conn_manager.send_personal_payload(payload=response_payload, websocket=context.selected_classroom.get_teacher().websocket, **self.get_frame_options(context, source_user.whiteboard))
 
             elif source_whiteboard_type == WhiteboardType.PUBLIC.value:
-                if(self.selected_classroom.editable == False):
+                if(context.selected_classroom.editable == False):
                     return
 
                 # Update shared whiteboard code and send it to teacher'
-                self.selected_classroom.shared_whiteboard.code = source_code
-                response_payload = json.dumps({
-                    "action": Actions.CODE_CHANGE.value,
-                    "data": {
-                        "source": source_user.to_json(),
-                        "whiteboard": self.selected_classroom.shared_whiteboard.to_json()
-                    }
-                })
+                response_payload = await self.update_whiteboard(
+                    context=context, source_user=source_user, whiteboard=context.selected_classroom.shared_whiteboard)
+                if response_payload is None:
+                    return
 
-                await conn_manager.broadcast_class(payload=response_payload, classroom_id=self.source_classroom_id)
+                if "delta" in context.payload_data:
+                    # the author already has the change applied
+                    await conn_manager.broadcast_class_except(payload=response_payload, classroom_id=context.source_classroom_id, websocket=context.source_websocket, **self.get_frame_options(context, context.selected_classroom.shared_whiteboard))
+                else:
+                    await conn_manager.broadcast_class(payload=response_payload, classroom_id=context.source_classroom_id, **self.get_frame_options(context, context.selected_classroom.shared_whiteboard))
 
             elif source_whiteboard_type == WhiteboardType.ASSIGNMENT.value:
                 # Update user assignment whiteboard code and send it to teacher
                 assignment = source_user.get_user_assignment(
-                    assignment_name=self.payload_data["assignment_name"])
-                assignment.whiteboard.code = source_code
+                    assignment_name=context.payload_data["assignment_name"])
+                response_payload = await self.update_whiteboard(
+                    context=context, source_user=source_user, whiteboard=assignment.whiteboard, user_assignment=assignment)
+                if response_payload is None:
+                    return
 
-                response_payload = json.dumps({
-                    "action": Actions.CODE_CHANGE.value,
-                    "data": {
-                        "source": source_user.to_json(),
-                        "whiteboard": assignment.whiteboard.to_json(),
-                        "userAssignment": assignment.to_json()
-                    }
-                })
+                await conn_manager.send_personal_payload(payload=response_payload, websocket=context.selected_classroom.get_teacher().websocket, **self.get_frame_options(context, assignment.whiteboard))
+
+    async def update_whiteboard(self, context: MessageContext, source_user: User, whiteboard: Whiteboard, user_assignment: UserAssignment = None):
+        # Clients either send the whole code or a delta against the version
+        # they have seen: {"delta": {"version": 3, "ops": [5, "x", -2]}}
+        delta = context.payload_data.get("delta")
+        if delta is None:
+            whiteboard.code = context.payload_data["code"]
+            return self.full_code_change_payload(source_user=source_user, whiteboard=whiteboard, user_assignment=user_assignment)
+
+        if not isinstance(delta, dict) or type(delta.get("version")) is not int or not isinstance(delta.get("ops"), list):
+            await self.send_error(context, 'Expected a delta like {"version": 3, "ops": [5, "x", -2]}')
+            return None
+
+        try:
+            operation = whiteboard.apply_delta(delta["version"], delta["ops"])
+        except ValueError:
+            # The author is out of sync, send the whole document back
+            response_payload = self.full_code_change_payload(
+                source_user=source_user, whiteboard=whiteboard, user_assignment=user_assignment)
+            await conn_manager.send_personal_payload(payload=response_payload, websocket=context.source_websocket, coalesce_key=self.get_coalesce_key(whiteboard), full=True)
+            return None
+
+        ack_payload = encode({
+            "action": Actions.CODE_CHANGE.value,
+            "data": {
+                "whiteboard": whiteboard.delta_json(),
+                "ack": True
+            }
+        })
+        await conn_manager.send_personal_payload(payload=ack_payload, websocket=context.source_websocket)
+
+        response_data = {
+            "source": {"userId": source_user.user_id},
+            "whiteboard": whiteboard.delta_json(),
+            "delta": operation
+        }
+        if user_assignment is not None:
+            response_data["userAssignment"] = {
+                "assignment": {"title": user_assignment.assignment.title}}
+        return encode({
+            "action": Actions.CODE_CHANGE.value,
+            "data": response_data
+        })
 
-                await conn_manager.send_personal_payload(payload=response_payload, websocket=self.selected_classroom.get_teacher().websocket)
+    async def send_error(self, context: MessageContext, error: str):
+        response_payload = encode({
+            "action": Actions.ERROR.value,
+            "data": {"error": error}
+        })
+        await conn_manager.send_personal_payload(payload=response_payload, websocket=context.source_websocket)
+
+    def get_coalesce_key(self, whiteboard: Whiteboard):
+        return f"code_change:{id(whiteboard)}"
+
+    def get_frame_options(self, context: MessageContext, whiteboard: Whiteboard):
+        # code frames of one whiteboard share a coalesce key, a full code frame
+        # supersedes the frames still queued for it while deltas queue up
+        return {"coalesce_key": self.get_coalesce_key(whiteboard), "full": "delta" not in context.payload_data}
+
+    def full_code_change_payload(self, source_user: User, whiteboard: Whiteboard, user_assignment: UserAssignment = None):
+        response_data = {
+            "source": source_user.to_json_str(),
+            "whiteboard": whiteboard.to_json_str()
+        }
+        if user_assignment is not None:
+            response_data["userAssignment"] = user_assignment.to_json_str()
+        return encode({
+            "action": Actions.CODE_CHANGE.value,
+            "data": response_data
+        })
 
-    async def get_data(self):
-        source_user = self.selected_classroom.get_user(
-            websocket=self.source_websocket)
-        source_whiteboard_type = self.payload_data["whiteboard_type"]
+    async def get_data(self, context: MessageContext):
+        source_user = context.selected_classroom.get_user_by_id(
+            context.payload_user_id)
+        source_whiteboard_type = context.payload_data["whiteboard_type"]
 
         response_payload = None
 
         if source_whiteboard_type == WhiteboardType.PUBLIC.value:
-            response_payload = json.dumps({
+            response_payload = encode({
                 "action": Actions.GET_DATA.value,
                 "data": {
-                    "whiteboard": self.selected_classroom.shared_whiteboard.to_json()
+                    "whiteboard": context.selected_classroom.shared_whiteboard.to_json_str()
                 }
             })
         elif source_whiteboard_type == WhiteboardType.PRIVATE.value:
-            target_user = self.selected_classroom.get_user_by_id(
-                self.payload_data["target_user"])
-            response_payload = json.dumps({
+            target_user = context.selected_classroom.get_user_by_id(
+                context.payload_data["target_user"])
+            response_payload = encode({
                 "action": Actions.GET_DATA.value,
                 "data": {
-                    "targetUser": target_user.to_json()
+                    "targetUser": target_user.to_json_str()
                 }
             })
         elif source_whiteboard_type == WhiteboardType.ASSIGNMENT.value:
-            target_user = self.selected_classroom.get_user_by_id(
-                self.payload_data["target_user"])
+            target_user = context.selected_classroom.get_user_by_id(
+                context.payload_data["target_user"])
             assignment = target_user.get_user_assignment(
-                assignment_name=self.payload_data["assignment_name"])
-            response_payload = json.dumps({
+                assignment_name=context.payload_data["assignment_name"])
+            response_payload = encode({
                 "action": Actions.GET_DATA.value,
                 "data": {
-                    "targetUser": target_user.to_json(),
-                    "userAssignment": assignment.to_json()
+                    "targetUser": target_user.to_json_str(),
+                    "userAssignment": assignment.to_json_str()
                 }
             })
 
-        await conn_manager.send_personal_payload(payload=response_payload, websocket=source_user.websocket)
+        await conn_manager.send_personal_payload(payload=response_payload, websocket=context.source_websocket)
 
-    async def assignment_create(self):
+    async def assignment_create(self, context: MessageContext):
+        # the id comes from the message so every worker creates the same assignment
         new_assignment = Assignment(
-            self.payload_data["assignment_name"], self.payload_data["assignment_description"], self.payload_data["assignment_code"])
-        added_assignment = self.selected_classroom.add_assignment(
+            context.payload_data["assignment_name"], context.payload_data["assignment_description"], context.payload_data["assignment_code"], assignment_id=context.message_id)
+        added_assignment = context.selected_classroom.add_assignment(
             new_assignment)
 
-        for student in self.selected_classroom.get_all_students():
+        for student in context.selected_classroom.get_all_students():
             user_assignment = added_assignment.to_user_assignment(
                 student.user_id)
             student.add_user_assignment(user_assignment
                                         )
-            response_students = json.dumps({
+            response_students = encode({
                 "action": Actions.ASSIGNMENT_CREATE.value,
-                "data": user_assignment.to_json()
+                "data": user_assignment.to_json_str()
             })
             await conn_manager.send_personal_payload(payload=response_students, websocket=student.websocket)
 
-        response_teacher = json.dumps({
+        response_teacher = encode({
             "action": Actions.ASSIGNMENT_CREATE.value,
             "data": {
-                "assignment": added_assignment.to_json(),
-                "students": [student.to_json() for student in self.selected_classroom.get_all_students()]
+                "assignment": added_assignment.to_json_str(),
+                "students": [student.to_json_str() for student in context.selected_classroom.get_all_students()]
             }
         })
 
-        await conn_manager.send_personal_payload(payload=response_teacher, websocket=self.selected_classroom.get_teacher().websocket)
+        await conn_manager.send_personal_payload(payload=response_teacher, websocket=context.selected_classroom.get_teacher().websocket)
 
-    async def lock_code(self):
-        self.selected_classroom.editable = False
-        response_payload = json.dumps({"action": Actions.LOCK_CODE.value})
-        await conn_manager.broadcast_class_students(classroom_id=self.source_classroom_id, payload=response_payload)
+    async def lock_code(self, context: MessageContext):
+        context.selected_classroom.editable = False
+        response_payload = encode({"action": Actions.LOCK_CODE.value})
+        await conn_manager.broadcast_class_students(classroom_id=context.source_classroom_id, payload=response_payload)
 
-    async def unlock_code(self):
-        self.selected_classroom.editable = True
-        response_payload = json.dumps({"action": Actions.UNLOCK_CODE.value})
-        await conn_manager.broadcast_class_students(classroom_id=self.source_classroom_id, payload=response_payload)
+    async def unlock_code(self, context: MessageContext):
+        context.selected_classroom.editable = True
+        response_payload = encode({"action": Actions.UNLOCK_CODE.value})
+        await conn_manager.broadcast_class_students(classroom_id=context.source_classroom_id, payload=response_payload)
 
-    async def classroom_deleted(self):
-        response_payload = json.dumps(
+    async def classroom_deleted(self, context: MessageContext):
+        response_payload = encode(
             {"action": Actions.CLASSROOM_DELETED.value})
-        await conn_manager.broadcast_class_students(classroom_id=self.source_classroom_id, payload=response_payload)
-        class_manager.remove_classroom(self.source_classroom_id)
+        await conn_manager.broadcast_class_students(classroom_id=context.source_classroom_id, payload=response_payload)
+        class_manager.remove_classroom(context.source_classroom_id)
 
-    async def submit_assignment(self):
-        user_assignment = self.payload_data
-        source_user = self.selected_classroom.get_user(
-            websocket=self.source_websocket)
+    async def submit_assignment(self, context: MessageContext):
+        user_assignment = context.payload_data
+        source_user = context.selected_classroom.get_user_by_id(
+            context.payload_user_id)
         assignment = source_user.get_user_assignment(
             assignment_name=user_assignment)
 
         assignment.status = AssignmentStatus.SUBMITTED
 
-        response_payload = json.dumps({
+        response_payload = encode({
             "action": Actions.SUBMIT_ASSIGNMENT.value,
             "data": {
-                "source": source_user.to_json(),
-                "userAssignment": assignment.to_json()
+                "source": source_user.to_json_str(),
+                "userAssignment": assignment.to_json_str()
             }
         })
 
-        await conn_manager.send_personal_payload(payload=response_payload, websocket=self.selected_classroom.get_teacher().websocket)
+        await conn_manager.send_personal_payload(payload=response_payload, websocket=context.selected_classroom.get_teacher().websocket)
 
-    async def grade_assignment(self):
-        user_assignment = self.payload_data
+    async def grade_assignment(self, context: MessageContext):
+        user_assignment = context.payload_data
         assignment_status = user_assignment["status"]
-        target_user = self.selected_classroom.get_user_by_id(
+        target_user = context.selected_classroom.get_user_by_id(
             user_id=user_assignment["userId"])
         updated_user_assignment = target_user.get_user_assignment(
             assignment_name=user_assignment["assignment"]["title"])
@@ -423,16 +393,30 @@ class PayloadHandler:
             assignment_status)
         updated_user_assignment.feedback = user_assignment["feedback"]
 
-        updated_user_assignment.grade_history.append(
-            {"grade": updated_user_assignment.grade, "feedback": updated_user_assignment.feedback})
+        updated_user_assignment.add_grade_history(
+            grade=updated_user_assignment.grade, feedback=updated_user_assignment.feedback)
 
-        response_payload = json.dumps({
+        response_payload = encode({
             "action": Actions.GRADE_ASSIGNMENT.value,
-            "data": updated_user_assignment.to_json(),
+            "data": updated_user_assignment.to_json_str(),
             "timestamp": datetime.datetime.now().strftime("%d/%m/%Y %H:%M:%S")
         })
 
         await conn_manager.send_personal_payload(payload=response_payload, websocket=target_user.websocket)
 
 
+    async def leave(self, context: MessageContext):
+        user = context.selected_classroom.get_user_by_id(context.payload_user_id)
+        # the user may have already reconnected through another socket
+        if user is None or user.connection_id != context.connection_id:
+            return
+
+        user.go_offline()
+        user.websocket = None
+        payload = encode(
+            {"action": Actions.LEAVE.value, "data": user.to_json_str()})
+        await conn_manager.broadcast_class_online(
+            classroom_id=context.source_classroom_id, payload=payload)
+
+
 payload_handler = PayloadHandler()
@@ -0,0 +1,155 @@
+# IMPORTS
+import asyncio
+import functools
+import json
+import uuid
+from typing import Dict
+from fastapi import WebSocket
+
+# MODELS
+from app.websockets.models.classroom import Classroom
+
+# CONSTANTS
+from app.constants import Actions
+from app.constants import UserStatus
+
+# MANAGERS
+from app.websockets import backends
+from app.websockets.managers.classroom_manager import class_manager
+from app.websockets.managers.connection_manager import conn_manager
+from app.websockets.managers.payload_handler import payload_handler
+
+WORKER_ID = uuid.uuid4().hex
+
+# read only actions are answered from the local copy of the classroom
+LOCAL_ACTIONS = [Actions.GET_DATA.value]
+
+
+# Every worker keeps a copy of each classroom it has connections for. Client
+# messages are published on the classroom channel and applied by every worker
+# in the same order, each worker only writes to the sockets connected to it.
+class PubSubManager:
+    def __init__(self):
+        self._lock: asyncio.Lock = None
+        # messages received for classrooms whose state is still loading
+        self._joining: Dict[int, list] = dict()
+
+    def get_channel(self, classroom_id: int):
+        return f"classroom:{classroom_id}"
+
+    async def connect(self, classroom_id: int, websocket: WebSocket):
+        connection_id = await conn_manager.connect(websocket=websocket)
+        await self.join_classroom(classroom_id=classroom_id)
+        return connection_id
+
+    async def join_classroom(self, classroom_id: int):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if class_manager.get_classroom(classroom_id=classroom_id) is not None:
+                return
+
+            backend = backends.get_backend()
+            channel = self.get_channel(classroom_id)
+            # subscribe before loading the state, anything published meanwhile
+            # is held back and applied on top of it
+            buffered = []
+            self._joining[classroom_id] = buffered
+            try:
+                await backend.subscribe(channel, functools.partial(
+                    self.on_message, classroom_id))
+                state = await backend.get_state(channel)
+            except Exception:
+                self._joining.pop(classroom_id, None)
+                await backend.unsubscribe(channel)
+                raise
+
+            classroom = None
+            if state is not None:
+                classroom = Classroom.from_state(json.loads(state))
+                # the state already includes the buffered messages up to its last one
+                message_ids = [message.get("message") for message in buffered]
+                if classroom.last_message_id in message_ids:
+                    del buffered[:message_ids.index(
+                        classroom.last_message_id) + 1]
+            class_manager.add_classroom(classroom_id, classroom=classroom)
+
+            # messages keep arriving while the buffered ones are applied
+            while buffered:
+                await self.apply_message(classroom_id, buffered.pop(0))
+            del self._joining[classroom_id]
+
+    async def disconnect(self, classroom_id: int, connection_id: str):
+        websocket = conn_manager.disconnect(connection_id)
+        classroom = class_manager.get_classroom(classroom_id=classroom_id)
+        if classroom is None:
+            return
+        user = classroom.get_user(websocket=websocket)
+        if user is not None:
+            await self.publish_message(classroom_id=classroom_id, payload={
+                "action": Actions.LEAVE.value, "user_id": user.user_id, "data": None}, connection_id=connection_id)
+
+    async def publish_message(self, classroom_id: int, payload: dict, connection_id: str):
+        if payload["action"] in LOCAL_ACTIONS:
+            await payload_handler.process_message(payload=payload, classroom_id=classroom_id, websocket=conn_manager.get_websocket(connection_id), connection_id=connection_id)
+            return
+
+        message = json.dumps({
+            "worker": WORKER_ID,
+            "connection": connection_id,
+            "message": uuid.uuid4().hex,
+            "payload": payload
+        })
+        await backends.get_backend().publish(self.get_channel(classroom_id), message)
+
+    async def send_to_user(self, classroom_id: int, user_id: str, payload: str):
+        # the user may be connected to any worker, the one holding the socket sends it
+        message = json.dumps({
+            "worker": WORKER_ID,
+            "user": user_id,
+            "direct": payload
+        })
+        await backends.get_backend().publish(self.get_channel(classroom_id), message)
+
+    async def on_message(self, classroom_id: int, message: str):
+        message = json.loads(message)
+        buffered = self._joining.get(classroom_id)
+        if buffered is not None:
+            buffered.append(message)
+            return
+        await self.apply_message(classroom_id, message)
+
+    async def apply_message(self, classroom_id: int, message: dict):
+        classroom = class_manager.get_classroom(classroom_id=classroom_id)
+        if classroom is None:
+            return
+
+        if "direct" in message:
+            user = classroom.get_user_by_id(message["user"])
+            if user is not None and user.status == UserStatus.ONLINE:
+                await conn_manager.send_personal_payload(payload=message["direct"], websocket=user.websocket)
+            return
+
+        is_local = message["worker"] == WORKER_ID
+        websocket = conn_manager.get_websocket(
+            message["connection"]) if is_local else None
+        await payload_handler.process_message(payload=message["payload"], classroom_id=classroom_id, websocket=websocket, connection_id=message["connection"], message_id=message["message"])
+        classroom.version += 1
+        classroom.last_message_id = message["message"]
+
+        backend = backends.get_backend()
+        channel = self.get_channel(classroom_id)
+        if class_manager.get_classroom(classroom_id=classroom_id) is None:
+            await backend.unsubscribe(channel)
+            if is_local and backend.shared:
+                await backend.delete_state(channel)
+        elif is_local and backend.shared:
+            # lets a worker that joins the classroom later start from the current
+            # state, a newer state written by another worker is kept
+            await backend.set_state(channel, classroom.to_state(), classroom.version)
+
+    async def close(self):
+        await backends.close_backend()
+
+
+pubsub_manager = PubSubManager()
@@ -5,17 +5,17 @@ from app.websockets.models.classroom import Classroom
 
 
 class UserManager:
-    def create_student(self, user_id, classroom: Classroom, websocket: WebSocket):
+    def create_student(self, user_id, classroom: Classroom, websocket: WebSocket, connection_id: str = None):
         new_student = User(user_id=user_id,
-                           role=ClassroomUserRole.STUDENT, websocket=websocket)
+                           role=ClassroomUserRole.STUDENT, websocket=websocket, connection_id=connection_id)
         for assignment in classroom.assignments:
             new_student.add_user_assignment(
                 assignment.to_user_assignment(user_id=user_id))
         return new_student
 
-    def create_teacher(self, user_id, websocket: WebSocket):
+    def create_teacher(self, user_id, websocket: WebSocket, connection_id: str = None):
         new_teacher = User(user_id=user_id,
-                           role=ClassroomUserRole.TEACHER, websocket=websocket)
+                           role=ClassroomUserRole.TEACHER, websocket=websocket, connection_id=connection_id)
         return new_teacher
 
 
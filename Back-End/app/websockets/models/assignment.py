@@ -4,6 +4,9 @@ import uuid
 
 # MODELS
 from app.websockets.models.whiteboard import Whiteboard
+from app.websockets.models.snapshot import Revision
+from app.websockets.models.snapshot import SnapshotCache
+from app.websockets.models.snapshot import encode
 
 # CONSTANTS
 from app.constants import AssignmentStatus
@@ -11,12 +14,14 @@ from app.constants import WhiteboardType
 
 
 class Assignment:
-    def __init__(self,  assignment_name: str, assignment_description: str, assignment_code: str = '\n\n\n\n\n\n\n\n\n\nprint("Hello World")'):
-        self._id = str(uuid.uuid4())
+    def __init__(self,  assignment_name: str, assignment_description: str, assignment_code: str = '\n\n\n\n\n\n\n\n\n\nprint("Hello World")', assignment_id: str = None):
+        self._id = assignment_id if assignment_id is not None else str(uuid.uuid4())
         self._title = assignment_name
         self._desc = assignment_description
         self._initial_code = "# " + assignment_description + \
             "\n\n" + assignment_code + "\n\n\n\n\n\n\n\n\n\n"
+        self.revision = Revision()
+        self._snapshot = SnapshotCache()
 
     @property
     def id(self):
@@ -29,6 +34,7 @@ class Assignment:
     @title.setter
     def title(self, title: str):
         self._title = title
+        self.revision.bump()
 
     @property
     def desc(self):
@@ -37,6 +43,7 @@ class Assignment:
     @desc.setter
     def desc(self, desc: str):
         self._desc = desc
+        self.revision.bump()
 
     @property
     def initial_code(self):
@@ -45,13 +52,27 @@ class Assignment:
     @initial_code.setter
     def initial_code(self, initial_code: str):
         self._initial_code = initial_code
+        self.revision.bump()
+
+    def cache_key(self):
+        return self.revision.value
 
     def to_json(self):
         return {'id': self.id, 'title': self.title, 'description': self.desc, 'initialCode': self.initial_code}
 
+    def to_json_str(self):
+        return self._snapshot.get('str', self.cache_key(), lambda: encode(self.to_json()))
+
     def to_user_assignment(self, user_id: str):
         return UserAssignment(user_id, self)
 
+    @classmethod
+    def from_json(cls, data: dict):
+        assignment = cls(data['title'], data['description'],
+                         assignment_id=data['id'])
+        assignment.initial_code = data['initialCode']
+        return assignment
+
 
 class UserAssignment:
     def __init__(self, user_id: str, assignment: Assignment):
@@ -63,6 +84,10 @@ class UserAssignment:
         self._feedback = None
         self._grade_history = []
         self._status: AssignmentStatus = AssignmentStatus.NOT_STARTED
+        self.revision = Revision()
+        assignment.revision.attach(self.revision)
+        self._whiteboard.revision.attach(self.revision)
+        self._snapshot = SnapshotCache()
 
     @property
     def user_id(self):
@@ -71,6 +96,7 @@ class UserAssignment:
     @user_id.setter
     def user_id(self, user_id: str):
         self._user_id = user_id
+        self.revision.bump()
 
     @property
     def assignment(self):
@@ -78,6 +104,7 @@ class UserAssignment:
 
     @assignment.setter
     def assignment(self, assignment: Assignment):
+        self.revision.replace(self._assignment, assignment)
         self._assignment = assignment
 
     @property
@@ -86,6 +113,7 @@ class UserAssignment:
 
     @whiteboard.setter
     def whiteboard(self, whiteboard: Whiteboard):
+        self.revision.replace(self._whiteboard, whiteboard)
         self._whiteboard = whiteboard
 
     @property
@@ -95,6 +123,7 @@ class UserAssignment:
     @grade.setter
     def grade(self, grade: int):
         self._grade = grade
+        self.revision.bump()
 
     @property
     def feedback(self):
@@ -103,6 +132,7 @@ class UserAssignment:
     @feedback.setter
     def feedback(self, feedback: str):
         self._feedback = feedback
+        self.revision.bump()
 
     @property
     def grade_history(self):
@@ -111,6 +141,7 @@ class UserAssignment:
     @grade_history.setter
     def grade_history(self, grade_history: list):
         self._grade_history = grade_history
+        self.revision.bump()
 
     @property
     def status(self):
@@ -119,6 +150,30 @@ class UserAssignment:
     @status.setter
     def status(self, status: AssignmentStatus):
         self._status = status
+        self.revision.bump()
+
+    def add_grade_history(self, grade: int, feedback: str):
+        self._grade_history.append({"grade": grade, "feedback": feedback})
+        self.revision.bump()
+
+    def cache_key(self):
+        return self.revision.value
 
     def to_json(self):
-        return {'userId': self.user_id, 'grade': self.grade, 'assignment': self.assignment.to_json(), 'whiteboard': self.whiteboard.to_json(), 'feedback': self.feedback, 'gradeHistory': self.grade_history, 'status': self.status.value}
+        return self._fields(lambda model: model.to_json())
+
+    def to_json_str(self):
+        return self._snapshot.get('str', self.cache_key(), lambda: encode(self._fields(lambda model: model.to_json_str())))
+
+    def _fields(self, serialize):
+        return {'userId': self.user_id, 'grade': self.grade, 'assignment': serialize(self.assignment), 'whiteboard': serialize(self.whiteboard), 'feedback': self.feedback, 'gradeHistory': self.grade_history, 'status': self.status.value}
+
+    @classmethod
+    def from_json(cls, data: dict, assignment: Assignment):
+        user_assignment = cls(data['userId'], assignment)
+        user_assignment.whiteboard = Whiteboard.from_json(data['whiteboard'])
+        user_assignment.grade = data['grade']
+        user_assignment.feedback = data['feedback']
+        user_assignment.grade_history = data['gradeHistory']
+        user_assignment.status = AssignmentStatus(data['status'])
+        return user_assignment
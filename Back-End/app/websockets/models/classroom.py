@@ -1,4 +1,5 @@
 # IMPORTS
+from typing import Dict
 from fastapi import WebSocket
 
 # CONSTANTS
@@ -10,16 +11,34 @@ from app.constants import WhiteboardType
 from app.websockets.models.user import User
 from app.websockets.models.assignment import Assignment
 from app.websockets.models.whiteboard import Whiteboard
+from app.websockets.models.snapshot import Revision
+from app.websockets.models.snapshot import SnapshotCache
+from app.websockets.models.snapshot import encode
 
 
 class Classroom:
     def __init__(self, classroom_id: str):
         self._classroom_id = classroom_id
         self._users: list[User] = []
+        # indexes over _users, kept up to date by the users themselves
+        self._users_by_id: Dict[str, User] = dict()
+        self._users_by_websocket: Dict[WebSocket, User] = dict()
+        self._students: Dict[str, User] = dict()
+        self._online_students: Dict[str, User] = dict()
+        # position of each user in _users, the student indexes follow it
+        self._join_order: Dict[str, int] = dict()
+        self._teacher: User = None
         self._shared_whiteboard: Whiteboard = Whiteboard(
             'print("Hello World")', WhiteboardType.PUBLIC)
         self._assignments: list[Assignment] = []
         self._editable = False
+        self.revision = Revision()
+        self._shared_whiteboard.revision.attach(self.revision)
+        self._snapshot = SnapshotCache()
+        # published messages applied to the classroom and the id of the last
+        # one, every worker applies the same messages in the same order
+        self.version = 0
+        self.last_message_id: str = None
 
     @property
     def classroom_id(self):
@@ -28,6 +47,7 @@ class Classroom:
     @classroom_id.setter
     def classroom_id(self, classroom_id: str):
         self._classroom_id = classroom_id
+        self.revision.bump()
 
     @property
     def users(self):
@@ -35,7 +55,18 @@ class Classroom:
 
     @users.setter
     def users(self, users: list[User]):
-        self._users = users
+        for user in self._users:
+            user.revision.detach(self.revision)
+        self._users = []
+        self._users_by_id.clear()
+        self._users_by_websocket.clear()
+        self._students.clear()
+        self._online_students.clear()
+        self._join_order.clear()
+        self._teacher = None
+        for user in users:
+            self.add_user(user)
+        self.revision.bump()
 
     @property
     def shared_whiteboard(self):
@@ -43,6 +74,7 @@ class Classroom:
 
     @shared_whiteboard.setter
     def shared_whiteboard(self, shared_whiteboard: Whiteboard):
+        self.revision.replace(self._shared_whiteboard, shared_whiteboard)
         self._shared_whiteboard = shared_whiteboard
 
     @property
@@ -51,7 +83,12 @@ class Classroom:
 
     @assignments.setter
     def assignments(self, assignments: list[Assignment]):
+        for assignment in self._assignments:
+            assignment.revision.detach(self.revision)
+        for assignment in assignments:
+            assignment.revision.attach(self.revision)
         self._assignments = assignments
+        self.revision.bump()
 
     @property
     def editable(self):
@@ -60,41 +97,85 @@ class Classroom:
     @editable.setter
     def editable(self, editable: bool):
         self._editable = editable
+        self.revision.bump()
 
     def get_user(self, websocket: WebSocket):
-        for user in self._users:
-            if user.websocket == websocket:
-                return user
-        return None
+        return self._users_by_websocket.get(websocket)
 
     def get_user_by_id(self, user_id: str):
-        for user in self._users:
-            if user.user_id == user_id:
-                return user
-        return None
+        return self._users_by_id.get(user_id)
 
     def add_user(self, user: User):
         self._users.append(user)
+        user.classroom = self
+        self._users_by_id[user.user_id] = user
+        self._join_order[user.user_id] = len(self._users) - 1
+        if user.websocket is not None:
+            self._users_by_websocket[user.websocket] = user
+        self._index_role(user)
+        self.revision.replace(None, user)
+
+    def update_user_index(self, user: User, attribute: str, old_value):
+        if attribute == 'user_id':
+            if self._users_by_id.get(old_value) is user:
+                del self._users_by_id[old_value]
+            self._users_by_id[user.user_id] = user
+            self._join_order[user.user_id] = self._join_order.pop(old_value)
+            self._students.pop(old_value, None)
+            self._online_students.pop(old_value, None)
+            self._index_role(user)
+        elif attribute == 'websocket':
+            if self._users_by_websocket.get(old_value) is user:
+                del self._users_by_websocket[old_value]
+            if user.websocket is not None:
+                self._users_by_websocket[user.websocket] = user
+        else:
+            self._index_role(user)
+
+    def _index_role(self, user: User):
+        if user.role == ClassroomUserRole.STUDENT:
+            self._add_to_index(self._students, user)
+        else:
+            self._students.pop(user.user_id, None)
+
+        if user.role == ClassroomUserRole.STUDENT and user.status == UserStatus.ONLINE:
+            self._add_to_index(self._online_students, user)
+        else:
+            self._online_students.pop(user.user_id, None)
+
+        if user.role == ClassroomUserRole.TEACHER:
+            if self._teacher is None:
+                self._teacher = user
+        elif self._teacher is user:
+            self._teacher = None
+
+    def _add_to_index(self, index: Dict[str, User], user: User):
+        # a student going back online takes its old place in the list
+        # instead of moving to the end
+        if user.user_id in index:
+            index[user.user_id] = user
+            return
+        last_user_id = next(reversed(index), None)
+        index[user.user_id] = user
+        if last_user_id is not None and self._join_order[last_user_id] > self._join_order[user.user_id]:
+            users = sorted(index.values(), key=lambda indexed: self._join_order[indexed.user_id])
+            index.clear()
+            index.update((indexed.user_id, indexed) for indexed in users)
 
     def get_all_students(self):
-        students = []
-        for user in self._users:
-            if user.role == ClassroomUserRole.STUDENT:
-                students.append(user)
-        return students
+        return list(self._students.values())
 
     def get_teacher(self):
-        for user in self._users:
-            if user.role == ClassroomUserRole.TEACHER:
-                return user
-        return None
+        if self._teacher is None:
+            # only when the teacher changed role, look for another one
+            for user in self._users:
+                if user.role == ClassroomUserRole.TEACHER:
+                    self._teacher = user
+                    break
+        return self._teacher
 
     def get_online_students(self):
-        students = []
-        for user in self._users:
-            if user.role == ClassroomUserRole.STUDENT and user.status == UserStatus.ONLINE:
-                students.append(user)
-        return students
+        return list(self._online_students.values())
 
     def get_assignment(self, assignment_name: str):
         for assignment in self._assignments:
@@ -104,28 +185,67 @@ class Classroom:
 
     def add_assignment(self, assignment: Assignment):
         self._assignments.append(assignment)
+        self.revision.replace(None, assignment)
         return assignment
 
     def connect_user(self, websocket: WebSocket):
-        for user in self._users:
-            if user.websocket == websocket:
-                user.go_online()
+        user = self.get_user(websocket)
+        if user is not None:
+            user.go_online()
 
     def disconnect_user(self, websocket: WebSocket):
-        for user in self._users:
-            if user.websocket == websocket:
-                user.go_offline()
+        user = self.get_user(websocket)
+        if user is not None:
+            user.go_offline()
 
     def disconnect_user_by_id(self, user_id: str):
-        for user in self._users:
-            if user.user_id == user_id:
-                user.go_offline()
+        user = self.get_user_by_id(user_id)
+        if user is not None:
+            user.go_offline()
+
+    def cache_key(self):
+        return self.revision.value
 
     def to_json(self):
+        return self._fields(lambda model: model.to_json())
+
+    def to_json_str(self):
+        return self._snapshot.get('str', self.cache_key(), lambda: encode(self._fields(lambda model: model.to_json_str())))
+
+    def _fields(self, serialize):
         return {
             'classroomId': self.classroom_id,
-            'users': [user.to_json() for user in self.users],
-            'sharedWhiteboard': self.shared_whiteboard.to_json(),
-            'assignments': [assignment.to_json() for assignment in self.assignments],
+            'users': [serialize(user) for user in self.users],
+            'sharedWhiteboard': serialize(self.shared_whiteboard),
+            'assignments': [serialize(assignment) for assignment in self.assignments],
             'editable': self.editable
         }
+
+    def to_state(self):
+        # to_json plus what other workers need to rebuild the classroom
+        return encode({
+            'classroom': self.to_json_str(),
+            'connections': [user.connection_id for user in self.users],
+            'version': self.version,
+            'lastMessageId': self.last_message_id
+        })
+
+    @classmethod
+    def from_state(cls, state: dict):
+        connections = state['connections']
+        version = state['version']
+        last_message_id = state['lastMessageId']
+        state = state['classroom']
+        classroom = cls(classroom_id=state['classroomId'])
+        classroom.shared_whiteboard = Whiteboard.from_json(
+            state['sharedWhiteboard'])
+        classroom.assignments = [Assignment.from_json(
+            assignment) for assignment in state['assignments']]
+        assignments = {
+            assignment.id: assignment for assignment in classroom.assignments}
+        classroom.users = [User.from_json(user, assignments, connection_id=connection_id)
+                           for user, connection_id in zip(state['users'], connections)]
+        classroom.editable = state['editable']
+        classroom.version = version
+        classroom.last_message_id = last_message_id
+        return classroom
@@ -0,0 +1,52 @@
+# IMPORTS
+from fastapi import WebSocket
+
+# MODELS
+from app.websockets.models.classroom import Classroom
+
+
+class MessageContext:
+    # Everything a handler needs to know about the message it is handling,
+    # built per message so concurrent messages never share state
+    def __init__(self, payload: dict, classroom: Classroom, classroom_id: int, websocket: WebSocket, connection_id: str = None, message_id: str = None):
+        self._payload_action: int = payload['action']
+        self._payload_user_id: str = payload['user_id']
+        self._payload_data: dict = payload['data']
+        self._source_classroom_id = classroom_id
+        self._selected_classroom = classroom
+        # websocket is None when the message came from another worker
+        self._source_websocket = websocket
+        self._connection_id = connection_id
+        self._message_id = message_id
+
+    @property
+    def payload_action(self):
+        return self._payload_action
+
+    @property
+    def payload_user_id(self):
+        return self._payload_user_id
+
+    @property
+    def payload_data(self):
+        return self._payload_data
+
+    @property
+    def source_classroom_id(self):
+        return self._source_classroom_id
+
+    @property
+    def selected_classroom(self):
+        return self._selected_classroom
+
+    @property
+    def source_websocket(self):
+        return self._source_websocket
+
+    @property
+    def connection_id(self):
+        return self._connection_id
+
+    @property
+    def message_id(self):
+        return self._message_id
@@ -0,0 +1,60 @@
+# IMPORTS
+import json
+from typing import Callable
+
+
+class Encoded(str):
+    # JSON text that encode() embeds as it is instead of encoding it again
+    pass
+
+
+def encode(value):
+    if isinstance(value, Encoded):
+        return value
+    if isinstance(value, dict):
+        return Encoded("{" + ", ".join(json.dumps(key) + ": " + encode(item) for key, item in value.items()) + "}")
+    if isinstance(value, (list, tuple)):
+        return Encoded("[" + ", ".join(encode(item) for item in value) + "]")
+    return Encoded(json.dumps(value))
+
+
+class Revision:
+    # Counts the changes of a model and of the models it contains. A change
+    # bumps the counters of the models holding this one as well, so a model
+    # knows it changed without walking what it contains.
+    def __init__(self):
+        self.value = 0
+        self._owners: list['Revision'] = []
+
+    def bump(self):
+        self.value += 1
+        for owner in self._owners:
+            owner.bump()
+
+    def attach(self, owner: 'Revision'):
+        self._owners.append(owner)
+
+    def detach(self, owner: 'Revision'):
+        self._owners.remove(owner)
+
+    def replace(self, old, new):
+        # old and new are the contained models, either may be None
+        if old is not None:
+            old.revision.detach(self)
+        if new is not None:
+            new.revision.attach(self)
+        self.bump()
+
+
+class SnapshotCache:
+    # Keeps the last result of each builder together with the key of the state
+    # it was built from, the model passes a key that changes with its state
+    def __init__(self):
+        self._entries = dict()
+
+    def get(self, name: str, key, build: Callable):
+        entry = self._entries.get(name)
+        if entry is None or entry[0] != key:
+            entry = (key, build())
+            self._entries[name] = entry
+        return entry[1]
@@ -0,0 +1,122 @@
+# Text operations in the ot.js format, an operation is a list of components
+# that walks over the whole document:
+#   positive int - keep that many characters
+#   negative int - delete that many characters
+#   str          - insert the text
+# Lengths are counted in UTF-16 code units like ot.js does in the browser, so
+# astral characters (e.g. emoji) count 2 on both ends.
+
+
+class InvalidOperationError(ValueError):
+    pass
+
+
+def text_length(text: str) -> int:
+    return len(text.encode("utf-16-le", "surrogatepass")) // 2
+
+
+def _is_retain(component):
+    return isinstance(component, int) and component > 0
+
+
+def _is_delete(component):
+    return isinstance(component, int) and component < 0
+
+
+def _is_insert(component):
+    return isinstance(component, str)
+
+
+def _append(operation: list, component):
+    if operation and (
+        (_is_retain(component) and _is_retain(operation[-1]))
+        or (_is_delete(component) and _is_delete(operation[-1]))
+        or (_is_insert(component) and _is_insert(operation[-1]))
+    ):
+        operation[-1] += component
+    else:
+        operation.append(component)
+
+
+def validate_operation(operation, base_length: int = None):
+    if not isinstance(operation, list):
+        raise InvalidOperationError("Operation must be a list")
+    length = 0
+    for component in operation:
+        if isinstance(component, bool) or not isinstance(component, (int, str)):
+            raise InvalidOperationError("Invalid operation component")
+        if component == 0 or component == "":
+            raise InvalidOperationError("Empty operation component")
+        if isinstance(component, int):
+            length += abs(component)
+    if base_length is not None and length != base_length:
+        raise InvalidOperationError(
+            "Operation does not match the length of the document")
+
+
+def apply_operation(text: str, operation: list):
+    # works on the UTF-16 encoding, two bytes per code unit
+    data = text.encode("utf-16-le", "surrogatepass")
+    validate_operation(operation, len(data) // 2)
+    parts = []
+    index = 0
+    for component in operation:
+        if _is_insert(component):
+            parts.append(component.encode("utf-16-le", "surrogatepass"))
+        elif _is_retain(component):
+            parts.append(data[index * 2:(index + component) * 2])
+            index += component
+        else:
+            index -= component
+    try:
+        return b"".join(parts).decode("utf-16-le")
+    except UnicodeDecodeError as err:
+        raise InvalidOperationError(
+            "Operation splits a surrogate pair") from err
+
+
+def transform_operation(operation: list, concurrent: list):
+    # returns both operations rewritten to apply after the other one,
+    # inserts at the same position put `operation` first
+    operation_prime = []
+    concurrent_prime = []
+    components = iter(operation)
+    concurrent_components = iter(concurrent)
+    first = next(components, None)
+    second = next(concurrent_components, None)
+
+    while first is not None or second is not None:
+        if _is_insert(first):
+            _append(operation_prime, first)
+            _append(concurrent_prime, text_length(first))
+            first = next(components, None)
+            continue
+        if _is_insert(second):
+            _append(operation_prime, text_length(second))
+            _append(concurrent_prime, second)
+            second = next(concurrent_components, None)
+            continue
+        if first is None or second is None:
+            raise InvalidOperationError(
+                "Operations were made on documents of different length")
+
+        length = min(abs(first), abs(second))
+        if _is_retain(first) and _is_retain(second):
+            _append(operation_prime, length)
+            _append(concurrent_prime, length)
+        elif _is_delete(first) and _is_retain(second):
+            _append(operation_prime, -length)
+        elif _is_retain(first) and _is_delete(second):
+            _append(concurrent_prime, -length)
+        # both deleting the same text, nothing is left to do for either
+
+        if abs(first) == length:
+            first = next(components, None)
+        else:
+            first = first - length if first > 0 else first + length
+        if abs(second) == length:
+            second = next(concurrent_components, None)
+        else:
+            second = second - length if second > 0 else second + length
+
+    return operation_prime, concurrent_prime
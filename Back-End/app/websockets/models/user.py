@@ -2,8 +2,12 @@
 from fastapi import WebSocket
 
 # MODELS
+from app.websockets.models.assignment import Assignment
 from app.websockets.models.assignment import UserAssignment
 from app.websockets.models.whiteboard import Whiteboard
+from app.websockets.models.snapshot import Revision
+from app.websockets.models.snapshot import SnapshotCache
+from app.websockets.models.snapshot import encode
 
 # CONSTANTS
 from app.constants import WhiteboardType
@@ -12,14 +16,21 @@ from app.constants import ClassroomUserRole
 
 
 class User:
-    def __init__(self, user_id: str, websocket: WebSocket, role: ClassroomUserRole):
+    def __init__(self, user_id: str, websocket: WebSocket, role: ClassroomUserRole, connection_id: str = None):
         self._user_id = user_id
+        # websocket is None when the user is connected to another worker
         self._websocket = websocket
+        self._connection_id = connection_id
         self._role: ClassroomUserRole = role
         self._whiteboard: Whiteboard = Whiteboard(
             'print("Hello World")\n\n\n\n\n\n\n\n\n\n', WhiteboardType.PRIVATE)
         self._user_assignments: list[UserAssignment] = []
         self._status: UserStatus = UserStatus.ONLINE
+        # set by the classroom the user was added to, keeps its indexes up to date
+        self._classroom = None
+        self.revision = Revision()
+        self._whiteboard.revision.attach(self.revision)
+        self._snapshot = SnapshotCache()
 
     @property
     def user_id(self):
@@ -27,7 +38,10 @@ class User:
 
     @user_id.setter
     def user_id(self, user_id: str):
+        old_user_id = self._user_id
         self._user_id = user_id
+        self._update_index('user_id', old_user_id)
+        self.revision.bump()
 
     @property
     def websocket(self):
@@ -35,7 +49,17 @@ class User:
 
     @websocket.setter
     def websocket(self, websocket: WebSocket):
+        old_websocket = self._websocket
         self._websocket = websocket
+        self._update_index('websocket', old_websocket)
+
+    @property
+    def connection_id(self):
+        return self._connection_id
+
+    @connection_id.setter
+    def connection_id(self, connection_id: str):
+        self._connection_id = connection_id
 
     @property
     def role(self):
@@ -43,7 +67,10 @@ class User:
 
     @role.setter
     def role(self, role: ClassroomUserRole):
+        old_role = self._role
         self._role = role
+        self._update_index('role', old_role)
+        self.revision.bump()
 
     @property
     def whiteboard(self):
@@ -51,6 +78,7 @@ class User:
 
     @whiteboard.setter
     def whiteboard(self, whiteboard: Whiteboard):
+        self.revision.replace(self._whiteboard, whiteboard)
         self._whiteboard = whiteboard
 
     @property
@@ -59,7 +87,12 @@ class User:
 
     @user_assignments.setter
     def user_assignments(self, user_assignments: list[UserAssignment]):
+        for user_assignment in self._user_assignments:
+            user_assignment.revision.detach(self.revision)
+        for user_assignment in user_assignments:
+            user_assignment.revision.attach(self.revision)
         self._user_assignments = user_assignments
+        self.revision.bump()
 
     @property
     def status(self):
@@ -67,7 +100,22 @@ class User:
 
     @status.setter
     def status(self, status: UserStatus):
+        old_status = self._status
         self._status = status
+        self._update_index('status', old_status)
+        self.revision.bump()
+
+    @property
+    def classroom(self):
+        return self._classroom
+
+    @classroom.setter
+    def classroom(self, classroom):
+        self._classroom = classroom
+
+    def _update_index(self, attribute: str, old_value):
+        if self._classroom is not None:
+            self._classroom.update_user_index(self, attribute, old_value)
 
     def get_user_assignment(self, assignment_name: str):
         for user_assignment in self._user_assignments:
@@ -77,22 +125,42 @@ class User:
 
     def add_user_assignment(self, user_assignment: UserAssignment):
         self._user_assignments.append(user_assignment)
+        self.revision.replace(None, user_assignment)
         return user_assignment
 
     def add_whiteboard(self, whiteboard: Whiteboard):
         self._whiteboards.append(whiteboard)
 
     def go_online(self):
-        self._status = UserStatus.ONLINE
+        self.status = UserStatus.ONLINE
 
     def go_offline(self):
-        self._status = UserStatus.OFFLINE
+        self.status = UserStatus.OFFLINE
+
+    def cache_key(self):
+        return self.revision.value
 
     def to_json(self):
+        return self._fields(lambda model: model.to_json())
+
+    def to_json_str(self):
+        return self._snapshot.get('str', self.cache_key(), lambda: encode(self._fields(lambda model: model.to_json_str())))
+
+    def _fields(self, serialize):
         return {
             'userId': self.user_id,
             'role': self.role.value,
             'online': self.status.value,
-            'whiteboard': self.whiteboard.to_json(),
-            'userAssignments': [user_assignment.to_json() for user_assignment in self.user_assignments]
+            'whiteboard': serialize(self.whiteboard),
+            'userAssignments': [serialize(user_assignment) for user_assignment in self.user_assignments]
         }
+
+    @classmethod
+    def from_json(cls, data: dict, assignments: dict[str, Assignment], connection_id: str = None):
+        user = cls(data['userId'], None, ClassroomUserRole(
+            data['role']), connection_id=connection_id)
+        user.status = UserStatus(data['online'])
+        user.whiteboard = Whiteboard.from_json(data['whiteboard'])
+        user.user_assignments = [UserAssignment.from_json(user_assignment, assignments[user_assignment['assignment']['id']])
+                                 for user_assignment in data['userAssignments']]
+        return user
@@ -1,11 +1,34 @@
+# IMPORTS
+from collections import deque
+
 # CONSTANTS
 from app.constants import WhiteboardType
 
+# MODELS
+from app.websockets.models.text_operation import apply_operation
+from app.websockets.models.text_operation import text_length
+from app.websockets.models.text_operation import transform_operation
+from app.websockets.models.text_operation import validate_operation
+from app.websockets.models.snapshot import Revision
+from app.websockets.models.snapshot import SnapshotCache
+from app.websockets.models.snapshot import encode
+
+# how far behind a client can be and still send deltas instead of resyncing
+HISTORY_SIZE = 100
+
+
+class WhiteboardVersionError(ValueError):
+    pass
+
 
 class Whiteboard:
-    def __init__(self, code: str, whiteboard_type: WhiteboardType):
+    def __init__(self, code: str, whiteboard_type: WhiteboardType, version: int = 0):
         self._code = code
         self._type: WhiteboardType = whiteboard_type
+        self._version = version
+        self._history = deque(maxlen=HISTORY_SIZE)
+        self.revision = Revision()
+        self._snapshot = SnapshotCache()
 
     @property
     def code(self):
@@ -13,7 +36,14 @@ class Whiteboard:
 
     @code.setter
     def code(self, code: str):
-        self._code = code
+        # a full replacement is kept as an operation as well, so deltas based
+        # on older versions can still be transformed over it
+        operation = []
+        if code:
+            operation.append(code)
+        if self._code:
+            operation.append(-text_length(self._code))
+        self._push(code, operation)
 
     @property
     def type(self):
@@ -22,6 +52,42 @@ class Whiteboard:
     @type.setter
     def type(self, whiteboard_type: WhiteboardType):
         self._type = whiteboard_type
+        self.revision.bump()
+
+    @property
+    def version(self):
+        return self._version
+
+    def apply_delta(self, version: int, operation: list):
+        validate_operation(operation)
+        behind = self._version - version
+        if behind < 0 or behind > len(self._history):
+            raise WhiteboardVersionError(
+                f"Cannot apply delta based on version {version}")
+
+        for concurrent in list(self._history)[len(self._history) - behind:]:
+            operation, _ = transform_operation(operation, concurrent)
+        self._push(apply_operation(self._code, operation), operation)
+        return operation
+
+    def _push(self, code: str, operation: list):
+        self._code = code
+        self._version += 1
+        self._history.append(operation)
+        self.revision.bump()
+
+    def cache_key(self):
+        return self.revision.value
 
     def to_json(self):
-        return {'code': self.code, 'whiteboardType': self.type.value}
+        return {'code': self.code, 'whiteboardType': self.type.value, 'version': self.version}
+
+    def to_json_str(self):
+        return self._snapshot.get('str', self.cache_key(), lambda: encode(self.to_json()))
+
+    def delta_json(self):
+        return {'whiteboardType': self.type.value, 'version': self.version}
+
+    @classmethod
+    def from_json(cls, data: dict):
+        return cls(data['code'], WhiteboardType(data['whiteboardType']), version=data.get('version', 0))
@@ -1,5 +1,11 @@
 from wrapt_timeout_decorator import *
 import re
+import sys
+import traceback
+
+# the back-end uploads every run to its own file and passes its name,
+# fall back to script.py for older back-ends
+SCRIPT_PATH = sys.argv[1] if len(sys.argv) > 1 else "script.py"
 
 # def paste_imports():
 #         with open('script.py', 'r+') as f:
@@ -9,13 +15,26 @@ import re
 
 @timeout(5)
 def exec_script():
-    exec(open("script.py", encoding="utf-8").read())
+    with open(SCRIPT_PATH, encoding="utf-8") as f:
+        exec(compile(f.read(), SCRIPT_PATH, "exec"))
+
+
+def print_script_traceback():
+    # only show the student's frames, not this wrapper or the timeout decorator
+    etype, value, tb = sys.exc_info()
+    frames = [
+        frame for frame in traceback.extract_tb(tb) if frame.filename == SCRIPT_PATH
+    ]
+    if frames:
+        sys.stderr.write("Traceback (most recent call last):\n")
+        sys.stderr.write("".join(traceback.format_list(frames)))
+    sys.stderr.write("".join(traceback.format_exception_only(etype, value)))
 
 
 def search_for_illegal():
     illegal_keywords = ["import" , "eval"]
     
-    with open("script.py", encoding="utf-8") as f:
+    with open(SCRIPT_PATH, encoding="utf-8") as f:
         for line in f:
             for regex in illegal_keywords:
                 search = re.search(regex, line)
@@ -28,6 +47,11 @@ if __name__ == "__main__":
     err = search_for_illegal()
 
     if err == None:
-        exec_script()
+        # flush every line so the back-end can stream output while the script runs
+        sys.stdout.reconfigure(line_buffering=True)
+        try:
+            exec_script()
+        except BaseException:
+            print_script_traceback()
     else:
         print("Illegal keyword detected: " + err)
@@ -0,0 +1,36 @@
+# Rebuilds the similar_courses and similar_lessons tables behind the cohort
+# recommendations from the enrollment and answer history, run it periodically
+# (e.g. nightly from cron):
+#   python rebuild_recommendations.py [--top-n 20]
+import argparse
+from app import settings
+from app.db.session import SessionLocal
+from app.recommender.collaborative import rebuild_recommendations
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rebuild the item-item similarities of courses and lessons."
+    )
+    parser.add_argument(
+        "--top-n",
+        type=int,
+        default=settings.RECOMMENDER_SIMILAR_ITEMS,
+        help="similar items kept per course and lesson",
+    )
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        courses_count, lessons_count = rebuild_recommendations(db, args.top_n)
+        db.commit()
+        print(
+            f"Rebuilt {courses_count} similar courses and "
+            f"{lessons_count} similar lessons"
+        )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
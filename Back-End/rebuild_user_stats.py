@@ -0,0 +1,28 @@
+# Rebuilds the dashboard stats (the user_stats table) from the users'
+# history, e.g. after upgrading or if the counters ever drift:
+#   python rebuild_user_stats.py [user_id ...]
+import argparse
+from app import crud
+from app.db.session import SessionLocal
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rebuild the dashboard stats of users from their history."
+    )
+    parser.add_argument(
+        "user_ids", nargs="*", type=int, help="users to rebuild, all users if none"
+    )
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        rebuilt = crud.user_stats.rebuild_user_stats(db, args.user_ids or None)
+        db.commit()
+        print(f"Rebuilt stats of {len(rebuilt)} users")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+import pytest
+from app.answer_rules import CompiledLessonCache, compile_lesson
+
+
+def make_answer(answer_id, final_answer, answer_check_rule="equal"):
+    return SimpleNamespace(
+        id=answer_id,
+        lesson_id=1,
+        final_answer=final_answer,
+        answer_check_rule=answer_check_rule,
+    )
+
+
+@pytest.mark.parametrize(
+    "rule, final_answer, answer, expected",
+    [
+        ("equal", "42\n", "42\n", True),
+        ("equal", "42", "41", False),
+        ("contain", "world", "hello world", True),
+        ("isInteger", None, "0", True),
+        ("isInteger", None, "4.2", False),
+        ("isFloat", None, "4.2", True),
+        ("isFalse", None, "", True),
+        ("regex", r"^\d+$", "123", True),
+        ("regex", "(", "(", False),
+        ("unknown", "42", "42", False),
+    ],
+)
+def test_compiled_lesson_should_apply_answer_check_rule(
+    rule, final_answer, answer, expected
+):
+    lesson = compile_lesson([make_answer(1, final_answer, rule)])
+
+    assert (lesson.match(answer) is not None) is expected
+
+
+def test_compiled_lesson_should_match_any_answer_with_its_own_rule():
+    lesson = compile_lesson([make_answer(1, "a"), make_answer(2, "^b+$", "regex")])
+
+    assert lesson.match("bbb").id == 2
+    assert lesson.match(["a", "bb"]) is not None
+    assert lesson.match(["a", "c"]) is None
+
+
+def test_compiled_lesson_should_reject_regex_that_times_out():
+    lesson = compile_lesson([make_answer(1, r"(a|aa)+$", "regex")])
+
+    assert lesson.match("a" * 60 + "b") is None
+
+
+def test_compiled_lesson_cache_should_invalidate_lessons():
+    cache = CompiledLessonCache(max_size=2, ttl=60)
+    lesson = compile_lesson([make_answer(1, "a")])
+    cache.set(1, lesson)
+    cache.set(2, lesson)
+    cache.set(3, lesson)
+    cache.invalidate(3)
+
+    assert cache.get(1) is None
+    assert cache.get(2) is lesson
+    assert cache.get(3) is None
@@ -0,0 +1,70 @@
+from fastapi import WebSocket
+from app.constants import ClassroomUserRole
+from app.websockets.models.classroom import Classroom
+from app.websockets.models.user import User
+
+
+def create_classroom(*user_ids):
+    classroom = Classroom(1)
+    classroom.add_user(User(0, None, ClassroomUserRole.TEACHER))
+    for user_id in user_ids:
+        classroom.add_user(User(user_id, None, ClassroomUserRole.STUDENT))
+    return classroom
+
+
+def user_ids(users):
+    return [user.user_id for user in users]
+
+
+def test_student_back_online_should_keep_its_place():
+    classroom = create_classroom(1, 2, 3)
+
+    classroom.disconnect_user_by_id(1)
+    assert user_ids(classroom.get_online_students()) == [2, 3]
+
+    classroom.get_user_by_id(1).go_online()
+    assert user_ids(classroom.get_online_students()) == [1, 2, 3]
+
+
+def test_online_students_should_follow_the_join_order():
+    classroom = create_classroom(3, 1, 2)
+
+    for user_id in (2, 3, 1):
+        classroom.disconnect_user_by_id(user_id)
+    for user_id in (1, 2, 3):
+        classroom.get_user_by_id(user_id).go_online()
+
+    assert user_ids(classroom.get_online_students()) == [3, 1, 2]
+
+
+def test_role_change_should_keep_the_student_order():
+    classroom = create_classroom(1, 2)
+    student = classroom.get_user_by_id(1)
+
+    student.role = ClassroomUserRole.TEACHER
+    assert user_ids(classroom.get_all_students()) == [2]
+
+    student.role = ClassroomUserRole.STUDENT
+    assert user_ids(classroom.get_all_students()) == [1, 2]
+    assert classroom.get_teacher().user_id == 0
+
+
+def test_renamed_student_should_keep_its_place():
+    classroom = create_classroom(1, 2)
+
+    classroom.get_user_by_id(1).user_id = 5
+
+    assert classroom.get_user_by_id(1) is None
+    assert user_ids(classroom.get_online_students()) == [5, 2]
+
+
+def test_websocket_index_should_follow_reconnects():
+    classroom = create_classroom(1)
+    student = classroom.get_user_by_id(1)
+    first, second = object.__new__(WebSocket), object.__new__(WebSocket)
+
+    student.websocket = first
+    student.websocket = second
+
+    assert classroom.get_user(first) is None
+    assert classroom.get_user(second) is student
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import pytest
+from app.constants import Actions
+from app.websockets import backends
+from app.websockets.backends.memory import MemoryBackend
+from app.websockets.managers.classroom_manager import class_manager
+from app.websockets.managers.pubsub_manager import WORKER_ID, PubSubManager
+from app.websockets.models.classroom import Classroom
+
+CLASSROOM_ID = 1
+CHANNEL = f"classroom:{CLASSROOM_ID}"
+
+
+class SharedMemoryBackend(MemoryBackend):
+    # stands in for redis, publishes the given messages while the state loads
+    shared = True
+
+    def __init__(self, published_while_loading=()):
+        super().__init__()
+        self.published_while_loading = list(published_while_loading)
+
+    async def get_state(self, key: str):
+        for message in self.published_while_loading:
+            await self.publish(key, message)
+        return await super().get_state(key)
+
+
+def unlock_message(message_id: str, worker: str = "other-worker"):
+    return json.dumps(
+        {
+            "worker": worker,
+            "connection": "connection",
+            "message": message_id,
+            "payload": {
+                "action": Actions.UNLOCK_CODE.value,
+                "user_id": None,
+                "data": None,
+            },
+        }
+    )
+
+
+def stored_state(classroom: Classroom, version: int, last_message_id: str):
+    classroom.version = version
+    classroom.last_message_id = last_message_id
+    return classroom.to_state()
+
+
+@pytest.fixture(autouse=True)
+def classroom_backend():
+    yield
+    class_manager.existing_classes.pop(CLASSROOM_ID, None)
+    backends.set_backend(None)
+
+
+def test_memory_backend_should_keep_the_newest_state():
+    backend = MemoryBackend()
+
+    async def write():
+        assert await backend.set_state(CHANNEL, "second", 2)
+        assert not await backend.set_state(CHANNEL, "first", 1)
+        return await backend.get_state(CHANNEL)
+
+    assert asyncio.run(write()) == "second"
+
+
+def test_join_should_apply_messages_published_while_the_state_loads():
+    backend = SharedMemoryBackend([unlock_message("unlock")])
+    asyncio.run(
+        backend.set_state(
+            CHANNEL, stored_state(Classroom(CLASSROOM_ID), 3, "earlier"), 3
+        )
+    )
+    backends.set_backend(backend)
+
+    asyncio.run(PubSubManager().join_classroom(CLASSROOM_ID))
+
+    classroom = class_manager.get_classroom(CLASSROOM_ID)
+    assert classroom.editable
+    assert classroom.version == 4
+    assert classroom.last_message_id == "unlock"
+
+
+def test_join_should_skip_buffered_messages_the_state_includes():
+    backend = SharedMemoryBackend([unlock_message("first"), unlock_message("second")])
+    included = Classroom(CLASSROOM_ID)
+    included.editable = True
+    asyncio.run(backend.set_state(CHANNEL, stored_state(included, 5, "first"), 5))
+    backends.set_backend(backend)
+
+    asyncio.run(PubSubManager().join_classroom(CLASSROOM_ID))
+
+    # only "second" is applied on top of the state
+    classroom = class_manager.get_classroom(CLASSROOM_ID)
+    assert classroom.version == 6
+    assert classroom.last_message_id == "second"
+
+
+def test_local_message_should_write_a_versioned_state():
+    backend = SharedMemoryBackend()
+    backends.set_backend(backend)
+    manager = PubSubManager()
+
+    async def run():
+        await manager.join_classroom(CLASSROOM_ID)
+        await backend.publish(CHANNEL, unlock_message("unlock", worker=WORKER_ID))
+        # a slower worker writing the state it had before the message
+        await backend.set_state(
+            CHANNEL, stored_state(Classroom(CLASSROOM_ID), 0, None), 0
+        )
+        return json.loads(await backend.get_state(CHANNEL))
+
+    state = asyncio.run(run())
+
+    assert state["version"] == 1
+    assert state["lastMessageId"] == "unlock"
@@ -0,0 +1,73 @@
+import json
+from app.constants import ClassroomUserRole, WhiteboardType
+from app.websockets.models.assignment import Assignment
+from app.websockets.models.classroom import Classroom
+from app.websockets.models.user import User
+from app.websockets.models.whiteboard import Whiteboard
+
+
+def create_classroom():
+    classroom = Classroom(1)
+    classroom.add_user(User(1, None, ClassroomUserRole.TEACHER))
+    student = User(2, None, ClassroomUserRole.STUDENT)
+    classroom.add_user(student)
+    assignment = Assignment("loops", "write a loop")
+    classroom.add_assignment(assignment)
+    user_assignment = student.add_user_assignment(
+        assignment.to_user_assignment(student.user_id)
+    )
+    return classroom, student, assignment, user_assignment
+
+
+def test_unchanged_classroom_should_reuse_its_encoded_snapshot():
+    classroom, *_ = create_classroom()
+
+    assert classroom.to_json_str() is classroom.to_json_str()
+
+
+def test_mutating_to_json_should_not_change_the_snapshot():
+    classroom, student, *_ = create_classroom()
+    before = classroom.to_json_str()
+
+    data = classroom.to_json()
+    data["editable"] = True
+    data["users"][1]["whiteboard"]["code"] = "changed"
+    student.to_json()["whiteboard"]["code"] = "changed"
+
+    assert classroom.to_json()["editable"] is False
+    assert student.whiteboard.code != "changed"
+    assert classroom.to_json_str() == before
+    assert json.loads(student.to_json_str())["whiteboard"]["code"] != "changed"
+
+
+def test_nested_change_should_reach_the_classroom_snapshot():
+    classroom, student, assignment, user_assignment = create_classroom()
+    before = classroom.to_json_str()
+
+    user_assignment.whiteboard.code = "print(1)"
+
+    data = json.loads(classroom.to_json_str())
+    assert data["users"][1]["userAssignments"][0]["whiteboard"]["code"] == "print(1)"
+    assert classroom.to_json_str() != before
+
+    assignment.title = "functions"
+
+    data = json.loads(classroom.to_json_str())
+    assert data["assignments"][0]["title"] == "functions"
+    assert data["users"][1]["userAssignments"][0]["assignment"]["title"] == "functions"
+
+    student.go_offline()
+
+    assert json.loads(classroom.to_json_str())["users"][1]["online"] == 0
+
+
+def test_replaced_whiteboard_should_no_longer_change_the_snapshot():
+    classroom, student, *_ = create_classroom()
+    old_whiteboard = student.whiteboard
+    student.whiteboard = Whiteboard("print(2)", WhiteboardType.PRIVATE)
+    before = classroom.to_json_str()
+
+    old_whiteboard.code = "print(3)"
+
+    assert classroom.to_json_str() is before
+    assert json.loads(before)["users"][1]["whiteboard"]["code"] == "print(2)"
@@ -3,6 +3,7 @@ import json
 from tests.utils import (
     clear_db,
     CREATE_COURSE_TEST_DATA,
+    CREATE_LESSON_TEST_DATA,
     client,
     mock_create_course,
     mock_login,
@@ -165,3 +166,28 @@ def test_get_enrolled_courses_should_return_status_code_200_if_with_token():
     assert response.status_code == 200
     assert response.json()["data"][0]["name"] == "test_name"
     assert response.json()["data"][0]["description"] == "test_desc"
+
+
+def test_get_courses_all_should_list_enrolled_courses_first_with_lessons_count():
+    token, _ = mock_login()
+    assert mock_create_course(token, CREATE_COURSE_TEST_DATA).status_code == 201
+    assert mock_create_course(token, CREATE_COURSE_TEST_DATA).status_code == 201
+    client.post(
+        "/api/lessons",
+        json={"data": {**CREATE_LESSON_TEST_DATA, "course_id": 2}},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    client.post(
+        "/api/course",
+        json={"data": {"course_id": 2}},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    response = client.get(
+        "/api/courses",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200
+    assert [course["id"] for course in response.json()["data"]] == [2, 1]
+    assert response.json()["data"][0]["enrolled"] is True
+    assert response.json()["data"][0]["total_lessons_count"] == 1
+    assert response.json()["data"][1]["enrolled"] is False
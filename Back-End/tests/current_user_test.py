@@ -0,0 +1,106 @@
+# pylint: disable=W0613,C0413,W0611
+from fastapi_jwt_auth import AuthJWT
+from app import models
+from app.db.session import SessionLocal
+from app.routers import deps
+from app.routers.deps import CurrentUser, CurrentUserCache
+from tests.utils import client, clear_db, create_user
+
+
+def auth_headers(username: str):
+    token = AuthJWT().create_access_token(subject=username)
+    return {"Authorization": f"Bearer {token}"}
+
+
+def create_committed_user(db):
+    user = create_user(db)
+    # the role the tests change the user to
+    db.add(models.Roles(id=2, role_name="admin"))
+    db.commit()
+    return user
+
+
+def test_cache_should_return_the_cached_user():
+    cache = CurrentUserCache(60)
+    user = CurrentUser(1, "student", 1)
+    cache.set(user)
+
+    assert cache.get("student") is user
+    assert cache.get("other") is None
+
+
+def test_cache_should_drop_expired_users(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(deps.time, "monotonic", lambda: now)
+    cache = CurrentUserCache(60)
+    cache.set(CurrentUser(1, "student", 1))
+
+    now += 61
+
+    assert cache.get("student") is None
+
+
+def test_cache_should_be_disabled_without_a_ttl():
+    cache = CurrentUserCache(0)
+    cache.set(CurrentUser(1, "student", 1))
+
+    assert cache.get("student") is None
+
+
+def test_cache_should_invalidate_one_or_all_users():
+    cache = CurrentUserCache(60)
+    cache.set(CurrentUser(1, "first", 1))
+    cache.set(CurrentUser(2, "second", 1))
+
+    cache.invalidate("first")
+    assert cache.get("first") is None
+    assert cache.get("second") is not None
+
+    cache.invalidate()
+    assert cache.get("second") is None
+
+
+def test_role_change_should_invalidate_the_cached_user():
+    db = SessionLocal()
+    user = create_committed_user(db)
+    deps.current_user_cache.set(CurrentUser(user.id, user.username, user.role_id))
+
+    user.role_id = 2
+    db.commit()
+
+    assert deps.current_user_cache.get("student") is None
+    db.close()
+
+
+def test_username_change_should_invalidate_the_old_username():
+    db = SessionLocal()
+    user = create_committed_user(db)
+    deps.current_user_cache.set(CurrentUser(user.id, user.username, user.role_id))
+
+    user.username = "renamed"
+    db.commit()
+
+    assert deps.current_user_cache.get("student") is None
+    db.close()
+
+
+def test_request_should_cache_the_current_user():
+    db = SessionLocal()
+    user_id = create_committed_user(db).id
+    db.close()
+
+    response = client.get("/api/users/me", headers=auth_headers("student"))
+
+    assert response.status_code == 200
+    assert deps.current_user_cache.get("student").id == user_id
+
+
+def test_users_me_should_return_404_if_the_user_was_deleted():
+    # cached before the row was removed behind the session's back
+    deps.current_user_cache.set(CurrentUser(999, "ghost", 1))
+
+    response = client.get("/api/users/me", headers=auth_headers("ghost"))
+
+    assert response.status_code == 404
+    assert response.json()["error"] == "User not found"
+    assert deps.current_user_cache.get("ghost") is None
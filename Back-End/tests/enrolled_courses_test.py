@@ -0,0 +1,77 @@
+# pylint: disable=W0613,C0413,W0611
+from sqlalchemy import event
+from app import crud, models
+from app.db.session import SessionLocal, engine
+from tests.utils import clear_db, create_user
+
+
+def create_enrolled_courses(db, count, username="student"):
+    user = create_user(db, username)
+    for index in range(count):
+        course = models.Courses(name=f"course {index}", description="desc")
+        db.add(course)
+        db.flush()
+        db.add_all(
+            [
+                models.CourseTags(course_id=course.id, name=f"tag {index}"),
+                models.Lessons(name="first", course_id=course.id, order=0),
+                models.Lessons(name="second", course_id=course.id, order=1),
+                models.EnrolledCourses(course_id=course.id, user_id=user.id),
+            ]
+        )
+    db.commit()
+    return user
+
+
+def count_queries(call):
+    queries = []
+
+    def count(*args):
+        queries.append(args[2])
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        result = call()
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return result, len(queries)
+
+
+def test_enrolled_courses_should_not_query_per_course():
+    db = SessionLocal()
+    first = create_enrolled_courses(db, 1, "first")
+    second = create_enrolled_courses(db, 5, "second")
+
+    _, one_course = count_queries(
+        lambda: crud.courses.get_all_enrolled_courses(db, first, True, None)
+    )
+    courses, five_courses = count_queries(
+        lambda: crud.courses.get_all_enrolled_courses(db, second, True, None)
+    )
+    db.close()
+
+    assert one_course == five_courses
+    assert len(courses) == 5
+
+
+def test_enrolled_courses_should_limit_lessons_per_course():
+    db = SessionLocal()
+    user = create_enrolled_courses(db, 2)
+
+    courses = crud.courses.get_all_enrolled_courses(db, user, True, 1)
+    db.close()
+
+    assert [len(course["lessons"]) for course in courses] == [1, 1]
+    assert [course["lessons"][0]["name"] for course in courses] == ["first", "first"]
+    assert [course["tags"][0]["name"] for course in courses] == ["tag 0", "tag 1"]
+    assert [course["total_lessons_count"] for course in courses] == [2, 2]
+
+
+def test_enrolled_courses_without_lessons_should_include_tags():
+    db = SessionLocal()
+    user = create_enrolled_courses(db, 2)
+
+    courses = crud.courses.get_all_enrolled_courses(db, user, False, None)
+    db.close()
+
+    assert [course["tags"][0]["name"] for course in courses] == ["tag 0", "tag 1"]
@@ -0,0 +1,79 @@
+# pylint: disable=W0613,C0413,W0611,C0121
+import pytest
+from sqlalchemy import func, select, text
+from app import models
+from app.db.session import engine
+from tests.utils import clear_db
+
+HOT_QUERIES = [
+    (
+        select(func.count(models.AnswersHistory.id)).where(
+            models.AnswersHistory.user_id == 1,
+            models.AnswersHistory.is_correct == True,
+        ),
+        "ix_answers_history_user_id_is_correct",
+    ),
+    (
+        select(models.AnswersHistory.lesson_id).where(
+            models.AnswersHistory.user_id == 1,
+            models.AnswersHistory.lesson_id == 1,
+        ),
+        "ix_answers_history_user_id_lesson_id",
+    ),
+    (
+        select(models.EnrolledLessons.id).where(
+            models.EnrolledLessons.user_id == 1,
+            models.EnrolledLessons.lesson_id == 1,
+        ),
+        "ix_enrolled_lessons_user_id_lesson_id",
+    ),
+    (
+        select(models.EnrolledCourses.id).where(
+            models.EnrolledCourses.user_id == 1,
+            models.EnrolledCourses.course_id == 1,
+        ),
+        "ix_enrolled_courses_user_id_course_id",
+    ),
+    (
+        select(models.CourseTags.id).where(models.CourseTags.name == "python"),
+        "ix_course_tags_name",
+    ),
+    (
+        select(models.ClassroomSessions.id).where(
+            models.ClassroomSessions.user_id == 1
+        ),
+        "ix_classroom_sessions_user_id_classroom_id",
+    ),
+    (
+        select(models.Classrooms.id).where(models.Classrooms.access_code == "abc"),
+        "ix_classrooms_access_code",
+    ),
+    (
+        select(models.KnowledgeTestUserResults.id).where(
+            models.KnowledgeTestUserResults.knowledge_test_id == 1,
+            models.KnowledgeTestUserResults.user_id == 1,
+        ),
+        "ix_knowledge_test_user_results_user_id_knowledge_test_id",
+    ),
+]
+
+
+def explain(statement) -> str:
+    sql = str(
+        statement.compile(
+            dialect=engine.dialect, compile_kwargs={"literal_binds": True}
+        )
+    )
+    with engine.connect() as connection:
+        if engine.dialect.name == "sqlite":
+            rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"))
+            return " ".join(row.detail for row in rows)
+        # the planner may skip an index on an almost empty table, the index
+        # only has to be usable for the query
+        rows = connection.execute(text(f"EXPLAIN {sql}")).mappings()
+        return " ".join(str(row["possible_keys"]) for row in rows)
+
+
+@pytest.mark.parametrize("statement, index", HOT_QUERIES)
+def test_hot_query_should_use_index(statement, index):
+    assert index in explain(statement)
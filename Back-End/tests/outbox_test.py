@@ -0,0 +1,76 @@
+import asyncio
+from app import settings
+from app.websockets.managers.connection_manager import BroadcastMetrics, Outbox
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+
+    async def send_text(self, payload: str):
+        self.sent.append(payload)
+
+    async def close(self):
+        self.closed = True
+
+
+def send(frames, outbox_size=None, monkeypatch=None):
+    # queues all frames before the outbox task gets to run, then drains it
+    if outbox_size is not None:
+        monkeypatch.setattr(settings, "CLASSROOM_OUTBOX_SIZE", outbox_size)
+    websocket = FakeWebSocket()
+    metrics = BroadcastMetrics()
+
+    async def run():
+        outbox = Outbox(websocket, metrics)
+        for payload, coalesce_key, full in frames:
+            outbox.put(payload, coalesce_key=coalesce_key, full=full)
+        # every send goes through wait_for, give each a few loop iterations
+        for _ in range(10 * len(frames)):
+            await asyncio.sleep(0)
+        outbox.close()
+
+    asyncio.run(run())
+    return websocket, metrics
+
+
+def test_outbox_should_send_frames_in_order():
+    websocket, _ = send(
+        [
+            ("full", "board", True),
+            ("delta 1", "board", False),
+            ("delta 2", "board", False),
+            ("other", None, False),
+        ]
+    )
+
+    assert websocket.sent == ["full", "delta 1", "delta 2", "other"]
+
+
+def test_full_frame_should_drop_the_queued_frames_it_supersedes():
+    websocket, metrics = send(
+        [
+            ("full 1", "board", True),
+            ("delta", "board", False),
+            ("other board", "other", True),
+            ("unkeyed", None, False),
+            ("full 2", "board", True),
+        ]
+    )
+
+    # no delta is left to be applied after the state that already includes it
+    assert websocket.sent == ["other board", "unkeyed", "full 2"]
+    assert metrics.frames_coalesced == 2
+
+
+def test_outbox_should_evict_a_socket_that_falls_behind(monkeypatch):
+    websocket, metrics = send(
+        [("first", None, False), ("second", None, False), ("third", None, False)],
+        outbox_size=2,
+        monkeypatch=monkeypatch,
+    )
+
+    assert websocket.sent == []
+    assert websocket.closed
+    assert metrics.connections_evicted == 1
@@ -0,0 +1,33 @@
+import pytest
+from app.pagination import decode_cursor, encode_cursor, paginate, select_fields
+
+
+def test_cursor_should_round_trip_its_keys():
+    assert decode_cursor(encode_cursor(3, 17), 2) == [3, 17]
+
+
+@pytest.mark.parametrize("cursor", ["zz", encode_cursor(1), "WyJhIiwgMV0"])
+def test_invalid_cursor_should_raise_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 2)
+
+
+def test_select_fields_should_keep_the_order_of_available_fields():
+    assert select_fields("name, id", ("id", "name", "lang")) == ["id", "name"]
+    assert select_fields(None, ("id", "name")) == ["id", "name"]
+
+
+def test_select_fields_should_reject_unknown_fields():
+    with pytest.raises(ValueError, match="Unknown fields: secret"):
+        select_fields("id,secret", ("id", "name"))
+
+
+def test_paginate_should_return_cursor_only_when_a_next_page_exists():
+    items = [{"id": item_id} for item_id in range(1, 5)]
+
+    assert paginate(items, 3, lambda item: (item["id"],)) == (
+        items[:3],
+        encode_cursor(3),
+    )
+    assert paginate(items, 4, lambda item: (item["id"],)) == (items, None)
+    assert paginate(items, None, lambda item: (item["id"],)) == (items, None)
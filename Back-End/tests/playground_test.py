@@ -0,0 +1,100 @@
+import pytest
+from fastapi_jwt_auth import AuthJWT
+from app import python_runner
+from app.constants import PlaygroundActions
+from tests.utils import client
+
+
+class EchoRunner:
+    # streams the code back as its output
+    def run_code(self, code, username="test", on_output=None):
+        if on_output is not None:
+            on_output("stdout", code)
+        return code, ""
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def echo_runner(monkeypatch):
+    monkeypatch.setattr(python_runner, "_runner", EchoRunner())
+
+
+def create_token(username: str = "student"):
+    return AuthJWT().create_access_token(subject=username)
+
+
+def test_playground_should_return_401_without_a_token():
+    response = client.post("/api/playground", json={"data": {"content": "print(1)"}})
+
+    assert response.status_code == 401
+
+
+def test_playground_should_run_code_for_a_signed_in_user():
+    response = client.post(
+        "/api/playground",
+        json={"data": {"content": "print(1)"}},
+        headers={"Authorization": f"Bearer {create_token()}"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["data"]["content"] == "print(1)"
+
+
+def test_job_should_only_be_visible_to_its_owner():
+    response = client.post(
+        "/api/playground/jobs",
+        json={"data": {"content": "print(1)"}},
+        headers={"Authorization": f"Bearer {create_token()}"},
+    )
+    job_id = response.json()["data"]["job_id"]
+
+    other = client.get(
+        f"/api/playground/jobs/{job_id}",
+        headers={"Authorization": f"Bearer {create_token('other')}"},
+    )
+    owner = client.get(
+        f"/api/playground/jobs/{job_id}",
+        headers={"Authorization": f"Bearer {create_token()}"},
+    )
+
+    assert response.status_code == 202
+    assert other.status_code == 404
+    assert owner.status_code == 200
+
+
+def test_stream_should_close_without_a_token():
+    with client.websocket_connect("/api/playground/ws") as websocket:
+        error = websocket.receive_json()
+
+    assert error["action"] == PlaygroundActions.ERROR.value
+
+
+def test_stream_should_send_output_and_exit():
+    with client.websocket_connect(
+        f"/api/playground/ws?token={create_token()}"
+    ) as websocket:
+        websocket.send_json({"data": {"content": "print(1)"}})
+        output = websocket.receive_json()
+        exit_frame = websocket.receive_json()
+
+    assert output["action"] == PlaygroundActions.OUTPUT.value
+    assert output["data"]["content"] == "print(1)"
+    assert exit_frame["action"] == PlaygroundActions.EXIT.value
+    assert exit_frame["data"]["status"] == "finished"
+
+
+@pytest.mark.parametrize("frame", ["not json", '{"data": {}}', "[1, 2]"])
+def test_stream_should_answer_malformed_frames_with_an_error(frame):
+    with client.websocket_connect(
+        f"/api/playground/ws?token={create_token()}"
+    ) as websocket:
+        websocket.send_text(frame)
+        error = websocket.receive_json()
+        # the socket is still usable
+        websocket.send_json({"data": {"content": "print(2)"}})
+        output = websocket.receive_json()
+
+    assert error["action"] == PlaygroundActions.ERROR.value
+    assert output["data"]["content"] == "print(2)"
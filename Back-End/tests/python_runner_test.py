@@ -0,0 +1,166 @@
+import os
+import sys
+import tempfile
+import pytest
+from app.python_runner import cache
+from app.python_runner.cache import CachedPythonRunner, ResultCache
+from app.python_runner.local import LocalPythonRunner, SandboxError, readable_by
+
+OTHER_UID = 65534
+
+
+@pytest.fixture
+def secret_dir():
+    # tmp_path sits in a directory only its owner can enter
+    with tempfile.TemporaryDirectory() as directory:
+        os.chmod(directory, 0o755)
+        yield directory
+
+
+@pytest.fixture
+def secret(secret_dir):
+    path = os.path.join(secret_dir, ".env")
+    with open(path, "w", encoding="utf-8") as secret_file:
+        secret_file.write("JWT_SECRET_KEY=x")
+    return path
+
+
+def test_readable_by_should_follow_permission_bits(secret_dir, secret):
+    os.chmod(secret, 0o600)
+    assert not readable_by(secret, OTHER_UID, [OTHER_UID])
+
+    os.chmod(secret, 0o644)
+    assert readable_by(secret, OTHER_UID, [OTHER_UID])
+
+    os.chmod(secret_dir, 0o700)
+    assert not readable_by(secret, OTHER_UID, [OTHER_UID])
+
+
+def test_local_runner_should_refuse_to_run_as_the_api_user():
+    with pytest.raises(SandboxError):
+        LocalPythonRunner(
+            pool_size=0, timeout=5, memory_limit_mb=256, max_output_bytes=1024
+        )
+
+
+def test_local_runner_should_refuse_a_user_that_can_read_secrets(secret):
+    os.chmod(secret, 0o644)
+
+    with pytest.raises(SandboxError):
+        LocalPythonRunner(
+            pool_size=0,
+            timeout=5,
+            memory_limit_mb=256,
+            max_output_bytes=1024,
+            user="nobody",
+            secret_files=[secret],
+        )
+
+
+def test_local_runner_should_support_exit():
+    runner = LocalPythonRunner(
+        pool_size=1,
+        timeout=5,
+        memory_limit_mb=256,
+        max_output_bytes=1024,
+        insecure=True,
+    )
+    try:
+        text, err = runner.run_code("print('bye')\nexit()\nprint('never')")
+    finally:
+        runner.close()
+
+    assert text == "bye\n"
+    assert err == ""
+
+
+@pytest.mark.skipif(
+    os.geteuid() != 0 or not readable_by(sys.executable, OTHER_UID, [OTHER_UID]),
+    reason="switching users needs root and an interpreter the user can run",
+)
+def test_local_runner_should_run_as_the_sandbox_user(secret):
+    runner = LocalPythonRunner(
+        pool_size=1,
+        timeout=5,
+        memory_limit_mb=256,
+        max_output_bytes=1024,
+        user="nobody",
+    )
+    try:
+        os.chmod(secret, 0o600)
+        text, err = runner.run_code(f"print(open({secret!r}).read())")
+    finally:
+        runner.close()
+
+    assert text == ""
+    assert "PermissionError" in err
+
+
+class FakeRunner:
+    timeout = 5
+    max_output_bytes = 1024
+
+    def __init__(self, outputs):
+        self.outputs = list(outputs)
+        self.runs = 0
+
+    def run_code(self, code, username="test", on_output=None):
+        self.runs += 1
+        return self.outputs.pop(0)
+
+
+def test_result_cache_should_expire_entries(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    result_cache = ResultCache(max_size=10, ttl=60)
+    result_cache.set("key", "out", "")
+
+    assert result_cache.get("key") == ("out", "")
+    now[0] += 61
+    assert result_cache.get("key") is None
+    assert result_cache.stats()["hits"] == 1
+    assert result_cache.stats()["misses"] == 1
+
+
+def test_result_cache_should_evict_least_recently_used():
+    result_cache = ResultCache(max_size=2, ttl=60)
+    result_cache.set("first", "1", "")
+    result_cache.set("second", "2", "")
+    result_cache.get("first")
+    result_cache.set("third", "3", "")
+
+    assert result_cache.get("second") is None
+    assert result_cache.get("first") == ("1", "")
+    assert result_cache.get("third") == ("3", "")
+
+
+def test_cached_runner_should_reuse_deterministic_results():
+    runner = FakeRunner([("6\n", "")])
+    cached = CachedPythonRunner(runner, ResultCache(max_size=10, ttl=60), "v")
+    streamed = []
+
+    assert cached.run_code("print(1 + 5)") == ("6\n", "")
+    assert cached.run_code(
+        "print(1 + 5)", on_output=lambda *chunk: streamed.append(chunk)
+    ) == ("6\n", "")
+    assert runner.runs == 1
+    assert streamed == [("stdout", "6\n")]
+
+
+@pytest.mark.parametrize(
+    "code, output",
+    [
+        ("print(random.random())", "0.1\n"),
+        ("print(time.time())", "1.0\n"),
+        ("print(id(1))", "9788960\n"),
+        ("print(object())", "<object object at 0x7f3c2a1b0e50>\n"),
+    ],
+)
+def test_cached_runner_should_not_cache_nondeterministic_runs(code, output):
+    runner = FakeRunner([(output, ""), (output, "")])
+    cached = CachedPythonRunner(runner, ResultCache(max_size=10, ttl=60), "v")
+
+    cached.run_code(code)
+    cached.run_code(code)
+
+    assert runner.runs == 2
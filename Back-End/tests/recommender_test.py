@@ -0,0 +1,108 @@
+# pylint: disable=W0613,C0413,W0611
+import pytest
+from app import crud, models
+from app.db.session import SessionLocal
+from app.recommender.collaborative import item_similarities
+from app.recommender.tags import CourseTagIndex
+from tests.utils import clear_db, create_user
+
+
+def make_index():
+    index = CourseTagIndex(ttl=60)
+    for course_id, lang, tags in [
+        (1, "en", ["python", "basics"]),
+        (2, "en", ["python", "basics"]),
+        (3, "en", ["python", "web", "django"]),
+        (4, "en", ["basics"]),
+        (5, "pl", ["python", "basics"]),
+        (6, "en", ["java"]),
+    ]:
+        index.set_course(course_id, lang)
+        for name in tags:
+            index.add_tag(
+                course_id * 10 + len(index.tags_of(course_id)), course_id, name
+            )
+    return index
+
+
+def test_recommend_should_rank_courses_by_shared_tags():
+    ranked = [course_id for course_id, _ in make_index().recommend([1], limit=10)]
+
+    # 3 shares python but is mostly about other things, 5 is in another
+    # language, java shares nothing and 1 is already enrolled
+    assert ranked == [2, 4, 3]
+
+
+def test_recommend_should_return_top_k():
+    assert [course_id for course_id, _ in make_index().recommend([1], limit=1)] == [2]
+
+
+def test_removed_tags_and_courses_should_leave_recommendations():
+    index = make_index()
+    index.remove_tag(20)
+    index.remove_course(3)
+
+    assert index.tags_of(2) == [(21, "basics")]
+    assert [course_id for course_id, _ in index.recommend([1], limit=10)] == [2, 4]
+
+
+def test_item_similarities_should_keep_top_n_most_similar_items():
+    pytest.importorskip("scipy")
+    # 10 is mostly taken with 20, 30 only once with 10
+    interactions = {
+        (1, 10): 1.0,
+        (1, 20): 1.0,
+        (2, 10): 1.0,
+        (2, 20): 1.0,
+        (3, 10): 1.0,
+        (3, 30): 1.0,
+        (4, 30): 1.0,
+    }
+    similarities = {
+        (item_id, similar_id): score
+        for item_id, similar_id, score in item_similarities(interactions, top_n=1)
+    }
+
+    assert set(similarities) == {(10, 20), (20, 10), (30, 10)}
+    assert similarities[(10, 20)] == pytest.approx(2 / 6**0.5)
+    assert similarities[(30, 10)] == pytest.approx(1 / 6**0.5)
+
+
+def test_weakest_lessons_should_rank_unsolved_mistakes_first():
+    db = SessionLocal()
+    user = create_user(db)
+    course = models.Courses(name="course", description="desc")
+    db.add(course)
+    db.flush()
+    lessons = [
+        models.Lessons(name=f"lesson_{order}", course_id=course.id, order=order)
+        for order in range(4)
+    ]
+    db.add_all(lessons)
+    db.flush()
+    # 0 is solved after three mistakes, 1 has two, 2 one recent, 3 no mistake
+    for lesson, is_correct in [
+        (0, False),
+        (0, False),
+        (0, False),
+        (1, False),
+        (1, False),
+        (0, True),
+        (2, False),
+        (3, True),
+    ]:
+        db.add(
+            models.AnswersHistory(
+                user_id=user.id, lesson_id=lessons[lesson].id, is_correct=is_correct
+            )
+        )
+        db.flush()
+    db.commit()
+
+    weakest_lessons = crud.courses.get_weakest_lessons(db, user, limit=10)
+    db.close()
+
+    assert [
+        (lesson.name, incorrect_answers_count, bool(solved))
+        for lesson, incorrect_answers_count, solved in weakest_lessons
+    ] == [("lesson_1", 2, False), ("lesson_2", 1, False), ("lesson_0", 3, True)]
@@ -0,0 +1,161 @@
+import asyncio
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+import pytest
+from app import response_cache
+from app.response_cache.memory import MemoryBackend
+
+
+class SharedBackend(MemoryBackend):
+    # stands in for redis, records whether it was called on an event loop
+    shared = True
+
+    def __init__(self):
+        super().__init__(max_size=16)
+        self.calls_on_loop = []
+
+    def record_call(self):
+        try:
+            asyncio.get_running_loop()
+            self.calls_on_loop.append(True)
+        except RuntimeError:
+            self.calls_on_loop.append(False)
+
+    def get(self, key):
+        self.record_call()
+        return super().get(key)
+
+    def set(self, *args):
+        self.record_call()
+        return super().set(*args)
+
+
+@pytest.fixture
+def backend():
+    backend = MemoryBackend(max_size=16)
+    response_cache.set_backend(backend)
+    yield backend
+    response_cache.set_backend(None)
+
+
+@pytest.fixture
+def client(backend):
+    app = FastAPI()
+    calls = []
+    # run while the response is built, in place of a concurrent admin edit
+    edits = []
+
+    @app.get("/items")
+    def get_items(request: Request):
+        cached = response_cache.get_cached_response(request, "items")
+        if cached is not None:
+            return cached
+        calls.append(request.url.query)
+        while edits:
+            edits.pop()()
+        response = JSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={"data": len(calls), "error": None},
+        )
+        return response_cache.cache_response(request, response, "items")
+
+    client = TestClient(app)
+    client.calls = calls
+    client.edits = edits
+    return client
+
+
+def test_memory_backend_should_invalidate_entries_by_tag():
+    backend = MemoryBackend(max_size=16)
+    backend.set("a", b"a", '"a"', ["courses"], 60)
+    backend.set("b", b"b", '"b"', ["courses", "lessons"], 60)
+    backend.set("c", b"c", '"c"', ["surveys"], 60)
+    backend.invalidate(["lessons"])
+
+    assert backend.get("a") == (b"a", '"a"')
+    assert backend.get("b") is None
+    assert backend.get("c") == (b"c", '"c"')
+
+
+def test_memory_backend_should_skip_entries_of_invalidated_generations():
+    backend = MemoryBackend(max_size=16)
+    generations = backend.generations(["courses", "lessons"])
+    backend.invalidate(["lessons"])
+    backend.set("a", b"a", '"a"', ["courses", "lessons"], 60, generations)
+    backend.set("b", b"b", '"b"', ["courses"], 60, generations)
+
+    assert backend.get("a") is None
+    assert backend.get("b") == (b"b", '"b"')
+
+
+def test_memory_backend_should_expire_entries():
+    backend = MemoryBackend(max_size=16)
+    backend.set("a", b"a", '"a"', ["courses"], -1)
+
+    assert backend.get("a") is None
+
+
+def test_cached_response_should_be_served_with_etag(client):
+    first = client.get("/items?b=2&a=1")
+    second = client.get("/items?a=1&b=2")
+
+    assert first.json() == second.json() == {"data": 1, "error": None}
+    assert first.headers["etag"] == second.headers["etag"]
+    assert len(client.calls) == 1
+
+
+def test_matching_etag_should_return_not_modified(client):
+    etag = client.get("/items").headers["etag"]
+    response = client.get("/items", headers={"If-None-Match": etag})
+
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+
+
+def test_invalidated_tag_should_rebuild_response(client):
+    etag = client.get("/items").headers["etag"]
+    response_cache.invalidate("items")
+    response = client.get("/items", headers={"If-None-Match": etag})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"data": 2, "error": None}
+    assert response.headers["etag"] != etag
+
+
+def test_edit_while_building_should_not_cache_the_old_response(client):
+    client.edits.append(lambda: response_cache.invalidate("items"))
+    first = client.get("/items")
+    second = client.get("/items")
+    third = client.get("/items")
+
+    # the first response is served but not kept, the next one is rebuilt
+    assert first.json() == {"data": 1, "error": None}
+    assert second.json() == third.json() == {"data": 2, "error": None}
+    assert len(client.calls) == 2
+
+
+def test_async_route_should_not_call_a_shared_backend_on_the_event_loop():
+    backend = SharedBackend()
+    response_cache.set_backend(backend)
+    app = FastAPI()
+
+    @app.get("/items")
+    async def get_items(request: Request):
+        cached = await response_cache.get_cached_response_async(request, "items")
+        if cached is not None:
+            return cached
+        response = JSONResponse(status_code=status.HTTP_200_OK, content={"data": 1})
+        return await response_cache.cache_response_async(request, response, "items")
+
+    try:
+        client = TestClient(app)
+        first = client.get("/items")
+        second = client.get("/items")
+    finally:
+        response_cache.set_backend(None)
+
+    assert first.json() == second.json() == {"data": 1}
+    assert backend.hits == 1
+    # get and set of the first request, get of the second
+    assert backend.calls_on_loop == [False, False, False]
@@ -0,0 +1,120 @@
+# pylint: disable=W0613,C0413,W0611
+from sqlalchemy import event
+from app import crud, models
+from app.db.session import SessionLocal
+from tests.utils import clear_db, create_user
+
+
+def create_course(db):
+    course = models.Courses(name="course", description="desc")
+    db.add(course)
+    db.flush()
+    lesson = models.Lessons(name="lesson", course_id=course.id, order=0)
+    db.add(lesson)
+    db.flush()
+    return course, lesson
+
+
+def test_rebuild_user_stats_should_count_the_history():
+    db = SessionLocal()
+    user = create_user(db)
+    course, lesson = create_course(db)
+    enrolled_course = models.EnrolledCourses(course_id=course.id, user_id=user.id)
+    db.add(enrolled_course)
+    db.flush()
+    db.add_all(
+        [
+            models.EnrolledLessons(
+                lesson_id=lesson.id,
+                enrolled_course_id=enrolled_course.id,
+                user_id=user.id,
+                completed=True,
+            ),
+            models.AnswersHistory(
+                user_id=user.id, lesson_id=lesson.id, is_correct=True
+            ),
+            models.AnswersHistory(
+                user_id=user.id, lesson_id=lesson.id, is_correct=False
+            ),
+            models.AnswersHistory(
+                user_id=user.id, lesson_id=lesson.id, is_correct=False
+            ),
+        ]
+    )
+
+    user_stats = crud.user_stats.rebuild_user_stats(db, [user.id])[0]
+    db.commit()
+
+    assert user_stats.enrolled_courses_count == 1
+    assert user_stats.enrolled_lessons_count == 1
+    assert user_stats.completed_lessons_count == 1
+    assert user_stats.correct_answers_count == 1
+    assert user_stats.incorrect_answers_count == 2
+    db.close()
+
+
+def test_increment_user_stats_should_add_to_existing_counters():
+    db = SessionLocal()
+    user = create_user(db)
+    crud.user_stats.rebuild_user_stats(db, [user.id])
+    db.commit()
+
+    crud.user_stats.increment_user_stats(
+        db, user.id, correct_answers_count=1, enrolled_courses_count=2
+    )
+    crud.user_stats.increment_user_stats(db, user.id, correct_answers_count=1)
+    db.commit()
+
+    user_stats = db.get(models.UserStats, user.id)
+    db.refresh(user_stats)
+    assert user_stats.correct_answers_count == 2
+    assert user_stats.enrolled_courses_count == 2
+    assert user_stats.incorrect_answers_count == 0
+    db.close()
+
+
+def test_increment_user_stats_should_rebuild_a_missing_row():
+    db = SessionLocal()
+    user = create_user(db)
+    db.add(models.AnswersHistory(user_id=user.id, is_correct=True))
+
+    crud.user_stats.increment_user_stats(db, user.id, correct_answers_count=1)
+    db.commit()
+
+    assert db.get(models.UserStats, user.id).correct_answers_count == 1
+    db.close()
+
+
+def test_invalidate_user_stats_should_only_drop_the_given_users():
+    db = SessionLocal()
+    first = create_user(db, "first")
+    second = create_user(db, "second")
+    course, lesson = create_course(db)
+    db.add(models.AnswersHistory(user_id=first.id, lesson_id=lesson.id))
+    crud.user_stats.rebuild_user_stats(db, [first.id, second.id])
+    db.commit()
+
+    user_ids = crud.user_stats.course_user_ids(db, course.id, [lesson.id])
+    crud.user_stats.invalidate_user_stats(db, user_ids)
+    db.commit()
+
+    assert user_ids == {first.id}
+    assert db.get(models.UserStats, first.id) is None
+    assert db.get(models.UserStats, second.id) is not None
+    db.close()
+
+
+def test_get_user_stats_should_read_a_row_built_concurrently():
+    db = SessionLocal()
+    user = create_user(db)
+    db.commit()
+
+    @event.listens_for(db, "before_flush", once=True)
+    def build_in_another_view(*args):
+        other = SessionLocal()
+        other.add(models.UserStats(user_id=user.id, correct_answers_count=7))
+        other.commit()
+        other.close()
+
+    assert crud.user_stats.get_user_stats(db, user).correct_answers_count == 7
+    db.close()
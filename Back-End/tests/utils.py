@@ -5,6 +5,8 @@ from app.schemas.answer import AnswerCreateData
 from app.schemas.course import CourseCreateData
 from app.schemas.lesson import LessonCreateData
 from app.main import app
+from app import models, recommender, response_cache
+from app.routers import deps
 from app.db.session import Base, engine
 
 
@@ -37,6 +39,16 @@ def mock_login() -> Tuple[str, str]:
     return response_data["data"]["token"]["access_token"], username
 
 
+def create_user(db, username: str = "student", role_id: int = 1) -> models.User:
+    # a user added straight to the session, its role is created on first use
+    if db.get(models.Roles, role_id) is None:
+        db.add(models.Roles(id=role_id, role_name=f"role_{role_id}"))
+    user = models.User(username=username, role_id=role_id)
+    db.add(user)
+    db.flush()
+    return user
+
+
 def mock_create_course(token: str, data: CourseCreateData):
     response = client.post(
         "/api/courses",
@@ -69,3 +81,7 @@ def clear_db():
     Base.metadata.create_all(bind=engine)
     yield
     Base.metadata.drop_all(bind=engine)
+    # dropped rows bypass the routes that invalidate cached responses
+    response_cache.set_backend(None)
+    recommender.course_tag_index.invalidate()
+    deps.current_user_cache.invalidate()
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import pytest
+from app.constants import Actions, WhiteboardType
+from app.websockets.managers.connection_manager import conn_manager
+from app.websockets.managers.payload_handler import payload_handler
+from app.websockets.models.message_context import MessageContext
+from app.websockets.models.text_operation import (
+    InvalidOperationError,
+    apply_operation,
+    transform_operation,
+)
+from app.websockets.models.whiteboard import (
+    HISTORY_SIZE,
+    Whiteboard,
+    WhiteboardVersionError,
+)
+
+
+def test_apply_operation_should_insert_and_delete():
+    assert apply_operation("print(1)", [6, -1, "42", 1]) == "print(42)"
+
+
+def test_apply_operation_should_raise_if_length_does_not_match():
+    with pytest.raises(InvalidOperationError):
+        apply_operation("print(1)", [3, "x"])
+
+
+def test_transformed_operations_should_converge():
+    text = "x = 1\ny = 2\n"
+    first = [4, -1, "10", 7]
+    second = [10, -1, "20", 1]
+    first_prime, second_prime = transform_operation(first, second)
+
+    assert apply_operation(
+        apply_operation(text, first), second_prime
+    ) == apply_operation(apply_operation(text, second), first_prime)
+
+
+def test_apply_delta_should_bump_version():
+    whiteboard = Whiteboard("abc", WhiteboardType.PUBLIC)
+
+    whiteboard.apply_delta(0, [3, "d"])
+
+    assert whiteboard.code == "abcd"
+    assert whiteboard.version == 1
+
+
+def test_apply_delta_should_transform_stale_delta():
+    whiteboard = Whiteboard("abc", WhiteboardType.PUBLIC)
+    whiteboard.apply_delta(0, ["x", 3])
+
+    operation = whiteboard.apply_delta(0, [3, "y"])
+
+    assert operation == [4, "y"]
+    assert whiteboard.code == "xabcy"
+    assert whiteboard.version == 2
+
+
+def test_apply_delta_should_transform_over_full_code_change():
+    whiteboard = Whiteboard("abc", WhiteboardType.PUBLIC)
+    whiteboard.code = "new"
+
+    whiteboard.apply_delta(0, [3, "!"])
+
+    assert whiteboard.code == "new!"
+
+
+def test_apply_delta_should_raise_if_version_is_too_old():
+    whiteboard = Whiteboard("", WhiteboardType.PUBLIC)
+    for _ in range(HISTORY_SIZE + 1):
+        whiteboard.apply_delta(
+            whiteboard.version,
+            [len(whiteboard.code), "a"] if whiteboard.code else ["a"],
+        )
+
+    with pytest.raises(WhiteboardVersionError):
+        whiteboard.apply_delta(0, ["b"])
+
+
+def test_apply_delta_should_raise_if_version_is_from_the_future():
+    whiteboard = Whiteboard("abc", WhiteboardType.PUBLIC)
+
+    with pytest.raises(WhiteboardVersionError):
+        whiteboard.apply_delta(1, [3])
+
+
+def test_apply_operation_should_count_utf16_code_units():
+    # the emoji is one code point but two code units, as ot.js counts it
+    assert apply_operation("a\U0001f600b", [3, "!", 1]) == "a\U0001f600!b"
+
+
+def test_apply_operation_should_raise_if_a_surrogate_pair_is_split():
+    with pytest.raises(InvalidOperationError):
+        apply_operation("\U0001f600", [1, -1])
+
+
+def test_apply_delta_should_transform_over_astral_insert():
+    whiteboard = Whiteboard("ab", WhiteboardType.PUBLIC)
+    whiteboard.apply_delta(0, [1, "\U0001f600", 1])
+
+    operation = whiteboard.apply_delta(0, [2, "c"])
+
+    assert operation == [4, "c"]
+    assert whiteboard.code == "a\U0001f600bc"
+
+
+def test_code_change_should_reject_delta_without_version(monkeypatch):
+    sent = []
+
+    async def send_personal_payload(payload, websocket, **_):
+        sent.append(json.loads(payload))
+
+    monkeypatch.setattr(conn_manager, "send_personal_payload", send_personal_payload)
+    whiteboard = Whiteboard("abc", WhiteboardType.PUBLIC)
+    context = MessageContext(
+        payload={
+            "action": Actions.CODE_CHANGE.value,
+            "user_id": "student",
+            "data": {"delta": {"ops": [3, "d"]}},
+        },
+        classroom=None,
+        classroom_id=1,
+        websocket=None,
+    )
+
+    response = asyncio.run(
+        payload_handler.update_whiteboard(
+            context=context, source_user=None, whiteboard=whiteboard
+        )
+    )
+
+    assert response is None
+    assert whiteboard.code == "abc"
+    assert sent[0]["action"] == Actions.ERROR.value
@@ -23,10 +23,15 @@ export const sendCode = createAsyncThunk<
   {
     content: string;
   }
->('api/playground', async ({ content }) => {
+>('api/playground', async ({ content }, thunkApi) => {
   try {
+    const state = thunkApi.getState() as RootState;
+    const { accessToken } = state.auth.token;
     const res = await apiClient.post('playground', {
       json: { data: { content } },
+      headers: {
+        Authorization: `Bearer ${accessToken}`,
+      },
     });
     const data = await res.json();
     return data as ApiPayload<Playground>;